@@ -0,0 +1,374 @@
+"""
+Generador de carga para la API (ver el comando benchmark_carga).
+
+Cada escenario es una mezcla ponderada de operaciones (login, refresh,
+listado y detalle de pólizas, alta, próximas a vencer, catálogos y las dos
+exportaciones a Excel). Varios hilos repiten operaciones elegidas al azar
+hasta completar las peticiones pedidas, cada uno con su sesión y sus tokens.
+
+La sesión puede ser local (django.test.Client en el mismo proceso, con el
+conteo exacto de consultas) o HTTP contra un servidor en marcha, p. ej.
+gunicorn en localhost; en ese caso las consultas salen de X-Query-Count,
+que el servidor solo envía con SERVER_TIMING=1. En los dos modos se usa la
+misma base de datos que el servidor para elegir ids y catálogos.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from polizas.models import Aseguradora, Asegurado, Contratante, FormaPago, Poliza, Ramo
+
+MUESTRA_IDS = 2000
+
+
+# --- Sesiones ---
+
+class Respuesta:
+    def __init__(self, estado, cuerpo, consultas):
+        self.estado, self.cuerpo, self.consultas = estado, cuerpo, consultas
+
+    def json(self):
+        return json.loads(self.cuerpo)
+
+
+class SesionLocal:
+    """Peticiones con el cliente de pruebas de Django, en el mismo proceso."""
+
+    def __init__(self):
+        self.cliente = Client(HTTP_HOST='localhost')
+
+    def pedir(self, metodo, ruta, datos=None, token=None):
+        extra = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        with CaptureQueriesContext(connection) as capturadas:
+            if metodo == 'GET':
+                response = self.cliente.get(ruta, **extra)
+            else:
+                response = self.cliente.generic(metodo, ruta, json.dumps(datos or {}),
+                                                content_type='application/json', **extra)
+            # Las exportaciones se generan al recorrer el cuerpo: debe entrar en la medición
+            cuerpo = b''.join(response.streaming_content) if response.streaming else response.content
+        return Respuesta(response.status_code, cuerpo, len(capturadas))
+
+    def cerrar(self):
+        connection.close()
+
+
+class SesionHttp:
+    """Peticiones HTTP reales contra `base` (p. ej. http://localhost:8000)."""
+
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+
+    def pedir(self, metodo, ruta, datos=None, token=None):
+        cuerpo = json.dumps(datos).encode() if datos is not None else None
+        peticion = urllib.request.Request(self.base + ruta, data=cuerpo, method=metodo)
+        peticion.add_header('Accept', 'application/json')
+        if cuerpo is not None:
+            peticion.add_header('Content-Type', 'application/json')
+        if token:
+            peticion.add_header('Authorization', f'Bearer {token}')
+        try:
+            with urllib.request.urlopen(peticion, timeout=300) as response:
+                estado, contenido, encabezados = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as exc:
+            estado, contenido, encabezados = exc.code, exc.read(), exc.headers
+        consultas = encabezados.get('X-Query-Count')
+        return Respuesta(estado, contenido, int(consultas) if consultas is not None else None)
+
+    def cerrar(self):
+        pass
+
+
+# --- Datos para las operaciones ---
+
+class Contexto:
+    """Ids y catálogos reales para armar las peticiones, leídos una vez por corrida."""
+
+    def __init__(self, usuario, clave, prefijo_altas):
+        self.usuario, self.clave = usuario, clave
+        self.prefijo_altas = prefijo_altas
+        self.polizas = Poliza.objects.count()
+        limites = Poliza.objects.aggregate(minimo=Min('id'), maximo=Max('id'),
+                                           desde=Min('fecha_inicio'), hasta=Max('fecha_inicio'),
+                                           ultima=Max('renovacion'))
+        # Muestra de ids repartida por toda la tabla, sin ORDER BY random()
+        if limites['maximo']:
+            paso = max(1, (limites['maximo'] - limites['minimo']) // MUESTRA_IDS)
+            self.poliza_ids = list(Poliza.objects.filter(
+                id__in=range(limites['minimo'], limites['maximo'] + 1, paso)
+            ).values_list('id', flat=True)[:MUESTRA_IDS])
+        else:
+            self.poliza_ids = []
+        self.aseguradora_ids = list(Aseguradora.objects.values_list('id', flat=True))
+        self.ramo_ids = list(Ramo.objects.values_list('id', flat=True))
+        self.forma_pago_ids = list(FormaPago.objects.values_list('id', flat=True))
+        self.desde, self.hasta = limites['desde'], limites['hasta']
+        # Corte de "próximas a vencer" en el último mes de renovaciones: un
+        # resultado acotado, como el que pide la oficina a fin de mes
+        self.corte_vencer = limites['ultima'] - timedelta(days=30) if limites['ultima'] else None
+        self.contador = 0
+        self.lock = threading.Lock()
+
+    def siguiente(self):
+        with self.lock:
+            self.contador += 1
+            return self.contador
+
+
+class Trabajador:
+    """Estado de un hilo: su sesión y sus tokens (el refresh rota en cada uso)."""
+
+    def __init__(self, sesion, contexto, rnd):
+        self.sesion, self.contexto, self.rnd = sesion, contexto, rnd
+        self.access = self.refresh = None
+
+    def pedir(self, metodo, ruta, datos=None, autenticado=True):
+        return self.sesion.pedir(metodo, ruta, datos, token=self.access if autenticado else None)
+
+
+# --- Operaciones: cada una hace una petición y devuelve la Respuesta ---
+
+def login(t):
+    respuesta = t.pedir('POST', '/api/auth/login/',
+                        {'username': t.contexto.usuario, 'password': t.contexto.clave}, autenticado=False)
+    if respuesta.estado == 200:
+        datos = respuesta.json()
+        t.access, t.refresh = datos['access'], datos['refresh']
+    return respuesta
+
+
+def refresh(t):
+    respuesta = t.pedir('POST', '/api/auth/refresh/', {'refresh': t.refresh}, autenticado=False)
+    if respuesta.estado == 200:
+        datos = respuesta.json()
+        t.access, t.refresh = datos['access'], datos.get('refresh', t.refresh)
+    return respuesta
+
+
+def poliza_lista(t):
+    ruta = '/api/polizas/?page_size=50'
+    if t.contexto.aseguradora_ids and t.rnd.random() < 0.5:
+        ruta += f'&aseguradora={t.rnd.choice(t.contexto.aseguradora_ids)}'
+    return t.pedir('GET', ruta)
+
+
+def poliza_detalle(t):
+    return t.pedir('GET', f'/api/polizas/{t.rnd.choice(t.contexto.poliza_ids)}/')
+
+
+def poliza_alta(t):
+    c = t.contexto
+    n = c.siguiente()
+    inicio = c.desde + timedelta(days=t.rnd.randrange(max(1, (c.hasta - c.desde).days)))
+    fin = inicio + timedelta(days=365)
+    prima = Decimal(t.rnd.randrange(10000, 5000000)) / 100
+    return t.pedir('POST', '/api/polizas/', {
+        'numero': f'{c.prefijo_altas}-{n:07d}',
+        'fecha_inicio': inicio.isoformat(),
+        'fecha_fin': fin.isoformat(),
+        'renovacion': fin.isoformat(),
+        'prima_total': str(prima),
+        'monto_asegurado': str(prima * 20),
+        'aseguradora_id': t.rnd.choice(c.aseguradora_ids),
+        'ramo_id': t.rnd.choice(c.ramo_ids),
+        'forma_pago_id': t.rnd.choice(c.forma_pago_ids),
+        'contratante': {'nombre': f'Carga C {n}', 'documento': f'{c.prefijo_altas}-C-{n:07d}', 'telefono': '0'},
+        'asegurado': {'nombre': f'Carga A {n}', 'documento': f'{c.prefijo_altas}-A-{n:07d}', 'telefono': '0'},
+    })
+
+
+def proximas_vencer(t):
+    return t.pedir('GET', f'/api/polizas/proximas-vencer/?fecha={t.contexto.corte_vencer}&page_size=50')
+
+
+def opciones(t):
+    return t.pedir('GET', f"/api/polizas/opciones/{t.rnd.choice(('aseguradoras', 'ramos', 'formas_pago'))}/")
+
+
+def exportar_reporte(t):
+    # Un mes de una aseguradora: el tamaño típico de un reporte pedido desde la oficina
+    c = t.contexto
+    desde = c.desde + timedelta(days=t.rnd.randrange(max(1, (c.hasta - c.desde).days - 30)))
+    return t.pedir('GET', f'/api/reportes/exportar-excel/?fecha_desde={desde}&fecha_hasta={desde + timedelta(days=30)}'
+                          f'&aseguradora={t.rnd.choice(c.aseguradora_ids)}')
+
+
+def exportar_proximas(t):
+    return t.pedir('GET', f'/api/polizas/proximas-vencer/exportar/?fecha={t.contexto.corte_vencer}')
+
+
+OPERACIONES = {
+    'login': login,
+    'refresh': refresh,
+    'poliza-list': poliza_lista,
+    'poliza-detail': poliza_detalle,
+    'poliza-create': poliza_alta,
+    'poliza-proximas-vencer': proximas_vencer,
+    'poliza-opciones': opciones,
+    'reporte-excel': exportar_reporte,
+    'poliza-proximas-vencer-excel': exportar_proximas,
+}
+
+# Pesos relativos de cada operación por escenario
+ESCENARIOS = {
+    'autenticacion': {'login': 1, 'refresh': 4},
+    'consulta': {'poliza-list': 4, 'poliza-detail': 4, 'poliza-proximas-vencer': 2, 'poliza-opciones': 2},
+    'alta': {'poliza-create': 3, 'poliza-detail': 1},
+    'exportacion': {'reporte-excel': 1, 'poliza-proximas-vencer-excel': 1},
+    'oficina': {
+        'poliza-list': 30, 'poliza-detail': 30, 'poliza-proximas-vencer': 10, 'poliza-opciones': 10,
+        'poliza-create': 5, 'refresh': 10, 'login': 3, 'reporte-excel': 1, 'poliza-proximas-vencer-excel': 1,
+    },
+}
+
+
+# --- Medición ---
+
+def _rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as estado:
+            for linea in estado:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class MuestreoMemoria:
+    """Pico de RSS (suma de `pids`) mientras dura el bloque, muestreando /proc."""
+
+    def __init__(self, pids, intervalo=0.05):
+        self.pids, self.intervalo = pids, intervalo
+        self.pico_kb = 0
+        self._fin = threading.Event()
+
+    def _muestrear(self):
+        while True:
+            actuales = [_rss_kb(pid) for pid in self.pids]
+            self.pico_kb = max(self.pico_kb, sum(rss for rss in actuales if rss))
+            if self._fin.wait(self.intervalo):
+                return
+
+    def __enter__(self):
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        self._hilo.join()
+        if not self.pico_kb and self.pids == [os.getpid()]:
+            import resource  # sin /proc (macOS): el pico de todo el proceso
+            self.pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentil(valores, q):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(q * len(ordenados)) - 1)]
+
+
+def _resumen(muestras, duracion):
+    tiempos = [m['ms'] for m in muestras]
+    consultas = [m['consultas'] for m in muestras if m['consultas'] is not None]
+    return {
+        'peticiones': len(muestras),
+        'errores': sum(1 for m in muestras if m['estado'] >= 400),
+        'rps': round(len(muestras) / duracion, 2) if duracion else None,
+        'p50_ms': round(percentil(tiempos, 0.5), 2) if tiempos else None,
+        'p99_ms': round(percentil(tiempos, 0.99), 2) if tiempos else None,
+        'consultas_p50': percentil(consultas, 0.5),
+        'consultas_max': max(consultas) if consultas else None,
+        'bytes_promedio': round(sum(m['bytes'] for m in muestras) / len(muestras)) if muestras else 0,
+    }
+
+
+def ejecutar(escenario, contexto, fabrica_sesion, peticiones, concurrencia=4, semilla=1, pids=None):
+    """
+    Corre `peticiones` operaciones del escenario repartidas en `concurrencia`
+    hilos y devuelve throughput, latencias, consultas y pico de RSS de `pids`
+    (por defecto este proceso), en total y por operación. Cada hilo hace
+    login al empezar (fuera de la medición).
+    """
+    pesos = ESCENARIOS[escenario]
+    nombres, ponderaciones = list(pesos), list(pesos.values())
+    restantes = [peticiones]
+    lock = threading.Lock()
+    muestras = []
+    fallos = []
+
+    def trabajar(numero):
+        trabajador = Trabajador(fabrica_sesion(), contexto, random.Random(semilla * 1000 + numero))
+        try:
+            if login(trabajador).estado != 200:
+                raise RuntimeError(f'No se pudo iniciar sesión como {contexto.usuario!r}.')
+            propias = []
+            while True:
+                with lock:
+                    if restantes[0] <= 0:
+                        break
+                    restantes[0] -= 1
+                nombre = trabajador.rnd.choices(nombres, ponderaciones)[0]
+                inicio = time.perf_counter()
+                respuesta = OPERACIONES[nombre](trabajador)
+                propias.append({
+                    'operacion': nombre,
+                    'ms': (time.perf_counter() - inicio) * 1000,
+                    'estado': respuesta.estado,
+                    'consultas': respuesta.consultas,
+                    'bytes': len(respuesta.cuerpo),
+                })
+            with lock:
+                muestras.extend(propias)
+        except Exception as exc:
+            fallos.append(exc)
+        finally:
+            trabajador.sesion.cerrar()
+
+    pids = [os.getpid()] if pids is None else pids
+    with MuestreoMemoria(pids) as memoria:
+        inicio = time.perf_counter()
+        hilos = [threading.Thread(target=trabajar, args=(i,)) for i in range(concurrencia)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+    if fallos:
+        raise fallos[0]
+
+    resultado = _resumen(muestras, duracion)
+    resultado['duracion_s'] = round(duracion, 2)
+    resultado['rss_pico_mb'] = round(memoria.pico_kb / 1024, 1) if pids else None
+    resultado['operaciones'] = {
+        nombre: _resumen([m for m in muestras if m['operacion'] == nombre], duracion)
+        for nombre in nombres if any(m['operacion'] == nombre for m in muestras)
+    }
+    return resultado
+
+
+def limpiar_altas(prefijo):
+    """Borra las pólizas y partes creadas por las operaciones de alta de una corrida."""
+    _, por_modelo = Poliza.objects.filter(numero__startswith=f'{prefijo}-').delete()
+    Contratante.objects.filter(documento__startswith=f'{prefijo}-C-').delete()
+    Asegurado.objects.filter(documento__startswith=f'{prefijo}-A-').delete()
+    return por_modelo.get(Poliza._meta.label, 0)
+
+
+def nuevo_prefijo():
+    return f'CARGA-{uuid.uuid4().hex[:8].upper()}'
@@ -0,0 +1,158 @@
+import json
+import os
+import secrets
+import subprocess
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api import carga
+
+USUARIO_CARGA = 'carga-benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de la API por escenarios (autenticación, consulta, alta, exportación, oficina), '
+        'en el mismo proceso o contra un servidor en marcha. Guarda los resultados en JSON para comparar '
+        'corridas entre commits. Conviene generar antes una cartera con generar_cartera.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escenarios', default=','.join(carga.ESCENARIOS),
+                            help=f"Separados por comas: {', '.join(carga.ESCENARIOS)}.")
+        parser.add_argument('--peticiones', type=int, default=300, help='Peticiones por escenario.')
+        parser.add_argument('--concurrencia', type=int, default=4, help='Hilos que piden en paralelo.')
+        parser.add_argument('--url', default=None,
+                            help='Servidor a probar (p. ej. http://localhost:8000); sin él, en el mismo proceso.')
+        parser.add_argument('--pid', type=int, action='append', default=None,
+                            help='Con --url: procesos del servidor cuyo RSS se mide (repetible, p. ej. los workers).')
+        parser.add_argument('--usuario', default=None,
+                            help=f'Usuario para el login; por defecto se activa {USUARIO_CARGA!r} '
+                                 'con una clave nueva y se desactiva al terminar.')
+        parser.add_argument('--clave', default=None)
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--salida', default=None,
+                            help='Archivo JSON de resultados (por defecto carga-<commit>.json).')
+        parser.add_argument('--comparar', default=None,
+                            help='JSON de una corrida anterior para mostrar la diferencia.')
+        parser.add_argument('--conservar-altas', action='store_true',
+                            help='No borra las pólizas creadas por las operaciones de alta.')
+
+    def handle(self, *args, **options):
+        escenarios = [e.strip() for e in options['escenarios'].split(',') if e.strip()]
+        desconocidos = [e for e in escenarios if e not in carga.ESCENARIOS]
+        if desconocidos:
+            raise CommandError(f"Escenarios desconocidos: {', '.join(desconocidos)}.")
+
+        usuario, clave = self._credenciales(options)
+        contexto = None
+        try:
+            contexto = carga.Contexto(usuario, clave, carga.nuevo_prefijo())
+            if not contexto.poliza_ids or not contexto.aseguradora_ids:
+                raise CommandError('No hay pólizas: genere una cartera antes con "manage.py generar_cartera".')
+
+            if options['url']:
+                fabrica = lambda: carga.SesionHttp(options['url'])  # noqa: E731
+                pids = options['pid'] or []  # sin --pid no se mide el servidor
+            else:
+                fabrica = carga.SesionLocal
+                pids = None
+
+            commit = self._commit()
+            resultados = {
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'commit': commit,
+                'modo': options['url'] or 'local',
+                'polizas': contexto.polizas,
+                'peticiones': options['peticiones'],
+                'concurrencia': options['concurrencia'],
+                'escenarios': {},
+            }
+            for escenario in escenarios:
+                self.stdout.write(f'Escenario {escenario}...')
+                resultado = carga.ejecutar(
+                    escenario, contexto, fabrica, options['peticiones'],
+                    concurrencia=options['concurrencia'], semilla=options['semilla'], pids=pids,
+                )
+                resultados['escenarios'][escenario] = resultado
+                self._mostrar(escenario, resultado)
+        finally:
+            if contexto is not None and not options['conservar_altas']:
+                carga.limpiar_altas(contexto.prefijo_altas)
+            if not options['usuario']:
+                self._retirar_usuario()
+
+        salida = options['salida'] or f"carga-{commit or datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+        with open(salida, 'w') as archivo:
+            json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {salida}.'))
+
+        if options['comparar']:
+            self._comparar(options['comparar'], resultados)
+
+    def _credenciales(self, options):
+        if options['usuario']:
+            if not options['clave']:
+                raise CommandError('Con --usuario hay que indicar --clave.')
+            return options['usuario'], options['clave']
+        User = get_user_model()
+        usuario, _ = User.objects.get_or_create(
+            username=USUARIO_CARGA, defaults={'rol': 'admin', 'is_staff': True, 'first_name': 'Carga'},
+        )
+        clave = secrets.token_urlsafe(16)
+        usuario.set_password(clave)
+        usuario.is_active = True
+        usuario.save()
+        return USUARIO_CARGA, clave
+
+    @staticmethod
+    def _retirar_usuario():
+        # La cuenta temporal es staff: no queda utilizable entre corridas
+        usuario = get_user_model().objects.get(username=USUARIO_CARGA)
+        usuario.set_unusable_password()
+        usuario.is_active = False
+        usuario.save(update_fields=['password', 'is_active'])
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _mostrar(self, escenario, resultado):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"  {resultado['rps']} pet/s, p50 {resultado['p50_ms']} ms, p99 {resultado['p99_ms']} ms, "
+            f"{resultado['errores']} errores, RSS pico {resultado['rss_pico_mb']} MB"
+        ))
+        for nombre, operacion in resultado['operaciones'].items():
+            self.stdout.write(
+                f"    {nombre:<30} {operacion['peticiones']:>5} pet  p50 {operacion['p50_ms']:>8} ms  "
+                f"p99 {operacion['p99_ms']:>8} ms  consultas {operacion['consultas_p50']} "
+                f"(máx {operacion['consultas_max']})  errores {operacion['errores']}"
+            )
+
+    def _comparar(self, ruta, actuales):
+        try:
+            with open(ruta) as archivo:
+                anteriores = json.load(archivo)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'No se pudo leer {ruta}: {exc}')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Comparación con {anteriores.get('commit') or ruta} ({anteriores.get('polizas')} pólizas)"
+        ))
+        for escenario, actual in actuales['escenarios'].items():
+            anterior = anteriores.get('escenarios', {}).get(escenario)
+            if not anterior:
+                continue
+            cambios = []
+            for campo in ('rps', 'p50_ms', 'p99_ms', 'rss_pico_mb'):
+                if anterior.get(campo) and actual.get(campo) is not None:
+                    cambios.append(f"{campo} {anterior[campo]} -> {actual[campo]} "
+                                   f"({(actual[campo] / anterior[campo] - 1) * 100:+.0f}%)")
+            self.stdout.write(f"  {escenario}: {', '.join(cambios)}")
@@ -0,0 +1,81 @@
+import gc
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.v1.proyecciones import POLIZA_LISTA
+from api.v1.serializers import PolizaSerializer
+from polizas.consultas import polizas_reporte
+from polizas.sintetico import generar_cartera
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara PolizaSerializer contra la proyección .values() de los listados '
+        'sobre una cartera sintética que se descarta al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=10000)
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        filas = options['filas']
+        with transaction.atomic():
+            self.stdout.write(f'Generando {filas} pólizas sintéticas...')
+            generar_cartera(filas, prefijo='BENCHSER')
+            queryset = polizas_reporte({}).filter(numero__startswith='BENCHSER-').order_by('fecha_inicio', 'id')
+
+            def serializador():
+                return PolizaSerializer(list(queryset.all()), many=True).data
+
+            def proyeccion():
+                return POLIZA_LISTA.mapear_todas(list(POLIZA_LISTA.aplicar(queryset.all())))
+
+            # Mismo JSON byte a byte: si no, la comparación no vale
+            if json.dumps(serializador()) != json.dumps(proyeccion()):
+                raise CommandError('La proyección no produce el mismo JSON que PolizaSerializer.')
+
+            # Por separado, solo la conversión a dicts (sin la consulta)
+            instancias = list(queryset.all())
+            valores = list(POLIZA_LISTA.aplicar(queryset))
+            resultados = (
+                ('PolizaSerializer', serializador,
+                 lambda: PolizaSerializer(instancias, many=True).data),
+                ('Proyección .values()', proyeccion,
+                 lambda: POLIZA_LISTA.mapear_todas(valores)),
+            )
+            tiempos = {}
+            for nombre, total, conversion in resultados:
+                tiempos[nombre] = (
+                    self._medir(total, options['repeticiones']),
+                    self._medir(conversion, options['repeticiones']),
+                )
+                self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+                self.stdout.write(f'  consulta + serialización: {tiempos[nombre][0]:.0f} ms')
+                self.stdout.write(f'  solo serialización: {tiempos[nombre][1]:.0f} ms')
+
+            antes, despues = tiempos['PolizaSerializer'], tiempos['Proyección .values()']
+            self.stdout.write(self.style.SUCCESS(
+                f'Aceleración: {antes[0] / despues[0]:.1f}x total, {antes[1] / despues[1]:.1f}x en serialización.'
+            ))
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _medir(funcion, repeticiones):
+        # Como timeit: sin recolector de basura, que con decenas de miles de
+        # objetos vivos se dispara en momentos arbitrarios y ensucia la medición
+        tiempos = []
+        for _ in range(repeticiones):
+            gc.collect()
+            gc.disable()
+            try:
+                inicio = time.perf_counter()
+                funcion()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            finally:
+                gc.enable()
+        return statistics.median(tiempos)
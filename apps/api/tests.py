@@ -1,3 +1,769 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polizas import cambios
+from polizas.catalogos import en_memoria, versiones
+from polizas.models import Asegurado, Aseguradora, Contratante, FormaPago, Poliza, Ramo, ReporteGenerado
+from polizas.sintetico import generar_cartera
+from reportes import resumenes
+from usuarios.accesos import accesos
+from usuarios.tokens import RefreshToken, lista_negra
+
+from .v1 import urls as api_urls
+from .v1.pagination import KeysetPagination
+
+User = get_user_model()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PresupuestoConsultasTests(TestCase):
+    """
+    Cada endpoint de api.v1.urls declara cuántas consultas puede hacer, y esa
+    cantidad no puede depender del tamaño de los datos: se mide con una
+    cartera chica y otra varias veces más grande y las dos deben coincidir y
+    caber en el presupuesto. Un N+1 hace crecer la segunda medición.
+
+    Las cachés del proceso (usuario del JWT, catálogos, lista negra, búfer de
+    last_login) se reinician antes de cada petición para medir siempre el
+    camino completo; los catálogos en memoria, en cambio, se cargan antes.
+    """
+    TAMANOS = (4, 40)
+    CLAVE = 'clave-presupuesto'
+
+    # (ruta, método) -> consultas máximas por petición; tras el método, la variante medida.
+    # Las escrituras que abren su propia transacción cuentan aquí SAVEPOINT y
+    # RELEASE, porque el TestCase ya las envuelve en una.
+    PRESUPUESTOS = {
+        ('token_obtain_pair', 'POST'): 2,
+        ('token_refresh', 'POST'): 7,
+        ('token_verify', 'POST'): 1,
+        ('logout', 'POST'): 8,
+        ('user-profile', 'GET'): 1,
+        ('user-list', 'GET'): 2,
+        ('user-detail', 'GET'): 2,
+        ('poliza-list', 'GET'): 4,
+        ('poliza-list', 'GET paginado'): 4,
+        ('poliza-list', 'POST'): 12,
+        ('poliza-importar', 'POST'): 22,
+        ('poliza-detail', 'GET'): 2,
+        ('poliza-detail', 'PATCH'): 7,
+        ('poliza-detail', 'DELETE'): 8,
+        ('poliza-lote', 'POST obtener'): 2,
+        ('poliza-lote', 'POST actualizar'): 9,
+        ('poliza-lote', 'POST eliminar'): 10,
+        ('poliza-cambios', 'GET'): 7,
+        ('poliza-proximas-vencer', 'GET'): 4,
+        ('poliza-proximas-vencer-excel', 'GET'): 4,
+        ('poliza-opciones', 'GET'): 7,
+        ('poliza-opciones-catalogo', 'GET'): 3,
+        ('generar-reporte', 'POST'): 2,
+        ('reporte-detalle', 'GET'): 2,
+        ('reporte-descargar', 'GET'): 2,
+        ('reporte-historial', 'GET'): 2,
+        ('reporte-consulta', 'GET'): 4,
+        ('reporte-excel', 'GET'): 4,
+        ('reporte-analitica', 'GET'): 2,
+        ('metricas', 'GET'): 1,
+        ('aseguradora-list', 'GET'): 2,
+        ('aseguradora-list', 'POST'): 5,
+        ('aseguradora-detail', 'GET'): 2,
+        ('ramo-list', 'GET'): 2,
+        ('ramo-detail', 'GET'): 2,
+        ('contratante-list', 'GET'): 2,
+        ('contratante-buscar', 'GET'): 5,
+        ('contratante-detail', 'GET'): 2,
+        ('asegurado-list', 'GET'): 2,
+        ('asegurado-buscar', 'GET'): 5,
+        ('asegurado-detail', 'GET'): 2,
+        ('formapago-list', 'GET'): 2,
+        ('formapago-detail', 'GET'): 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='presupuesto', password=cls.CLAVE, rol='admin', is_staff=True, first_name='Pres',
+        )
+
+    def sembrar(self, ronda, tamano):
+        generar_cartera(tamano, aseguradoras=tamano, ramos=tamano, usuario=self.admin, prefijo=f'Q{ronda}')
+        User.objects.bulk_create([User(username=f'q{ronda}-{i}', rol='analista') for i in range(tamano)])
+        ReporteGenerado.objects.bulk_create([
+            ReporteGenerado(usuario=self.admin, tipo_reporte='polizas', parametros={}) for _ in range(tamano)
+        ])
+
+    def peticiones(self, ronda):
+        """(ruta, método, kwargs de la URL, datos, estado esperado) para la cartera de la ronda."""
+        polizas = Poliza.objects.filter(numero__startswith=f'Q{ronda}-').order_by('id')
+        poliza = polizas.first()
+        a_borrar = polizas.last()
+        reporte = ReporteGenerado.objects.filter(usuario=self.admin).first()
+        en_lote = [pk for pk in polizas.values_list('id', flat=True) if pk != a_borrar.pk]
+        # Copias de una misma póliza: el borrado en lote toca una sola fila de ResumenPrimas
+        copias = []
+        for i in range(3):
+            copia = Poliza.objects.get(pk=poliza.pk)
+            copia.pk, copia.numero = None, f'Q{ronda}-LOTE-{i}'
+            copia._state.adding = True
+            copia.save()
+            copias.append(copia.pk)
+        refresh, verificar, salir = (RefreshToken.for_user(self.admin) for _ in range(3))
+        # Catálogos nuevos: las altas siempre crean su fila de ResumenPrimas
+        aseguradora = Aseguradora.objects.create(nombre=f'Q{ronda} Altas')
+        ramo = Ramo.objects.create(nombre=f'Q{ronda} Altas')
+        csv = (
+            'numero,aseguradora,ramo,forma_pago,fecha_inicio,fecha_fin,prima_total,monto_asegurado,renovacion,'
+            'contratante_documento,contratante_nombre,asegurado_documento,asegurado_nombre\n'
+            + ''.join(
+                f'Q{ronda}-IMP-{i},{aseguradora.nombre},{ramo.nombre},Trimestral,2024-01-01,2025-01-01,100.00,5000.00,'
+                f'2025-01-01,Q{ronda}-IMPC-{i},Contratante {i},Q{ronda}-IMPA-{i},Asegurado {i}\n'
+                for i in range(3)
+            )
+        )
+        archivo = SimpleUploadedFile('polizas.csv', csv.encode(), content_type='text/csv')
+        alta = {
+            'numero': f'Q{ronda}-ALTA',
+            'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-01-01', 'renovacion': '2025-01-01',
+            'prima_total': '1000.00', 'monto_asegurado': '50000.00',
+            'aseguradora_id': aseguradora.id, 'ramo_id': ramo.id, 'forma_pago_id': poliza.forma_pago_id,
+            'contratante': {'nombre': 'Alta', 'documento': f'Q{ronda}-ALTAC', 'telefono': '0'},
+            'asegurado': {'nombre': 'Alta', 'documento': f'Q{ronda}-ALTAA', 'telefono': '0'},
+        }
+        return [
+            ('token_obtain_pair', 'POST', {}, {'username': 'presupuesto', 'password': self.CLAVE}, 200),
+            ('token_refresh', 'POST', {}, {'refresh': str(refresh)}, 200),
+            ('token_verify', 'POST', {}, {'token': str(verificar)}, 200),
+            ('logout', 'POST', {}, {'refresh': str(salir)}, 200),
+            ('user-profile', 'GET', {}, None, 200),
+            ('user-list', 'GET', {}, None, 200),
+            ('user-detail', 'GET', {'pk': self.admin.pk}, None, 200),
+            ('poliza-list', 'GET', {}, None, 200),
+            ('poliza-list', 'GET paginado', {}, {'page_size': 50}, 200),
+            ('poliza-list', 'POST', {}, alta, 201),
+            ('poliza-importar', 'POST', {}, {'archivo': archivo}, 201),
+            ('poliza-detail', 'GET', {'pk': poliza.pk}, None, 200),
+            ('poliza-detail', 'PATCH', {'pk': poliza.pk}, {'prima_total': '2000.00'}, 200),
+            ('poliza-detail', 'DELETE', {'pk': a_borrar.pk}, None, 204),
+            ('poliza-lote', 'POST obtener', {}, {'operacion': 'obtener', 'ids': en_lote}, 200),
+            ('poliza-lote', 'POST actualizar', {}, {
+                'operacion': 'actualizar', 'cambios': [{'id': pk, 'renovacion': '2026-01-01'} for pk in en_lote],
+            }, 200),
+            ('poliza-lote', 'POST eliminar', {}, {'operacion': 'eliminar', 'ids': copias}, 200),
+            ('poliza-cambios', 'GET', {}, None, 200),
+            ('poliza-proximas-vencer', 'GET', {}, {'fecha': '2020-01-01'}, 200),
+            ('poliza-proximas-vencer-excel', 'GET', {}, {'fecha': '2020-01-01'}, 200),
+            ('poliza-opciones', 'GET', {}, None, 200),
+            ('poliza-opciones-catalogo', 'GET', {'catalogo': 'aseguradoras'}, None, 200),
+            ('generar-reporte', 'POST', {}, {'tipo_reporte': 'polizas', 'parametros': {}}, 202),
+            ('reporte-detalle', 'GET', {'pk': reporte.pk}, None, 200),
+            ('reporte-descargar', 'GET', {'pk': reporte.pk}, None, 409),
+            ('reporte-historial', 'GET', {}, None, 200),
+            ('reporte-consulta', 'GET', {}, None, 200),
+            ('reporte-excel', 'GET', {}, None, 200),
+            ('reporte-analitica', 'GET', {}, {'agrupar': 'aseguradora,mes'}, 200),
+            ('metricas', 'GET', {}, None, 200),
+            ('aseguradora-list', 'GET', {}, None, 200),
+            ('aseguradora-list', 'POST', {}, {'nombre': f'Q{ronda} Nueva'}, 201),
+            ('aseguradora-detail', 'GET', {'pk': poliza.aseguradora_id}, None, 200),
+            ('ramo-list', 'GET', {}, None, 200),
+            ('ramo-detail', 'GET', {'pk': poliza.ramo_id}, None, 200),
+            ('contratante-list', 'GET', {}, None, 200),
+            ('contratante-buscar', 'GET', {}, {'q': 'sin coincidencias'}, 200),
+            ('contratante-detail', 'GET', {'pk': poliza.contratante_id}, None, 200),
+            ('asegurado-list', 'GET', {}, None, 200),
+            ('asegurado-buscar', 'GET', {}, {'q': 'sin coincidencias'}, 200),
+            ('asegurado-detail', 'GET', {'pk': poliza.asegurado_id}, None, 200),
+            ('formapago-list', 'GET', {}, None, 200),
+            ('formapago-detail', 'GET', {'pk': FormaPago.objects.values_list('id', flat=True).first()}, None, 200),
+        ]
+
+    def medir(self, ruta, metodo, kwargs, datos):
+        cache.clear()
+        lista_negra.sincronizado = None
+        lista_negra.vencimientos.clear()
+        lista_negra.piso_id = 0
+        accesos.volcar()
+        # Los catálogos en memoria sí se miden cargados, como quedan en régimen
+        for catalogo in en_memoria.values():
+            catalogo.filas()
+        url = reverse(ruta, kwargs=kwargs)
+        token = str(RefreshToken.for_user(self.admin).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        with CaptureQueriesContext(connection) as capturadas:
+            if metodo.startswith('GET'):
+                response = self.client.get(url, datos)
+            elif ruta == 'poliza-importar':
+                response = self.client.post(url, datos)
+            else:
+                cuerpo = json.dumps(datos) if datos is not None else ''
+                response = self.client.generic(metodo.split()[0], url, data=cuerpo, content_type='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, [consulta['sql'] for consulta in capturadas.captured_queries]
+
+    def test_todas_las_rutas_tienen_presupuesto(self):
+        nombres = {patron.name for patron in api_urls.urlpatterns}
+        declarados = {ruta for ruta, _ in self.PRESUPUESTOS}
+        self.assertEqual(sorted(nombres - declarados), [], 'Rutas sin presupuesto de consultas en PRESUPUESTOS')
+
+    def test_consultas_no_dependen_del_tamano(self):
+        mediciones = {}
+        for ronda, tamano in enumerate(self.TAMANOS):
+            self.sembrar(ronda, tamano)
+            for ruta, metodo, kwargs, datos, estado in self.peticiones(ronda):
+                response, consultas = self.medir(ruta, metodo, kwargs, datos)
+                if response.status_code != estado:
+                    self.fail(f'{metodo} {ruta}: {response.status_code} {response.content[:300]!r}')
+                mediciones.setdefault((ruta, metodo), []).append(consultas)
+
+        self.assertEqual(
+            sorted(set(self.PRESUPUESTOS) - set(mediciones)), [], 'Presupuestos sin petición que los mida'
+        )
+        for clave, (chica, grande) in mediciones.items():
+            ruta, metodo = clave
+            with self.subTest(ruta=ruta, metodo=metodo):
+                presupuesto = self.PRESUPUESTOS[clave]
+                sql = '\n'.join(f'  {i}. {consulta}' for i, consulta in enumerate(grande, 1))
+                self.assertEqual(
+                    len(chica), len(grande),
+                    f'{metodo} {ruta}: {len(chica)} consultas con {self.TAMANOS[0]} pólizas y '
+                    f'{len(grande)} con {self.TAMANOS[1]}:\n{sql}',
+                )
+                self.assertLessEqual(
+                    len(grande), presupuesto,
+                    f'{metodo} {ruta}: {len(grande)} consultas, presupuesto {presupuesto}:\n{sql}',
+                )
+
+
+class AltaConcurrenteTests(TransactionTestCase):
+    """
+    Varias altas simultáneas con el mismo contratante y asegurado nuevos: todas
+    deben crearse sin IntegrityError, reutilizando una única fila por documento
+    y con una sola sentencia por parte (dos en SQLite cuando la parte ya existía).
+    """
+    HILOS = 8
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # La base de pruebas en memoria usa caché compartida: las escrituras
+            # simultáneas fallan con SQLITE_LOCKED sin esperar el busy timeout
+            self.skipTest('requiere PostgreSQL o SQLite en archivo (TEST NAME)')
+        self.usuario = User.objects.create_user(username='concurrente', password='x', rol='admin', is_staff=True)
+        self.aseguradora = Aseguradora.objects.create(nombre='Concurrente')
+        self.ramo = Ramo.objects.create(nombre='Concurrente')
+        self.forma_pago = FormaPago.objects.create(nombre='Anual')
+        self.token = str(RefreshToken.for_user(self.usuario).access_token)
+
+    def alta(self, i):
+        return {
+            'numero': f'CONC-{i}',
+            'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-01-01', 'renovacion': '2025-01-01',
+            'prima_total': '1000.00', 'monto_asegurado': '50000.00',
+            'aseguradora_id': self.aseguradora.id, 'ramo_id': self.ramo.id, 'forma_pago_id': self.forma_pago.id,
+            'contratante': {'nombre': f'Contratante {i}', 'documento': 'V-1000', 'telefono': '0'},
+            'asegurado': {'nombre': f'Asegurado {i}', 'documento': 'V-2000', 'telefono': '0'},
+        }
+
+    def test_altas_simultaneas_con_el_mismo_documento(self):
+        barrera = threading.Barrier(self.HILOS)
+        resultados = [None] * self.HILOS
+
+        def enviar(i):
+            cliente = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            try:
+                barrera.wait()
+                with CaptureQueriesContext(connections['default']) as capturadas:
+                    response = cliente.post(reverse('poliza-list'), json.dumps(self.alta(i)),
+                                            content_type='application/json')
+                sentencias = {
+                    modelo: sum(connection.ops.quote_name(modelo._meta.db_table) in consulta['sql']
+                                 for consulta in capturadas.captured_queries)
+                    for modelo in (Contratante, Asegurado)
+                }
+                resultados[i] = (response.status_code, response.content, sentencias)
+            except Exception as exc:  # noqa: BLE001 - se informa en la aserción
+                resultados[i] = (None, repr(exc), {})
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=enviar, args=(i,)) for i in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        errores = [(estado, cuerpo) for estado, cuerpo, _ in resultados if estado != 201]
+        self.assertEqual(errores, [])
+        self.assertEqual(Poliza.objects.filter(numero__startswith='CONC-').count(), self.HILOS)
+        for modelo, documento in ((Contratante, 'V-1000'), (Asegurado, 'V-2000')):
+            parte = modelo.objects.get(documento=documento)
+            self.assertEqual(Poliza.objects.filter(**{modelo._meta.model_name: parte}).count(), self.HILOS)
+        maximo = 1 if connection.vendor == 'postgresql' else 2
+        for _, _, sentencias in resultados:
+            for modelo, cantidad in sentencias.items():
+                self.assertLessEqual(cantidad, maximo, f'{modelo.__name__}: {cantidad} sentencias')
+
+
+class ReporteDescargaTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        self.usuario = User.objects.create_user(username='descarga', password='x', rol='analista')
+        token = str(RefreshToken.for_user(self.usuario).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def reporte(self, tipo='polizas', estado=ReporteGenerado.COMPLETADO, usuario=None):
+        ruta = os.path.join(self.directorio, f'{tipo}.xlsx')
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'contenido')
+        return ReporteGenerado.objects.create(
+            usuario=usuario or self.usuario, tipo_reporte=tipo, estado=estado, archivo_path=ruta,
+        )
+
+    def descargar(self, reporte):
+        return self.client.get(reverse('reporte-descargar', kwargs={'pk': reporte.pk}))
+
+    def test_descarga_completado(self):
+        response = self.descargar(self.reporte())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'contenido')
+        self.assertIn('reporte_polizas.xlsx', response['Content-Disposition'])
+
+    def test_pendiente_no_disponible(self):
+        response = self.descargar(self.reporte(estado=ReporteGenerado.PENDIENTE))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['estado'], ReporteGenerado.PENDIENTE)
+
+    def test_tipo_antiguo(self):
+        self.assertEqual(self.descargar(self.reporte(tipo='historico')).status_code, 410)
+
+    def test_reporte_de_otro_usuario(self):
+        otro = User.objects.create_user(username='otro', password='x', rol='analista')
+        self.assertEqual(self.descargar(self.reporte(usuario=otro)).status_code, 404)
+
+
+class KeysetPaginacionTests(TestCase):
+
+    def setUp(self):
+        usuario = User.objects.create_user(username='paginas', password='x', rol='analista')
+        token = str(RefreshToken.for_user(usuario).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        self.url = reverse('poliza-list')
+
+    def recorrer(self, url, datos=None, enlace='next'):
+        paginas = []
+        while url:
+            response = self.client.get(url, datos)
+            self.assertEqual(response.status_code, 200, response.content)
+            cuerpo = response.json()
+            paginas.append([fila['id'] for fila in cuerpo['results']])
+            url, datos = cuerpo[enlace], None
+        return paginas
+
+    def test_paginas_sin_huecos_ni_repetidos(self):
+        generar_cartera(23, aseguradoras=2, ramos=2, prefijo='PAG')
+        # Empates en fecha_inicio justo sobre el borde de la primera página
+        primeras = list(Poliza.objects.order_by('id').values_list('id', flat=True)[:12])
+        Poliza.objects.filter(id__in=primeras).update(fecha_inicio=date(2021, 3, 1))
+        esperado = list(Poliza.objects.order_by('fecha_inicio', 'id').values_list('id', flat=True))
+
+        paginas = self.recorrer(self.url, {'page_size': 10})
+        self.assertEqual([len(pagina) for pagina in paginas], [10, 10, 3])
+        self.assertEqual([pk for pagina in paginas for pk in pagina], esperado)
+
+        # Hacia atrás desde la última página se recorren las mismas páginas
+        ultima = self.client.get(self.url, {'page_size': 10}).json()['next']
+        ultima = self.client.get(ultima).json()['next']
+        hacia_atras = self.recorrer(ultima, enlace='previous')
+        self.assertEqual(hacia_atras, paginas[::-1])
+
+    def test_cursor_alterado(self):
+        generar_cartera(3, aseguradoras=1, ramos=1, prefijo='CUR')
+        for cursor in ('no-es-base64!', 'eyJ2IjpbMV19', 'eyJ2IjpbIm5vLWVzLWZlY2hhIiwxXX0'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json())
+
+    def test_tamano_de_pagina_acotado(self):
+        generar_cartera(KeysetPagination.max_page_size + 5, aseguradoras=1, ramos=1, prefijo='MAX')
+        cuerpo = self.client.get(self.url, {'page_size': 100000}).json()
+        self.assertEqual(len(cuerpo['results']), KeysetPagination.max_page_size)
+        self.assertIn(f'page_size={KeysetPagination.max_page_size}', cuerpo['next'])
+        self.assertEqual(len(self.client.get(self.url, {'page_size': 'x'}).json()['results']),
+                         KeysetPagination.page_size)
+        # Sin cursor ni page_size la lista sigue completa, como antes de paginar
+        self.assertEqual(len(self.client.get(self.url).json()), KeysetPagination.max_page_size + 5)
+
+
+class CatalogosEtagTests(TestCase):
+
+    def setUp(self):
+        usuario = User.objects.create_user(username='catalogos', password='x', rol='analista')
+        token = str(RefreshToken.for_user(usuario).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            Aseguradora.objects.create(nombre='Etag Uno')
+            Ramo.objects.create(nombre='Etag Vida')
+
+    def opciones(self, catalogo=None, etag=None):
+        url = reverse('poliza-opciones-catalogo', kwargs={'catalogo': catalogo}) if catalogo else \
+            reverse('poliza-opciones')
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag) if etag else self.client.get(url)
+
+    def test_304_con_el_mismo_etag(self):
+        primera = self.opciones()
+        self.assertEqual(primera.status_code, 200)
+        self.assertIn('Etag Uno', [fila['nombre'] for fila in primera.json()['aseguradoras']])
+        segunda = self.opciones(etag=primera['ETag'])
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda.content, b'')
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+
+    def test_cambio_invalida_solo_su_catalogo(self):
+        todos = self.opciones()['ETag']
+        ramos = self.opciones('ramos')['ETag']
+        aseguradoras = self.opciones('aseguradoras')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Aseguradora.objects.filter(nombre='Etag Uno').get().delete()
+            Aseguradora.objects.create(nombre='Etag Dos')
+
+        response = self.opciones('aseguradoras', etag=aseguradoras)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([fila['nombre'] for fila in response.json()], ['Etag Dos'])
+        self.assertNotEqual(response['ETag'], aseguradoras)
+        self.assertEqual(self.opciones(etag=todos).status_code, 200)
+        self.assertEqual(self.opciones('ramos', etag=ramos).status_code, 304)
+
+    def test_version_se_incrementa_una_vez_en_la_transaccion(self):
+        antes = versiones()
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(3):
+                Contratante.objects.create(nombre=f'Etag {i}', documento=f'ETAG-{i}', telefono='0')
+            # El incremento va con el cambio, no espera al commit
+            self.assertEqual(versiones()['contratantes'], antes['contratantes'] + 1)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(versiones()['contratantes'], antes['contratantes'] + 1)
+
+    def test_rollback_descarta_el_incremento(self):
+        antes = versiones()
+        try:
+            with transaction.atomic():
+                Contratante.objects.create(nombre='Etag revertido', documento='ETAG-R', telefono='0')
+                raise DatabaseError('revertir')
+        except DatabaseError:
+            pass
+        self.assertEqual(versiones(), antes)
+        with self.captureOnCommitCallbacks():
+            Contratante.objects.create(nombre='Etag nuevo', documento='ETAG-N', telefono='0')
+        self.assertEqual(versiones()['contratantes'], antes['contratantes'] + 1)
+
+
+class ImportarPolizasTests(TestCase):
+
+    def setUp(self):
+        usuario = User.objects.create_user(username='importar', password='x', rol='admin', is_staff=True)
+        token = str(RefreshToken.for_user(usuario).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_archivos_invalidos_son_400(self):
+        for nombre, contenido in (
+            ('polizas.xlsx', b'PK\x03\x04 no es un libro'),
+            ('polizas.csv', 'numero,contratante_nombre\nP-1,Peña\n'.encode('cp1252')),
+            ('polizas.pdf', b'%PDF'),
+        ):
+            with self.subTest(nombre=nombre):
+                response = self.client.post(reverse('poliza-importar'),
+                                            {'archivo': SimpleUploadedFile(nombre, contenido)})
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn('detail', response.json())
+
+
+class AnaliticaPrimasTests(TestCase):
+
+    def setUp(self):
+        generar_cartera(9, aseguradoras=2, ramos=2, prefijo='ANA')
+        usuario = User.objects.create_user(username='analitica', password='x', rol='admin', is_staff=True)
+        token = str(RefreshToken.for_user(usuario).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_filtros_no_numericos_son_400(self):
+        for campo in ('aseguradora', 'ramo', 'forma_pago'):
+            with self.subTest(campo=campo):
+                response = self.client.get(reverse('reporte-analitica'), {campo: 'abc'})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(campo, response.json()['detail'])
+
+    def test_actualizacion_en_lote_mantiene_el_resumen(self):
+        aseguradora = Aseguradora.objects.order_by('id').first()
+        polizas = list(Poliza.objects.exclude(aseguradora=aseguradora).order_by('id')[:2])
+        response = self.client.post(reverse('poliza-lote'), {
+            'operacion': 'actualizar',
+            'cambios': [{'id': polizas[0].pk, 'aseguradora': aseguradora.pk},
+                        {'id': polizas[1].pk, 'prima_total': '777.77'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        totales = self.client.get(reverse('reporte-analitica'), {'agrupar': 'aseguradora,ramo,mes'}).json()
+        self.assertEqual(totales['totales']['polizas'], 9)
+        self.assertEqual(resumenes.diferencias(), [])
+        filtrado = self.client.get(reverse('reporte-analitica'), {'aseguradora': aseguradora.pk}).json()
+        self.assertEqual(filtrado['totales']['polizas'],
+                         Poliza.objects.filter(aseguradora=aseguradora).count())
+
+
+class ListaCondicionalTests(TestCase):
+    """ETag de los listados de pólizas: 304 mientras nada cambie, uno nuevo si cambia algo."""
+
+    def setUp(self):
+        # confirmada, como si la hubiera cargado otra transacción: los cambios
+        # del test vuelven a incrementar las versiones de los catálogos
+        with self.captureOnCommitCallbacks(execute=True):
+            generar_cartera(6, aseguradoras=2, ramos=2, prefijo='ETAG')
+        usuario = User.objects.create_user(username='condicional', password='x')
+        token = str(RefreshToken.for_user(usuario).access_token)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def etag(self, **params):
+        response = self.client.get(reverse('poliza-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNoModificado(self, etag, si_no_coincide=None, **params):
+        response = self.client.get(reverse('poliza-list'), params, HTTP_IF_NONE_MATCH=si_no_coincide or etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_304_con_etag_vigente(self):
+        etag = self.etag()
+        self.assertNoModificado(etag)
+        self.assertNoModificado(etag, si_no_coincide=f'"otro", {etag}')
+        # el orden de los parámetros y los vacíos no cambian la firma
+        aseguradora = str(Aseguradora.objects.order_by('id').first().pk)
+        filtrado = self.etag(aseguradora=aseguradora, ramo='')
+        self.assertNotEqual(filtrado, etag)
+        self.assertNoModificado(filtrado, aseguradora=aseguradora)
+
+    def test_cambio_en_relacionada_da_etag_nuevo(self):
+        etag = self.etag()
+        contratante = Poliza.objects.order_by('id').first().contratante
+        contratante.telefono = '555-0000'
+        contratante.save()
+        response = self.client.get(reverse('poliza-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNoModificado(response['ETag'])
+
+    def test_baja_da_etag_nuevo(self):
+        etag = self.etag()
+        Poliza.objects.order_by('id').first().delete()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_validadores_sin_joins(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.etag(aseguradora=str(Aseguradora.objects.order_by('id').first().pk))
+        agregado = next(c['sql'] for c in consultas.captured_queries if 'MAX(' in c['sql'])
+        self.assertNotIn('JOIN', agregado)
+
+
+class CatalogoVencidoTests(TransactionTestCase):
+    """
+    Otro proceso borra una fila de catálogo que este todavía tiene en memoria:
+    el alta y el lote responden error de validación en ese campo (no un 500
+    por la FK). Un cambio de nombre invalida la copia en memoria.
+    """
+
+    def setUp(self):
+        usuario = User.objects.create_user(username='vencido', password='x', rol='admin', is_staff=True)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(usuario).access_token}'
+        self.aseguradora = Aseguradora.objects.create(nombre='Vencida')
+        self.ramo = Ramo.objects.create(nombre='Vencido')
+        self.forma_pago = FormaPago.objects.create(nombre='Trimestral')
+        for catalogo in en_memoria.values():
+            catalogo.invalidar()
+            catalogo.filas()
+
+    def por_fuera(self, sql, *parametros):
+        # Sin pasar por el ORM: ni señales ni invalidación en este proceso
+        with connection.cursor() as cursor:
+            cursor.execute(sql, parametros)
+
+    def alta(self, **cambios):
+        datos = {
+            'numero': 'VENC-1',
+            'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-01-01', 'renovacion': '2025-01-01',
+            'prima_total': '100.01', 'monto_asegurado': '50000.00',
+            'aseguradora_id': self.aseguradora.id, 'ramo_id': self.ramo.id, 'forma_pago_id': self.forma_pago.id,
+            'contratante': {'nombre': 'Contratante', 'documento': 'V-1', 'telefono': '0'},
+            'asegurado': {'nombre': 'Asegurado', 'documento': 'V-2', 'telefono': '0'},
+            **cambios,
+        }
+        return self.client.post(reverse('poliza-list'), datos, content_type='application/json')
+
+    def test_aseguradora_borrada_es_400(self):
+        self.por_fuera(f'DELETE FROM {Aseguradora._meta.db_table} WHERE id = %s', self.aseguradora.id)
+        self.assertIn(self.aseguradora.id, en_memoria['aseguradoras'].filas())
+
+        response = self.alta()
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(list(response.json()), ['aseguradora_id'])
+        self.assertFalse(Poliza.objects.exists())
+        self.assertNotIn(self.aseguradora.id, en_memoria['aseguradoras'].filas())
+
+    def test_forma_pago_borrada_es_400(self):
+        self.por_fuera(f'DELETE FROM {FormaPago._meta.db_table} WHERE id = %s', self.forma_pago.id)
+        response = self.alta()
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(list(response.json()), ['forma_pago_id'])
+        self.assertFalse(Poliza.objects.exists())
+
+    def test_lote_con_ramo_borrado(self):
+        self.assertEqual(self.alta().status_code, 201)
+        self.assertEqual(self.alta(numero='VENC-2', contratante={'nombre': 'C', 'documento': 'V-3', 'telefono': '0'},
+                                   asegurado={'nombre': 'A', 'documento': 'V-4', 'telefono': '0'}).status_code, 201)
+        primera, segunda = Poliza.objects.order_by('id').values_list('id', flat=True)
+        borrado = Ramo.objects.create(nombre='Borrado')
+        en_memoria['ramos'].filas()
+        self.por_fuera(f'DELETE FROM {Ramo._meta.db_table} WHERE id = %s', borrado.id)
+
+        response = self.client.post(reverse('poliza-lote'), {'operacion': 'actualizar', 'cambios': [
+            {'id': primera, 'ramo_id': borrado.id},
+            {'id': segunda, 'prima_total': '80.00'},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        resultados = response.json()['resultados']
+        self.assertEqual([r['ok'] for r in resultados], [False, True])
+        self.assertEqual(list(resultados[0]['errores']), ['ramo_id'])
+        self.assertEqual(Poliza.objects.get(pk=primera).ramo_id, self.ramo.id)
+        self.assertEqual(Poliza.objects.get(pk=segunda).prima_total, Decimal('80.00'))
+        self.assertEqual(resumenes.diferencias(), [])
+
+    def test_cuotas_con_el_nombre_actual(self):
+        self.forma_pago.nombre = 'Semestral'
+        self.forma_pago.save()  # incrementa la versión e invalida la copia en memoria
+        self.assertEqual(en_memoria['formas_pago'].filas()[self.forma_pago.id].nombre, 'Semestral')
+
+        response = self.alta()
+        self.assertEqual(response.status_code, 201, response.content)
+        poliza = Poliza.objects.get(numero='VENC-1')
+        self.assertEqual((poliza.i_trimestre, poliza.ii_trimestre, poliza.iii_trimestre, poliza.iv_trimestre),
+                         (Decimal('50.01'), Decimal('0.00'), Decimal('50.00'), Decimal('0.00')))
+
+
+class PolizaLoteTests(TestCase):
+
+    def setUp(self):
+        generar_cartera(6, aseguradoras=2, ramos=2, prefijo='LOTE')
+        usuario = User.objects.create_user(username='lote', password='x', rol='admin', is_staff=True)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(usuario).access_token}'
+
+    def lote(self, datos):
+        return self.client.post(reverse('poliza-lote'), json.dumps(datos), content_type='application/json')
+
+    def test_cuerpo_que_no_es_objeto_es_400(self):
+        for datos in ([1, 2], 'eliminar', 3, None):
+            with self.subTest(datos=datos):
+                response = self.lote(datos)
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn('detail', response.json())
+        self.assertEqual(self.lote({'operacion': 'borrar'}).status_code, 400)
+        self.assertEqual(self.lote({'operacion': 'actualizar', 'cambios': [1]}).status_code, 400)
+        self.assertEqual(self.lote({'operacion': 'eliminar', 'ids': ['1']}).status_code, 400)
+
+    def test_eliminar(self):
+        primera, segunda = Poliza.objects.order_by('id').values_list('id', flat=True)[:2]
+        response = self.lote({'operacion': 'eliminar', 'ids': [primera, 999999, primera, segunda]})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([(r['id'], r['ok']) for r in response.json()['resultados']],
+                         [(primera, True), (999999, False), (primera, False), (segunda, True)])
+        self.assertFalse(Poliza.objects.filter(pk__in=[primera, segunda]).exists())
+        self.assertEqual(resumenes.diferencias(), [])
+
+
+@patch.object(cambios, 'MARGEN', 0)
+class PolizaCambiosTests(TestCase):
+    """Feed de cambios: ida y vuelta del cursor, bajas, lotes truncados y cursor vencido."""
+
+    def setUp(self):
+        generar_cartera(9, aseguradoras=2, ramos=2, prefijo='FEED')
+        usuario = User.objects.create_user(username='feed', password='x')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(usuario).access_token}'
+
+    def feed(self, **params):
+        response = self.client.get(reverse('poliza-cambios'), params)
+        self.assertEqual(response.status_code, 200)
+        lineas = [json.loads(linea) for linea in b''.join(response.streaming_content).splitlines()]
+        final = lineas.pop()
+        self.assertEqual(final['tipo'], 'cursor')
+        return lineas, final
+
+    def test_ida_y_vuelta_del_cursor(self):
+        lineas, final = self.feed()
+        self.assertTrue(final['completo'])
+        self.assertEqual(
+            {tipo: sum(linea['tipo'] == tipo for linea in lineas) for tipo in ('contratante', 'asegurado', 'poliza')},
+            {'contratante': Contratante.objects.count(), 'asegurado': Asegurado.objects.count(), 'poliza': 9},
+        )
+
+        cambiada, borrada = Poliza.objects.order_by('id')[:2]
+        cambiada.monto_asegurado += 1
+        cambiada.save()
+        borrada_id = borrada.pk
+        borrada.delete()
+        lineas, final = self.feed(cursor=final['cursor'])
+        self.assertEqual(
+            [(linea['tipo'], linea['accion'], linea['id']) for linea in lineas],
+            [('poliza', 'cambio', cambiada.pk), ('poliza', 'baja', borrada_id)],
+        )
+
+        lineas, final = self.feed(cursor=final['cursor'])
+        self.assertEqual((lineas, final['completo']), ([], True))
+
+    def test_truncado_no_adelanta_los_flujos_siguientes(self):
+        entregadas, cursor, pedidos = [], None, 0
+        while True:
+            lineas, final = self.feed(limite=2, **({'cursor': cursor} if cursor else {}))
+            pedidos += 1
+            tipos = [linea['tipo'] for linea in lineas]
+            if not final['completo']:
+                # nada después del flujo que llegó al límite
+                self.assertEqual(tipos[-2:], [tipos[-1]] * 2)
+            entregadas.extend((linea['tipo'], linea['id']) for linea in lineas)
+            cursor = final['cursor']
+            if final['completo']:
+                break
+        self.assertEqual(len(entregadas), len(set(entregadas)))
+        self.assertEqual(sum(tipo == 'poliza' for tipo, _ in entregadas), 9)
+        # cada póliza llega después de su contratante y su asegurado
+        for poliza in Poliza.objects.all():
+            posicion = entregadas.index(('poliza', poliza.pk))
+            self.assertLess(entregadas.index(('contratante', poliza.contratante_id)), posicion)
+            self.assertLess(entregadas.index(('asegurado', poliza.asegurado_id)), posicion)
+        self.assertGreater(pedidos, 5)
+
+    def test_cursor_vencido_e_invalido(self):
+        viejo = cambios.Cursor(corte=timezone.now() - timedelta(days=cambios.RETENCION_DIAS + 1))
+        response = self.client.get(reverse('poliza-cambios'), {'cursor': viejo.codificar()})
+        self.assertEqual(response.status_code, 410)
+        for cursor in ('no-es-un-cursor', 'e30'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(reverse('poliza-cambios'), {'cursor': cursor}).status_code, 400)
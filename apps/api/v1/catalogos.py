@@ -0,0 +1,46 @@
+"""
+Catálogos del formulario de pólizas serializados una sola vez por versión.
+
+El JSON ya renderizado se guarda en la caché de Django bajo
+(catálogo, versión); mientras la versión no cambie se reutilizan los bytes
+tal cual, sin consultar la tabla ni pasar por los serializadores.
+"""
+import hashlib
+
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from polizas.catalogos import CATALOGOS
+
+from .serializers import (
+    AseguradoSerializer,
+    AseguradoraSerializer,
+    ContratanteSerializer,
+    FormaPagoSerializer,
+    RamoSerializer,
+)
+
+SERIALIZADORES = {
+    'aseguradoras': AseguradoraSerializer,
+    'ramos': RamoSerializer,
+    'contratantes': ContratanteSerializer,
+    'asegurados': AseguradoSerializer,
+    'formas_pago': FormaPagoSerializer,
+}
+# Las claves incluyen la versión, así que el TTL solo sirve para liberar memoria
+TTL = 24 * 60 * 60
+
+
+def catalogo_json(nombre, version):
+    clave = f'opciones:{nombre}:{version}'
+    contenido = cache.get(clave)
+    if contenido is None:
+        queryset = CATALOGOS[nombre].objects.order_by('id')
+        contenido = JSONRenderer().render(SERIALIZADORES[nombre](queryset, many=True).data)
+        cache.set(clave, contenido, TTL)
+    return contenido
+
+
+def etag(versiones):
+    firma = ';'.join(f'{nombre}:{version}' for nombre, version in sorted(versiones.items()))
+    return '"%s"' % hashlib.md5(firma.encode()).hexdigest()
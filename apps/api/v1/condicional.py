@@ -0,0 +1,80 @@
+"""
+GET condicional (ETag / Last-Modified) para los listados.
+
+Los validadores salen de una consulta agregada sobre la tabla del listado
+sola, con las mismas filas que devolvería (o la página, si se pagina por
+cursor): el `actualizado` más reciente, que el índice por actualizado
+resuelve, y la cantidad de filas, que cambia si se borra una. Los cambios en
+tablas relacionadas no se buscan con joins: entran por las versiones de
+VersionCatalogo (polizas.catalogos), que cada alta, cambio o baja de un
+catálogo o de una parte incrementa. Si el cliente ya tiene esa versión se
+responde 304 sin leer ni serializar filas.
+"""
+import hashlib
+from calendar import timegm
+from urllib.parse import urlencode
+
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from polizas.catalogos import versiones
+
+
+def validadores(queryset):
+    """(actualizado más reciente, cantidad) de `queryset`, en una consulta sin joins."""
+    agregado = queryset.order_by().aggregate(ultimo=Max('actualizado'), total=Count('pk'))
+    return agregado['ultimo'], agregado['total']
+
+
+def parametros_normalizados(query_params):
+    """Parámetros ordenados y sin vacíos: ?b=1&a=2 y ?a=2&b=1&c= dan la misma firma."""
+    return urlencode(sorted(
+        (clave, valor) for clave, valores in query_params.lists() for valor in valores if valor != ''
+    ))
+
+
+class ListaCondicionalMixin:
+    """
+    Agrega ETag y Last-Modified a list() y responde 304 si la petición trae
+    If-None-Match o If-Modified-Since vigentes.
+
+    `catalogos` son los nombres de VersionCatalogo que aparecen en el JSON:
+    cambiar una de sus filas invalida la respuesta. Last-Modified tiene
+    resolución de segundos y no ve borrados ni cambios de catálogos; el ETag
+    sí, y cuando vienen ambos manda él.
+    """
+    catalogos = ()
+    cache_control = 'private, no-cache'
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        ventana = None
+        if self.paginator is not None and hasattr(self.paginator, 'ventana'):
+            ventana = self.paginator.ventana(queryset.values('pk'), request, view=self)
+        if ventana is not None:
+            queryset = queryset.model._default_manager.filter(pk__in=ventana)
+
+        ultimo, total = validadores(queryset)
+        firma = [
+            request.path, parametros_normalizados(request.query_params),
+            ultimo.isoformat() if ultimo else '', str(total),
+        ]
+        if self.catalogos:
+            actuales = versiones()
+            firma += [f'{nombre}={actuales[nombre]}' for nombre in self.catalogos]
+        firma = '|'.join(firma)
+        etag = '"%s"' % hashlib.md5(firma.encode()).hexdigest()
+        last_modified = timegm(ultimo.utctimetuple()) if ultimo else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        elif not isinstance(response, HttpResponseNotModified):
+            return response  # 412 Precondition Failed
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = self.cache_control
+        return response
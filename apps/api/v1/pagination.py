@@ -0,0 +1,134 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.keyset import despues_de
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor sobre el orden del endpoint (p. ej. fecha_inicio, id).
+
+    Cada página filtra "después de la última fila vista" en vez de usar OFFSET,
+    y no se calcula COUNT(*), así que la página 500 cuesta lo mismo que la 1.
+    Es opcional: solo se activa si la petición trae `cursor` o `page_size`, para
+    que los clientes que esperan la lista completa sigan funcionando.
+
+    La vista declara su orden en `keyset_ordering`; el último campo debe ser único.
+    """
+    page_size = getattr(settings, 'KEYSET_PAGE_SIZE', 50)
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('id',)
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ventana = self.ventana(queryset, request, view)
+        if ventana is None:
+            return None
+        try:
+            resultados = list(ventana)
+        except (DjangoValidationError, ValueError, TypeError):
+            raise self.cursor_invalido()
+        self.hay_mas = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+        if self.reverso:
+            resultados.reverse()
+        self.page = resultados
+        return resultados
+
+    def ventana(self, queryset, request, view=None):
+        """
+        Queryset (sin evaluar) de la página pedida más una fila para saber si
+        hay otra, o None si la petición no pide paginación.
+        """
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        self.page_size = self.get_page_size(request)
+        valores, self.reverso = self.decode_cursor(params.get(self.cursor_query_param))
+        self.con_cursor = valores is not None
+
+        orden = self._invertir(self.ordering) if self.reverso else self.ordering
+        queryset = queryset.order_by(*orden)
+        try:
+            if valores is not None:
+                queryset = queryset.filter(despues_de(orden, valores))
+        except (DjangoValidationError, ValueError, TypeError):
+            raise self.cursor_invalido()
+        return queryset[:self.page_size + 1]
+
+    def cursor_invalido(self):
+        # 400 y no 404: el cursor es un parámetro de la petición, no un recurso
+        return ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        # Hacia adelante hay más si esta página vino llena, o siempre si retrocedimos
+        if not self.page or not (self.reverso or self.hay_mas):
+            return None
+        return self.encode_cursor(self._clave(self.page[-1]), reverso=False)
+
+    def get_previous_link(self):
+        if not self.page or not self.con_cursor or (self.reverso and not self.hay_mas):
+            return None
+        return self.encode_cursor(self._clave(self.page[0]), reverso=True)
+
+    def encode_cursor(self, valores, reverso):
+        payload = {'v': valores}
+        if reverso:
+            payload['r'] = 1
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(payload, default=str, separators=(',', ':')).encode()
+        ).decode().rstrip('=')
+        url = replace_query_param(self.base_url, self.cursor_query_param, cursor)
+        return replace_query_param(url, self.page_size_query_param, self.page_size)
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+            valores = payload['v']
+            if not isinstance(valores, list) or len(valores) != len(self.ordering):
+                raise ValueError
+            return valores, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise self.cursor_invalido()
+
+    def _clave(self, item):
+        claves = []
+        for campo in self.ordering:
+            nombre = campo.lstrip('-')
+            claves.append(item[nombre] if isinstance(item, dict) else getattr(item, nombre))
+        return claves
+
+    @staticmethod
+    def _invertir(orden):
+        return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden)
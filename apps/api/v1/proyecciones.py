@@ -0,0 +1,232 @@
+"""
+Lectura rápida de pólizas para los listados.
+
+En lugar de instanciar modelos y pasar cada fila por los campos de
+PolizaSerializer (cuatro serializadores anidados por póliza), se pide a la
+base un .values() con exactamente las columnas que se devuelven y cada fila
+se convierte en el mismo JSON con un mapeador armado una sola vez al cargar
+el módulo. PolizaSerializer se sigue usando para crear y actualizar.
+
+Los parámetros `fields` y `expand` eligen un subconjunto de la proyección
+(ver `Proyeccion.seleccionar`); como la consulta es un .values() de esas
+columnas, lo que no se pide tampoco se lee ni se une en la base.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from django.db import models
+from django.utils import timezone
+
+from polizas.models import Aseguradora, Asegurado, Contratante, Poliza, Ramo
+
+
+class CamposInvalidos(ValueError):
+    pass
+
+
+# --- Conversores: misma salida que los campos de DRF ---
+# Reciben el valor (nunca None) y la zona horaria de la respuesta, que se
+# resuelve una sola vez por respuesta y no en cada campo.
+
+def _fecha(valor, zona):
+    return valor.isoformat()
+
+
+def _fecha_hora(valor, zona):
+    texto = valor.astimezone(zona).isoformat() if valor.tzinfo is not None else valor.isoformat()
+    return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+
+
+def _decimal(decimales):
+    exponente = Decimal(1).scaleb(-decimales)
+
+    def convertir(valor, zona):
+        return format(valor.quantize(exponente, rounding=ROUND_HALF_UP), 'f')
+    return convertir
+
+
+def _texto(valor, zona):
+    return str(valor)
+
+
+def _conversor(campo):
+    if isinstance(campo, models.DateTimeField):
+        return _fecha_hora
+    if isinstance(campo, models.DateField):
+        return _fecha
+    if isinstance(campo, models.DecimalField):
+        return _decimal(campo.decimal_places)
+    return None
+
+
+def _campos_modelo(modelo):
+    """Campos no relacionales en el orden de fields='__all__' (la pk primero)."""
+    pk = modelo._meta.pk
+    return [pk] + [campo for campo in modelo._meta.concrete_fields if not campo.is_relation and campo is not pk]
+
+
+class Plano:
+    """Clave de salida tomada de una columna, con conversor opcional."""
+
+    def __init__(self, clave, columna, conversor=None):
+        self.clave, self.columna, self.conversor = clave, columna, conversor
+
+
+class Anidado:
+    """
+    Objeto relacionado expandido con todos los campos de `modelo` (como un
+    ModelSerializer con fields='__all__'), o solo con `nombres` si se indican.
+    """
+
+    def __init__(self, clave, prefijo, modelo, nombres=None):
+        self.clave, self.prefijo, self.modelo = clave, prefijo, modelo
+        self.campos = [
+            (campo.name, f'{prefijo}__{campo.name}', _conversor(campo))
+            for campo in _campos_modelo(modelo)
+            if nombres is None or campo.name in nombres
+        ]
+        # prefijo__id se resuelve con la FK de la tabla de pólizas, sin JOIN
+        self.columna_id = f'{prefijo}__{modelo._meta.pk.name}'
+
+    def nombres_validos(self):
+        return [campo.name for campo in _campos_modelo(self.modelo)]
+
+
+class Proyeccion:
+    """
+    Columnas para .values() y mapeador fila -> dict. `elementos` es la lista
+    ordenada de Plano y Anidado; las claves salen en ese orden.
+    """
+
+    def __init__(self, elementos):
+        self.elementos = list(elementos)
+        self.por_clave = {elemento.clave: elemento for elemento in self.elementos}
+        # (clave, columna, conversor, campos anidados o None), en una sola lista
+        self.pasos = []
+        columnas = []
+        for elemento in self.elementos:
+            if isinstance(elemento, Anidado):
+                self.pasos.append((elemento.clave, elemento.columna_id, None, elemento.campos))
+                columnas.append(elemento.columna_id)
+                columnas.extend(columna for _, columna, _ in elemento.campos)
+            else:
+                self.pasos.append((elemento.clave, elemento.columna, elemento.conversor, None))
+                columnas.append(elemento.columna)
+        self.columnas = list(dict.fromkeys(columnas))
+
+    def mapear(self, fila, cache=None, zona=None):
+        """
+        Convierte una fila de .values(). `cache` (uno por respuesta) guarda
+        los dicts anidados ya armados por id: aseguradoras, ramos y partes se
+        repiten mucho entre filas y así se convierten una sola vez.
+        """
+        if zona is None:
+            zona = timezone.get_current_timezone()
+        salida = {}
+        for clave, columna, conversor, campos in self.pasos:
+            valor = fila[columna]
+            if campos is None:
+                salida[clave] = conversor(valor, zona) if conversor and valor is not None else valor
+                continue
+            if valor is None:
+                salida[clave] = None
+                continue
+            anidado = cache.get((clave, valor)) if cache is not None else None
+            if anidado is None:
+                anidado = {}
+                for nombre, columna_anidada, conversor_anidado in campos:
+                    valor_anidado = fila[columna_anidada]
+                    anidado[nombre] = (
+                        conversor_anidado(valor_anidado, zona)
+                        if conversor_anidado and valor_anidado is not None else valor_anidado
+                    )
+                if cache is not None:
+                    cache[(clave, valor)] = anidado
+            salida[clave] = anidado
+        return salida
+
+    def mapear_todas(self, filas):
+        cache = {}
+        zona = timezone.get_current_timezone()
+        mapear = self.mapear
+        return [mapear(fila, cache, zona) for fila in filas]
+
+    def aplicar(self, queryset, extra=()):
+        """.values() de las columnas de la proyección más `extra` (p. ej. las del orden del cursor)."""
+        columnas = self.columnas + [columna for columna in extra if columna not in self.columnas]
+        return queryset.values(*columnas)
+
+    def seleccionar(self, fields=None, expand=None):
+        """
+        Subconjunto de la proyección según los parámetros de la petición:
+
+        - fields: claves separadas por comas; `relacion.campo` elige campos
+          del objeto anidado (y lo expande).
+        - expand: relaciones que se devuelven como objeto; las demás se
+          devuelven como id, sin unir su tabla.
+
+        Sin ninguno de los dos se devuelve la proyección completa. Lanza
+        CamposInvalidos con los nombres que no existen.
+        """
+        if not fields and not expand:
+            return self
+        return _seleccionar(self, _lista(fields), _lista(expand))
+
+
+def _lista(valor):
+    if not valor:
+        return None
+    return tuple(sorted({parte.strip() for parte in valor.split(',') if parte.strip()}))
+
+
+@lru_cache(maxsize=256)
+def _seleccionar(proyeccion, fields, expand):
+    anidables = {e.clave for e in proyeccion.elementos if isinstance(e, Anidado)}
+    desconocidos = [nombre for nombre in expand or () if nombre not in anidables]
+
+    claves = None
+    subcampos = {}
+    if fields is not None:
+        claves = set()
+        for nombre in fields:
+            clave, _, subcampo = nombre.partition('.')
+            if clave not in proyeccion.por_clave or (subcampo and clave not in anidables):
+                desconocidos.append(nombre)
+                continue
+            claves.add(clave)
+            if subcampo:
+                if subcampo not in proyeccion.por_clave[clave].nombres_validos():
+                    desconocidos.append(nombre)
+                subcampos.setdefault(clave, set()).add(subcampo)
+    if desconocidos:
+        raise CamposInvalidos(', '.join(desconocidos))
+
+    expandidas = set(expand or ()) | set(subcampos)
+    elementos = []
+    for elemento in proyeccion.elementos:
+        if claves is not None and elemento.clave not in claves:
+            continue
+        if not isinstance(elemento, Anidado):
+            elementos.append(elemento)
+        elif elemento.clave in expandidas:
+            elementos.append(Anidado(elemento.clave, elemento.prefijo, elemento.modelo, subcampos.get(elemento.clave)))
+        else:
+            elementos.append(Plano(elemento.clave, elemento.columna_id))
+    return Proyeccion(elementos)
+
+
+POLIZA_LISTA = Proyeccion([
+    *(
+        Plano(campo, campo, _conversor(Poliza._meta.get_field(campo))) for campo in (
+            'id', 'numero', 'fecha_inicio', 'fecha_fin', 'renovacion',
+            'i_trimestre', 'ii_trimestre', 'iii_trimestre', 'iv_trimestre',
+            'prima_total', 'monto_asegurado',
+        )
+    ),
+    Anidado('contratante', 'contratante', Contratante),
+    Anidado('asegurado', 'asegurado', Asegurado),
+    Anidado('aseguradora_nombre', 'aseguradora', Aseguradora),
+    Anidado('ramo_nombre', 'ramo', Ramo),
+    # StringRelatedField: str(forma_pago) es su nombre
+    Plano('forma_pago_nombre', 'forma_pago__nombre', _texto),
+])
@@ -1,9 +1,18 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 # Importa tus modelos
 from polizas.models import Poliza, Aseguradora, Ramo, Contratante, Asegurado, FormaPago, ReporteGenerado
+from polizas.catalogos import CATALOGOS, en_memoria
+from polizas.cuotas import calcular_cuotas
+from polizas.partes import resolver_parte
+from usuarios.accesos import registrar_login
+from usuarios.authentication import invalidar_usuario
+from usuarios.tokens import RefreshToken
+from reportes.exportaciones import EXPORTACIONES
 
 User = get_user_model()
 
@@ -11,6 +20,8 @@ User = get_user_model()
 # ... (CustomTokenObtainPairSerializer y UserSerializer se mantienen IGUAL) ...
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -21,6 +32,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
     def validate(self, attrs):
         data = super().validate(attrs)
+        # UPDATE_LAST_LOGIN está apagado: last_login se guarda en diferido
+        registrar_login(self.user)
         data['username'] = self.user.username
         data['email'] = self.user.email
         data['rol'] = self.user.rol
@@ -53,6 +66,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
+        # post_save invalida por el username nuevo; si cambia, también el anterior
+        invalidar_usuario(instance.username)
         if 'rol' in validated_data:
             if validated_data['rol'] == 'admin':
                 instance.is_staff = True
@@ -92,30 +107,55 @@ class AseguradoSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ContratantePolizaSerializer(ContratanteSerializer):
+    # Anidado en la póliza un documento existente se reutiliza (ver polizas.partes):
+    # sin el UniqueValidator, que además costaba una consulta
+    class Meta(ContratanteSerializer.Meta):
+        extra_kwargs = {'documento': {'validators': []}}
+
+
+class AseguradoPolizaSerializer(AseguradoSerializer):
+    class Meta(AseguradoSerializer.Meta):
+        extra_kwargs = {'documento': {'validators': []}}
+
+
 class FormaPagoSerializer(serializers.ModelSerializer):
     class Meta:
         model = FormaPago
         fields = '__all__'
 
 
+class CatalogoRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField que valida el id contra el catálogo en memoria (polizas.catalogos)."""
+
+    def __init__(self, catalogo, **kwargs):
+        self.catalogo = catalogo
+        kwargs['queryset'] = CATALOGOS[catalogo].objects.all()
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return en_memoria[self.catalogo].obtener(self.queryset.model._meta.pk.to_python(data))
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
 # --- SERIALIZADOR PRINCIPAL DE PÓLIZA (MODIFICADO) ---
 class PolizaSerializer(serializers.ModelSerializer):
     aseguradora_nombre = AseguradoraSerializer(source='aseguradora', read_only=True)
     ramo_nombre = RamoSerializer(source='ramo', read_only=True)
     forma_pago_nombre = serializers.StringRelatedField(source='forma_pago', read_only=True)
 
-    contratante = ContratanteSerializer()
-    asegurado = AseguradoSerializer()
+    contratante = ContratantePolizaSerializer()
+    asegurado = AseguradoPolizaSerializer()
 
-    aseguradora_id = serializers.PrimaryKeyRelatedField(
-        queryset=Aseguradora.objects.all(), source='aseguradora', write_only=True, required=True
-    )
-    ramo_id = serializers.PrimaryKeyRelatedField(
-        queryset=Ramo.objects.all(), source='ramo', write_only=True, required=True
-    )
-    forma_pago_id = serializers.PrimaryKeyRelatedField(
-        queryset=FormaPago.objects.all(), source='forma_pago', write_only=True, required=True
-    )
+    aseguradora_id = CatalogoRelatedField('aseguradoras', source='aseguradora', write_only=True, required=True)
+    ramo_id = CatalogoRelatedField('ramos', source='ramo', write_only=True, required=True)
+    forma_pago_id = CatalogoRelatedField('formas_pago', source='forma_pago', write_only=True, required=True)
 
     i_trimestre = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     ii_trimestre = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -132,38 +172,85 @@ class PolizaSerializer(serializers.ModelSerializer):
             'contratante', 'asegurado',
             'aseguradora_nombre', 'ramo_nombre', 'forma_pago_nombre',
         ]
+        # En la BD admite nulos solo por pólizas antiguas; la API la sigue exigiendo
+        extra_kwargs = {'renovacion': {'required': True, 'allow_null': False}}
 
-    def _calculate_payments(self, poliza_instance, forma_pago_instance):
-        forma_pago_name = forma_pago_instance.nombre.lower()
-        prima_total = float(poliza_instance.prima_total)
-
-        if 'semestral' in forma_pago_name:
-            monto_cuota = prima_total / 2
-            poliza_instance.i_trimestre = monto_cuota
-            poliza_instance.ii_trimestre = 0
-            poliza_instance.iii_trimestre = monto_cuota
-            poliza_instance.iv_trimestre = 0
-        else:
-            monto_cuota = prima_total / 4
-            poliza_instance.i_trimestre = monto_cuota
-            poliza_instance.ii_trimestre = monto_cuota
-            poliza_instance.iii_trimestre = monto_cuota
-            poliza_instance.iv_trimestre = monto_cuota
+    # Campo del serializer -> (atributo de la póliza, catálogo en memoria)
+    CATALOGOS_POLIZA = {
+        'aseguradora_id': ('aseguradora_id', 'aseguradoras'),
+        'ramo_id': ('ramo_id', 'ramos'),
+        'forma_pago_id': ('forma_pago_id', 'formas_pago'),
+    }
+
+    def _no_existe(self, campo, pk):
+        catalogo = self.CATALOGOS_POLIZA[campo][1]
+        en_memoria[catalogo].invalidar()
+        return {campo: [self.fields[campo].error_messages['does_not_exist'].format(pk_value=pk)]}
 
+    def _calculate_payments(self, poliza_instance, forma_pago_instance):
+        # El nombre sale de la instancia en memoria: un cambio de nombre incrementa
+        # la versión del catálogo y la copia se recarga (ver polizas.catalogos)
+        (
+            poliza_instance.i_trimestre,
+            poliza_instance.ii_trimestre,
+            poliza_instance.iii_trimestre,
+            poliza_instance.iv_trimestre,
+        ) = calcular_cuotas(poliza_instance.prima_total, forma_pago_instance.nombre)
         return poliza_instance
 
+    def escribir_verificado(self, escribir):
+        """
+        Ejecuta `escribir()` en su propia transacción (un savepoint si ya hay
+        una abierta) y verifica ahí las FK de las pólizas. Son diferidas: sin
+        forzarlas, dentro de una transacción abierta (API por lote,
+        ATOMIC_REQUESTS) fallarían recién al confirmarla, sin poder responder
+        otra cosa que un 500. IntegrityError si alguna no se cumple.
+        """
+        conexion = transaction.get_connection()
+        anidada = conexion.in_atomic_block
+        with transaction.atomic():
+            escribir()
+            if anidada:
+                conexion.check_constraints(table_names=[Poliza._meta.db_table])
+
+    def catalogos_borrados(self, polizas):
+        """
+        Errores de validación de cada póliza (vacíos si no hay) por las filas
+        de catálogo a las que apunta y que ya no existen; una consulta por
+        catálogo. Descarta de memoria los catálogos que las tenían.
+        """
+        errores = [{} for _ in polizas]
+        for campo, (atributo, catalogo) in self.CATALOGOS_POLIZA.items():
+            ids = {getattr(poliza, atributo) for poliza in polizas}
+            existentes = set(CATALOGOS[catalogo].objects.filter(pk__in=ids).values_list('pk', flat=True))
+            for error, poliza in zip(errores, polizas):
+                if getattr(poliza, atributo) not in existentes:
+                    error.update(self._no_existe(campo, getattr(poliza, atributo)))
+        return errores
+
+    def _guardar(self, poliza):
+        """
+        Guarda la póliza; si la FK a un catálogo falla porque la fila se borró
+        desde otro proceso (el catálogo en memoria aún la tenía), responde
+        error de validación en ese campo en lugar de un 500. La escritura y el
+        delta de ResumenPrimas (señal post_save) van en la misma transacción.
+        """
+        try:
+            self.escribir_verificado(poliza.save)
+        except IntegrityError:
+            errores = self.catalogos_borrados([poliza])[0]
+            if not errores:
+                raise
+            raise serializers.ValidationError(errores)
+
     def create(self, validated_data):
         contratante_data = validated_data.pop('contratante')
         asegurado_data = validated_data.pop('asegurado')
         forma_pago_instance = validated_data.pop('forma_pago')
 
-        # Manejo robusto de Contratante/Asegurado
-        contratante_qs = Contratante.objects.filter(documento=contratante_data.get('documento'))
-        contratante = contratante_qs.first() if contratante_qs.exists() else Contratante.objects.create(
-            **contratante_data)
-
-        asegurado_qs = Asegurado.objects.filter(documento=asegurado_data.get('documento'))
-        asegurado = asegurado_qs.first() if asegurado_qs.exists() else Asegurado.objects.create(**asegurado_data)
+        # Una sentencia por parte, sin carrera entre dos altas con el mismo documento
+        contratante = resolver_parte(Contratante, contratante_data)
+        asegurado = resolver_parte(Asegurado, asegurado_data)
 
         # 1. Creamos la instancia Poliza
         poliza = Poliza(
@@ -178,17 +265,21 @@ class PolizaSerializer(serializers.ModelSerializer):
         poliza = self._calculate_payments(poliza, forma_pago_instance)
 
         # 4. Guardamos
-        poliza.save()
+        self._guardar(poliza)
         return poliza
 
+    def aplicar_cambios(self, instance, validated_data):
+        """Asigna los campos propios de la póliza y recalcula las cuotas si cambió la prima o la forma de pago."""
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if 'prima_total' in validated_data or 'forma_pago' in validated_data:
+            self._calculate_payments(instance, instance.forma_pago)
+        return instance
+
     def update(self, instance, validated_data):
-        # ... (La lógica de update se mantiene igual)
         contratante_data = validated_data.pop('contratante', None)
         asegurado_data = validated_data.pop('asegurado', None)
-        forma_pago_instance = validated_data.pop('forma_pago', instance.forma_pago)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+        self.aplicar_cambios(instance, validated_data)
 
         if contratante_data:
             contratante_serializer = ContratanteSerializer(instance.contratante, data=contratante_data, partial=True)
@@ -200,15 +291,29 @@ class PolizaSerializer(serializers.ModelSerializer):
             if asegurado_serializer.is_valid(raise_exception=True):
                 asegurado_serializer.save()
 
-        if 'prima_total' in validated_data or 'forma_pago' in validated_data:
-            instance.forma_pago = forma_pago_instance
-            instance = self._calculate_payments(instance, forma_pago_instance)
-
-        instance.save()
+        self._guardar(instance)
         return instance
 
 
 class ReporteSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReporteGenerado
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        read_only_fields = [
+            'usuario', 'archivo_path', 'estado', 'progreso', 'filas', 'duracion', 'error',
+            'fecha_inicio_proceso', 'fecha_fin_proceso', 'intentos',
+        ]
+
+    def validate_parametros(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Los parámetros deben ser un objeto.")
+        return value
+
+    def validate(self, attrs):
+        exportacion = EXPORTACIONES.get(attrs.get('tipo_reporte'))
+        if exportacion is not None:
+            try:
+                exportacion.queryset(attrs.get('parametros') or {})
+            except ValueError:
+                raise serializers.ValidationError({'parametros': "Fecha inválida. Use YYYY-MM-DD."})
+        return attrs
\ No newline at end of file
@@ -1,11 +1,11 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
+from rest_framework_simplejwt.views import TokenVerifyView
 from . import views
 
 urlpatterns = [
     # Autenticación JWT
     path('auth/login/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/refresh/', views.CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('auth/verify/', TokenVerifyView.as_view(), name='token_verify'),
     path('auth/logout/', views.UserLogoutView.as_view(), name='logout'),
 
@@ -18,6 +18,9 @@ urlpatterns = [
 
     # Pólizas
     path('polizas/', views.PolizaListCreateView.as_view(), name='poliza-list'),
+    path('polizas/importar/', views.ImportarPolizasView.as_view(), name='poliza-importar'),
+    path('polizas/lote/', views.PolizaLoteView.as_view(), name='poliza-lote'),
+    path('polizas/cambios/', views.PolizaCambiosView.as_view(), name='poliza-cambios'),
     path('polizas/<int:pk>/', views.PolizaRetrieveUpdateDestroyView.as_view(), name='poliza-detail'),
 
     # --- PÓLIZAS PRÓXIMAS A VENCER ---
@@ -27,12 +30,19 @@ urlpatterns = [
          name='poliza-proximas-vencer-excel'),
 
     path('polizas/opciones/', views.PolizaOptionsView.as_view(), name='poliza-opciones'),
+    path('polizas/opciones/<str:catalogo>/', views.PolizaOptionsView.as_view(), name='poliza-opciones-catalogo'),
 
     # Reportes (Admin)
     path('reportes/generar/', views.GenerarReporteView.as_view(), name='generar-reporte'),
+    path('reportes/<int:pk>/', views.ReporteDetalleView.as_view(), name='reporte-detalle'),
+    path('reportes/<int:pk>/descargar/', views.ReporteDescargaView.as_view(), name='reporte-descargar'),
     path('reportes/historial/', views.ReporteHistorialList.as_view(), name='reporte-historial'),
     path('reportes/consulta/', views.PolizaReporteListView.as_view(), name='reporte-consulta'),
     path('reportes/exportar-excel/', views.ExportarPolizasExcelView.as_view(), name='reporte-excel'),
+    path('reportes/analitica/', views.AnaliticaPrimasView.as_view(), name='reporte-analitica'),
+
+    # Métricas por ruta (Admin, formato Prometheus)
+    path('metricas/', views.MetricasView.as_view(), name='metricas'),
 
     # Auxiliares (Aseguradoras, Ramos, etc)
     path('aseguradoras/', views.AseguradoraListCreateView.as_view(), name='aseguradora-list'),
@@ -42,9 +52,11 @@ urlpatterns = [
     path('ramos/<int:pk>/', views.RamoRetrieveUpdateDestroyView.as_view(), name='ramo-detail'),
 
     path('contratantes/', views.ContratanteListCreateView.as_view(), name='contratante-list'),
+    path('contratantes/buscar/', views.ContratanteBusquedaView.as_view(), name='contratante-buscar'),
     path('contratantes/<int:pk>/', views.ContratanteRetrieveUpdateDestroyView.as_view(), name='contratante-detail'),
 
     path('asegurados/', views.AseguradoListCreateView.as_view(), name='asegurado-list'),
+    path('asegurados/buscar/', views.AseguradoBusquedaView.as_view(), name='asegurado-buscar'),
     path('asegurados/<int:pk>/', views.AseguradoRetrieveUpdateDestroyView.as_view(), name='asegurado-detail'),
 
     path('formas-pago/', views.FormaPagoListCreateView.as_view(), name='formapago-list'),
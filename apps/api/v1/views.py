@@ -1,15 +1,21 @@
 from rest_framework import generics, permissions, status
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from datetime import timedelta, datetime
-import openpyxl
-from django.http import HttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, transaction
 from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
+from django.views.decorators.gzip import gzip_page
+import json
+import os
 
 # --- REMOVED: from apps.usuarios.models import User
 from django.contrib.auth import get_user_model  # ADDED: Import get_user_model
@@ -18,8 +24,20 @@ from django.contrib.auth import get_user_model  # ADDED: Import get_user_model
 User = get_user_model()
 
 # Ensure FormaPago is imported here if it's used directly from models
+from core import metricas
+from usuarios.tokens import RefreshToken, RefreshTokenSerializer
 from polizas.models import Poliza, Aseguradora, Ramo, Contratante, Asegurado, ReporteGenerado, FormaPago
-
+from polizas import cambios
+from polizas.busqueda import buscar_partes
+from polizas.catalogos import versiones
+from polizas.cuotas import CAMPOS_CUOTAS
+from polizas.consultas import fecha_consulta, parsear_fecha, polizas_proximas_vencer, polizas_reporte
+from polizas.importacion import ArchivoInvalido, importar_archivo
+
+from .catalogos import SERIALIZADORES, catalogo_json, etag as etag_catalogos
+from .condicional import ListaCondicionalMixin
+from .pagination import KeysetPagination
+from .proyecciones import POLIZA_LISTA, CamposInvalidos
 from .serializers import (
     UserSerializer,
     PolizaSerializer,
@@ -31,6 +49,14 @@ from .serializers import (
     CustomTokenObtainPairSerializer,
     FormaPagoSerializer
 )
+from reportes import resumenes, trabajos
+from reportes.exportaciones import (
+    EXPORTACIONES,
+    XLSX_CONTENT_TYPE,
+    ExportacionProximasVencer,
+    ExportacionReporte,
+    respuesta_xlsx,
+)
 
 
 ## Autenticación y Usuarios ##
@@ -38,17 +64,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-class UserLoginView(APIView):
-    def post(self, request):
-        serializer = CustomTokenObtainPairSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = User.objects.get(username=serializer.validated_data['username'])
-        user_data = UserSerializer(user).data
-        return Response({
-            'access': serializer.validated_data['access'],
-            'refresh': serializer.validated_data['refresh'],
-            'user': user_data
-        }, status=status.HTTP_200_OK)
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = RefreshTokenSerializer
 
 
 class UserProfileView(APIView):
@@ -99,7 +116,51 @@ class UserRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Vistas para Pólizas
-class PolizaListCreateView(generics.ListCreateAPIView):
+class PolizaListaRapidaMixin:
+    """
+    Lectura con .values() y el mapeador de POLIZA_LISTA: mismo JSON que
+    PolizaSerializer, sin instanciar modelos ni serializadores. Acepta
+    `fields` y `expand` (ver Proyeccion.seleccionar) para pedir solo
+    algunas claves; las columnas y JOINs que no se piden no se consultan.
+    """
+    proyeccion = POLIZA_LISTA
+
+    def get_proyeccion(self):
+        params = self.request.query_params
+        try:
+            return self.proyeccion.seleccionar(params.get('fields'), params.get('expand'))
+        except CamposInvalidos as exc:
+            from rest_framework.exceptions import ValidationError
+            raise ValidationError({"fields": f"Campos desconocidos: {exc}"})
+
+    def list(self, request, *args, **kwargs):
+        proyeccion = self.get_proyeccion()
+        # Las columnas del cursor se leen siempre, aunque no se devuelvan
+        queryset = proyeccion.aplicar(
+            self.filter_queryset(self.get_queryset()),
+            extra=[campo.lstrip('-') for campo in getattr(self, 'keyset_ordering', ())],
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(proyeccion.mapear_todas(page))
+        return Response(proyeccion.mapear_todas(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        proyeccion = self.get_proyeccion()
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        fila = proyeccion.aplicar(queryset.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})).first()
+        if fila is None:
+            raise Http404
+        return Response(proyeccion.mapear(fila))
+
+
+# El JSON de una póliza incluye sus cinco relaciones: cambia con cualquiera de esos catálogos
+CATALOGOS_LISTA_POLIZA = ('aseguradoras', 'ramos', 'contratantes', 'asegurados', 'formas_pago')
+
+
+@method_decorator(gzip_page, name='dispatch')
+class PolizaListCreateView(ListaCondicionalMixin, PolizaListaRapidaMixin, generics.ListCreateAPIView):
     queryset = Poliza.objects.select_related(
         'aseguradora', 'ramo', 'contratante', 'asegurado', 'forma_pago'
     ).all()
@@ -107,6 +168,9 @@ class PolizaListCreateView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['aseguradora', 'ramo', 'contratante', 'asegurado']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('fecha_inicio', 'id')
+    catalogos = CATALOGOS_LISTA_POLIZA
 
     def perform_create(self, serializer):
         if self.request.user.is_authenticated:
@@ -116,8 +180,11 @@ class PolizaListCreateView(generics.ListCreateAPIView):
             raise PermissionDenied("Authentication required.")
 
 
-class PolizaRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Poliza.objects.all()
+class PolizaRetrieveUpdateDestroyView(PolizaListaRapidaMixin, generics.RetrieveUpdateDestroyAPIView):
+    # PUT/PATCH devuelven PolizaSerializer con cuatro relaciones anidadas
+    queryset = Poliza.objects.select_related(
+        'aseguradora', 'ramo', 'contratante', 'asegurado', 'forma_pago'
+    ).all()
     serializer_class = PolizaSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -129,57 +196,395 @@ class PolizaRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
             raise PermissionDenied("Authentication required.")
 
 
-class PolizaProximaVencerList(generics.ListAPIView):
+LOTE_MAXIMO = 500
+
+
+class PolizaLoteView(PolizaListaRapidaMixin, APIView):
+    """
+    Varias pólizas en una petición (hasta LOTE_MAXIMO), según `operacion`:
+
+    - obtener {"ids": [...]}: en una consulta, con el JSON del listado
+      (acepta `fields` y `expand`).
+    - actualizar {"cambios": [{"id": 1, "prima_total": "..."}, ...]}: cambios
+      parciales validados con PolizaSerializer y con las cuotas recalculadas,
+      escritos juntos con un bulk_update en una transacción. Contratante y
+      asegurado no se modifican en lote.
+    - eliminar {"ids": [...]}: borra las que existan, en una transacción.
+
+    Responde {"resultados": [...]} en el orden pedido, con `ok` y la póliza o
+    los errores de cada id.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = Poliza.objects.all()
+
+    def post(self, request):
+        from rest_framework.exceptions import ValidationError
+        if not isinstance(request.data, dict):
+            raise ValidationError({"detail": "El cuerpo debe ser un objeto con 'operacion'."})
+        operacion = request.data.get('operacion')
+        if operacion == 'actualizar':
+            cambios = request.data.get('cambios')
+            if not isinstance(cambios, list) or not all(isinstance(c, dict) for c in cambios):
+                raise ValidationError({"cambios": "Debe ser una lista de objetos con 'id'."})
+            ids = self._ids([cambio.get('id') for cambio in cambios], 'cambios')
+            resultados = self.actualizar(request, list(zip(ids, cambios)))
+        elif operacion in ('obtener', 'eliminar'):
+            ids = self._ids(request.data.get('ids'), 'ids')
+            resultados = self.obtener(ids) if operacion == 'obtener' else self.eliminar(ids)
+        else:
+            raise ValidationError({"operacion": "Use 'obtener', 'actualizar' o 'eliminar'."})
+        return Response({"resultados": resultados})
+
+    @staticmethod
+    def _ids(valores, campo):
+        from rest_framework.exceptions import ValidationError
+        if not isinstance(valores, list) or not valores:
+            raise ValidationError({campo: "Debe ser una lista no vacía."})
+        if len(valores) > LOTE_MAXIMO:
+            raise ValidationError({campo: f"Máximo {LOTE_MAXIMO} pólizas por lote."})
+        if not all(isinstance(valor, int) and not isinstance(valor, bool) for valor in valores):
+            raise ValidationError({campo: "Los ids deben ser enteros."})
+        return valores
+
+    @staticmethod
+    def _error(pk, errores):
+        return {'id': pk, 'ok': False, 'errores': errores}
+
+    def _filas(self, ids):
+        proyeccion = self.get_proyeccion()
+        filas = list(proyeccion.aplicar(Poliza.objects.filter(pk__in=ids), extra=['id']))
+        return {fila['id']: poliza for fila, poliza in zip(filas, proyeccion.mapear_todas(filas))}
+
+    def obtener(self, ids):
+        polizas = self._filas(ids)
+        return [
+            {'id': pk, 'ok': True, 'poliza': polizas[pk]} if pk in polizas
+            else self._error(pk, {'detail': 'No encontrada.'})
+            for pk in ids
+        ]
+
+    def actualizar(self, request, cambios):
+        from rest_framework.exceptions import ValidationError
+        resultados = {}
+        vistos, numeros = set(), set()
+        modificadas, campos = [], {'actualizado', 'actualizado_por'}
+        ahora = timezone.now()
+        contexto = {'request': request}
+        with transaction.atomic(), resumenes.en_lote():
+            polizas = Poliza.objects.select_for_update(of=('self',)).select_related('forma_pago').in_bulk(
+                [pk for pk, _ in cambios]
+            )
+            for indice, (pk, cambio) in enumerate(cambios):
+                poliza = polizas.get(pk)
+                datos = {campo: valor for campo, valor in cambio.items() if campo != 'id'}
+                if pk in vistos:
+                    resultados[indice] = self._error(pk, {'id': ['Repetido en el lote.']})
+                    continue
+                vistos.add(pk)
+                if poliza is None:
+                    resultados[indice] = self._error(pk, {'detail': 'No encontrada.'})
+                    continue
+                anidados = {campo: ['No se modifica en lote.'] for campo in ('contratante', 'asegurado')
+                            if campo in datos}
+                if anidados:
+                    resultados[indice] = self._error(pk, anidados)
+                    continue
+                serializer = PolizaSerializer(poliza, data=datos, partial=True, context=contexto)
+                if not serializer.is_valid():
+                    resultados[indice] = self._error(pk, serializer.errors)
+                    continue
+                validados = dict(serializer.validated_data)
+                if 'numero' in validados:
+                    if validados['numero'] in numeros:
+                        resultados[indice] = self._error(pk, {'numero': ['Repetido en el lote.']})
+                        continue
+                    numeros.add(validados['numero'])
+                try:
+                    serializer.aplicar_cambios(poliza, validados)
+                except ValidationError as exc:
+                    resultados[indice] = self._error(pk, exc.detail)
+                    continue
+                poliza.actualizado = ahora  # bulk_update no aplica auto_now
+                poliza.actualizado_por = request.user
+                campos.update(validados)
+                if 'prima_total' in validados or 'forma_pago' in validados:
+                    campos.update(CAMPOS_CUOTAS)
+                modificadas.append((indice, poliza))
+
+            if modificadas:
+                modificadas = self._escribir(modificadas, sorted(campos), contexto, resultados)
+            if modificadas:
+                for _, poliza in modificadas:
+                    resumenes.registrar_cambio(poliza)  # bulk_update no dispara post_save
+                filas = self._filas([poliza.pk for _, poliza in modificadas])
+                for indice, poliza in modificadas:
+                    resultados[indice] = {'id': poliza.pk, 'ok': True, 'poliza': filas[poliza.pk]}
+        return [resultados[indice] for indice in range(len(cambios))]
+
+    def _escribir(self, modificadas, campos, contexto, resultados):
+        """
+        bulk_update de las pólizas modificadas. Las que apuntan a un catálogo
+        borrado desde otro proceso quedan como error de validación y el resto
+        se vuelve a escribir; devuelve las escritas.
+        """
+        serializer = PolizaSerializer(context=contexto)
+        polizas = [poliza for _, poliza in modificadas]
+        try:
+            serializer.escribir_verificado(lambda: Poliza.objects.bulk_update(polizas, campos))
+            return modificadas
+        except IntegrityError:
+            errores = serializer.catalogos_borrados(polizas)
+            if not any(errores):
+                raise
+        validas = []
+        for (indice, poliza), error in zip(modificadas, errores):
+            if error:
+                resultados[indice] = self._error(poliza.pk, error)
+            else:
+                validas.append((indice, poliza))
+        if validas:
+            Poliza.objects.bulk_update([poliza for _, poliza in validas], campos)
+        return validas
+
+    def eliminar(self, ids):
+        # Ninguna tabla protege a Poliza (sus FK salientes son las PROTECT):
+        # todas las que existen se pueden borrar
+        with transaction.atomic(), resumenes.en_lote(), cambios.bajas_en_lote():
+            existentes = set(Poliza.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            Poliza.objects.filter(pk__in=existentes).delete()
+
+        resultados, vistos = [], set()
+        for pk in ids:
+            if pk in vistos:
+                resultados.append(self._error(pk, {'id': ['Repetido en el lote.']}))
+            elif pk not in existentes:
+                resultados.append(self._error(pk, {'detail': 'No encontrada.'}))
+            else:
+                resultados.append({'id': pk, 'ok': True})
+            vistos.add(pk)
+        return resultados
+
+
+class PolizaCambiosView(PolizaListaRapidaMixin, APIView):
+    """
+    Feed NDJSON de lo que cambió desde `cursor` (ver polizas.cambios), para
+    sincronizar sin descargar la cartera completa. Una línea por fila:
+
+        {"tipo": "contratante", "accion": "cambio", "id": 7, "actualizado": "...", "datos": {...}}
+        {"tipo": "poliza", "accion": "baja", "id": 12, "eliminado": "..."}
+
+    y al final {"tipo": "cursor", "cursor": "...", "completo": true}. Con
+    completo=false un flujo llegó a `limite` filas y los siguientes no se
+    leyeron: se vuelve a pedir con el cursor nuevo. Sin cursor se recibe
+    todo. Las pólizas usan el JSON del listado (acepta `fields` y `expand`).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    limite = 1000
+    limite_maximo = 10000
+    campos_parte = ('id', 'nombre', 'documento', 'telefono', 'email', 'direccion', 'creado', 'actualizado')
+
+    def get(self, request):
+        try:
+            cursor = cambios.Cursor.decodificar(request.query_params.get('cursor'))
+        except cambios.CursorVencido as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_410_GONE)
+        except cambios.CursorInvalido as exc:
+            return Response({"detail": str(exc)}, status=400)
+        try:
+            limite = max(1, min(int(request.query_params.get('limite', self.limite)), self.limite_maximo))
+        except ValueError:
+            return Response({"detail": "limite debe ser un entero."}, status=400)
+        proyeccion = self.get_proyeccion()
+        corte = cambios.corte_actual()
+        bloques, completo = self.leer(cursor, corte, limite, proyeccion)
+        lineas = self.lineas(bloques, cursor, corte, completo, proyeccion)
+        return StreamingHttpResponse(lineas, content_type='application/x-ndjson')
+
+    def leer(self, cursor, corte, limite, proyeccion):
+        """
+        Filas pendientes de cada flujo, hasta `limite` por flujo, leídas antes
+        de empezar a responder: la transacción no queda abierta mientras el
+        cliente descarga. Se detiene en el primer flujo que llega al límite,
+        porque los siguientes pueden depender de lo que le falta (pólizas de
+        partes aún no entregadas, bajas de filas con cambios pendientes).
+        Devuelve [(nombre, columna, filas)] y si se leyó todo.
+        """
+        alias = Poliza.objects.db
+        connection = connections[alias]
+        externa = connection.in_atomic_block
+        bloques = []
+        # Una sola foto para los cuatro flujos, como en las exportaciones
+        with transaction.atomic(using=alias):
+            if connection.vendor == 'postgresql' and not externa:
+                with connection.cursor() as sql:
+                    sql.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+            for nombre, modelo, columna in cambios.FLUJOS:
+                if nombre == 'poliza':
+                    queryset = proyeccion.aplicar(Poliza.objects.all(), extra=['actualizado', 'id'])
+                elif nombre == 'eliminacion':
+                    queryset = modelo.objects.values('id', 'tipo', 'objeto_id', 'eliminado')
+                else:
+                    queryset = modelo.objects.values(*self.campos_parte)
+                filas = list(cambios.pendientes(queryset, columna, cursor.posiciones.get(nombre), corte, limite))
+                bloques.append((nombre, columna, filas))
+                if len(filas) >= limite:
+                    return bloques, False
+        return bloques, True
+
+    def lineas(self, bloques, cursor, corte, completo, proyeccion):
+        cache, zona = {}, timezone.get_current_timezone()
+        for nombre, columna, filas in bloques:
+            for fila in filas:
+                cursor.posiciones[nombre] = (fila[columna], fila['id'])
+                if nombre == 'eliminacion':
+                    linea = {'tipo': fila['tipo'], 'accion': 'baja', 'id': fila['objeto_id'],
+                             'eliminado': fila['eliminado']}
+                else:
+                    datos = proyeccion.mapear(fila, cache, zona) if nombre == 'poliza' else fila
+                    linea = {'tipo': nombre, 'accion': 'cambio', 'id': fila['id'],
+                             'actualizado': fila['actualizado'], 'datos': datos}
+                yield json.dumps(linea, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        cursor.corte = corte
+        yield json.dumps({'tipo': 'cursor', 'cursor': cursor.codificar(), 'completo': completo}) + '\n'
+
+
+class ImportarPolizasView(APIView):
+    """
+    Importa pólizas desde un CSV o XLSX enviado en el campo `archivo`.
+    Devuelve el informe con los errores por fila; las filas válidas se crean
+    aunque otras fallen. `actualizar_partes=1` actualiza los datos de
+    contratantes y asegurados que ya existen.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({"detail": "Debe enviar el archivo en el campo 'archivo'."}, status=400)
+        actualizar_partes = request.data.get('actualizar_partes') in ('1', 'true', 'True')
+        try:
+            informe = importar_archivo(archivo, archivo.name, request.user, actualizar_partes=actualizar_partes)
+        except ArchivoInvalido as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(informe, status=status.HTTP_201_CREATED if informe['creadas'] else status.HTTP_200_OK)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class PolizaProximaVencerList(ListaCondicionalMixin, PolizaListaRapidaMixin, generics.ListAPIView):
     serializer_class = PolizaSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['aseguradora', 'ramo', 'contratante']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('renovacion', 'id')
+    catalogos = CATALOGOS_LISTA_POLIZA
 
     def get_queryset(self):
-        fecha_str = self.request.query_params.get('fecha', None)
-        if fecha_str:
-            try:
-                consult_date = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-            except ValueError:
-                from rest_framework.exceptions import PermissionDenied
-                raise PermissionDenied("Formato de fecha inválido. Use YYYY-MM-DD.")
-        else:
-            consult_date = timezone.now().date()
-
-        queryset = Poliza.objects.select_related(
-            'aseguradora', 'ramo', 'contratante', 'asegurado', 'forma_pago'
-        ).filter(
-            renovacion__gte=consult_date
-        ).order_by('renovacion')
+        try:
+            consult_date = fecha_consulta(self.request.query_params.get('fecha', None))
+        except ValueError:
+            from rest_framework.exceptions import PermissionDenied
+            raise PermissionDenied("Formato de fecha inválido. Use YYYY-MM-DD.")
 
-        return queryset
+        return polizas_proximas_vencer(consult_date)
 
 
 class PolizaOptionsView(APIView):
+    """
+    Catálogos del formulario de pólizas, todos juntos o uno solo
+    (polizas/opciones/<catalogo>/). Se sirven desde caché por versión y con
+    ETag, así que si nada cambió la respuesta es un 304 sin cuerpo.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request):
-        data = {
-            'aseguradoras': AseguradoraSerializer(Aseguradora.objects.all(), many=True).data,
-            'ramos': RamoSerializer(Ramo.objects.all(), many=True).data,
-            'contratantes': ContratanteSerializer(Contratante.objects.all(), many=True).data,
-            'asegurados': AseguradoSerializer(Asegurado.objects.all(), many=True).data,
-            'formas_pago': FormaPagoSerializer(FormaPago.objects.all(), many=True).data
-        }
-        return Response(data)
+    def get(self, request, catalogo=None):
+        if catalogo is not None and catalogo not in SERIALIZADORES:
+            return Response({"detail": "Catálogo no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        actuales = versiones()
+        if catalogo is not None:
+            actuales = {catalogo: actuales[catalogo]}
+
+        etag = etag_catalogos(actuales)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        elif catalogo is not None:
+            response = HttpResponse(catalogo_json(catalogo, actuales[catalogo]), content_type='application/json')
+        else:
+            partes = [b'"%s":%s' % (nombre.encode(), catalogo_json(nombre, version))
+                      for nombre, version in actuales.items()]
+            response = HttpResponse(b'{' + b','.join(partes) + b'}', content_type='application/json')
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 # Vistas para reportes
 class GenerarReporteView(APIView):
+    """Encola el reporte; el worker `procesar_reportes` genera el archivo."""
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
         serializer = ReporteSerializer(data=request.data)
         if serializer.is_valid():
-            return Response({"status": "success", "reporte_id": 1})
+            reporte = trabajos.encolar(
+                request.user,
+                serializer.validated_data['tipo_reporte'],
+                serializer.validated_data.get('parametros', {}),
+            )
+            return Response(
+                {"status": "success", "reporte_id": reporte.id, "estado": reporte.estado},
+                status=status.HTTP_202_ACCEPTED,
+            )
         return Response(serializer.errors, status=400)
 
 
+class ReporteUsuarioMixin:
+    def get_queryset(self):
+        queryset = ReporteGenerado.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(usuario=self.request.user)
+        return queryset
+
+
+class ReporteDetalleView(ReporteUsuarioMixin, generics.RetrieveAPIView):
+    """Estado y progreso de un reporte en cola."""
+    serializer_class = ReporteSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+
+class ReporteDescargaView(ReporteUsuarioMixin, generics.GenericAPIView):
+    """
+    Descarga el archivo ya generado. FileResponse usa wsgi.file_wrapper, con lo
+    que gunicorn lo envía con sendfile() sin copiarlo a memoria.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        reporte = self.get_object()
+        if reporte.estado != ReporteGenerado.COMPLETADO or not os.path.exists(reporte.archivo_path):
+            return Response(
+                {"detail": "El reporte no está disponible.", "estado": reporte.estado},
+                status=status.HTTP_409_CONFLICT,
+            )
+        exportacion = EXPORTACIONES.get(reporte.tipo_reporte)
+        if exportacion is None:
+            # Registros de tipos que ya no se generan (anteriores a la cola de reportes)
+            return Response(
+                {"detail": f"El tipo de reporte '{reporte.tipo_reporte}' ya no se puede descargar."},
+                status=status.HTTP_410_GONE,
+            )
+        filename = exportacion.nombre_archivo(reporte.parametros or {})
+        return FileResponse(
+            open(reporte.archivo_path, 'rb'),
+            as_attachment=True,
+            filename=filename,
+            content_type=XLSX_CONTENT_TYPE,
+        )
+
+
 class ReporteHistorialList(generics.ListAPIView):
     serializer_class = ReporteSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -225,6 +630,30 @@ class ContratanteRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView
     permission_classes = [permissions.IsAuthenticated]
 
 
+class PartesBusquedaView(APIView):
+    """
+    Typeahead de partes: ?q=<texto>&limite=<n>. Devuelve id, nombre y
+    documento de las mejores coincidencias (ver polizas.busqueda).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    model = None
+
+    def get(self, request):
+        try:
+            limite = int(request.query_params.get('limite', 10))
+        except ValueError:
+            limite = 10
+        return Response(buscar_partes(self.model, request.query_params.get('q'), limite))
+
+
+class ContratanteBusquedaView(PartesBusquedaView):
+    model = Contratante
+
+
+class AseguradoBusquedaView(PartesBusquedaView):
+    model = Asegurado
+
+
 class AseguradoListCreateView(generics.ListCreateAPIView):
     queryset = Asegurado.objects.all()
     serializer_class = AseguradoSerializer
@@ -253,37 +682,17 @@ class FormaPagoRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 class PolizaReporteFilterMixin:
     def get_filtered_queryset(self):
-        queryset = Poliza.objects.select_related(
-            'aseguradora', 'ramo', 'contratante', 'asegurado', 'forma_pago'
-        ).all()
-
-        fecha_desde = self.request.query_params.get('fecha_desde')
-        fecha_hasta = self.request.query_params.get('fecha_hasta')
-        aseguradora_id = self.request.query_params.get('aseguradora')
-        contratante_id = self.request.query_params.get('contratante')
-        asegurado_id = self.request.query_params.get('asegurado')
-
-        if fecha_desde and fecha_hasta:
-            try:
-                f_inicio = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                f_fin = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha_inicio__range=[f_inicio, f_fin])
-            except ValueError:
-                pass
-
-        if aseguradora_id:
-            queryset = queryset.filter(aseguradora_id=aseguradora_id)
-        if contratante_id:
-            queryset = queryset.filter(contratante_id=contratante_id)
-        if asegurado_id:
-            queryset = queryset.filter(asegurado_id=asegurado_id)
-
-        return queryset.order_by('fecha_inicio')
-
-
-class PolizaReporteListView(generics.ListAPIView, PolizaReporteFilterMixin):
+        return polizas_reporte(self.request.query_params)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class PolizaReporteListView(ListaCondicionalMixin, PolizaListaRapidaMixin, generics.ListAPIView,
+                            PolizaReporteFilterMixin):
     serializer_class = PolizaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('fecha_inicio', 'id')
+    catalogos = CATALOGOS_LISTA_POLIZA
 
     def get_queryset(self):
         return self.get_filtered_queryset()
@@ -294,33 +703,68 @@ class ExportarPolizasExcelView(APIView, PolizaReporteFilterMixin):
 
     def get(self, request):
         queryset = self.get_filtered_queryset()
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="reporte_polizas.xlsx"'
-
-        workbook = openpyxl.Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Pólizas'
-
-        columns = ['Nro Póliza', 'Aseguradora', 'Ramo', 'Forma Pago', 'Contratante', 'Asegurado', 'Fecha Inicio',
-                   'Fecha Fin', 'Prima Total', 'Renovación']
-        worksheet.append(columns)
-
-        for poliza in queryset:
-            worksheet.append([
-                poliza.numero,
-                poliza.aseguradora.nombre,
-                poliza.ramo.nombre,
-                poliza.forma_pago.nombre if poliza.forma_pago else '-',
-                poliza.contratante.nombre,
-                poliza.asegurado.nombre,
-                poliza.fecha_inicio,
-                poliza.fecha_fin,
-                poliza.prima_total,
-                poliza.renovacion
-            ])
-
-        workbook.save(response)
-        return response
+        return respuesta_xlsx(queryset, ExportacionReporte(), 'reporte_polizas.xlsx')
+
+
+class AnaliticaPrimasView(APIView):
+    """
+    Totales de pólizas, prima y monto asegurado agrupados según `agrupar`
+    (aseguradora, ramo, forma_pago, mes, anio; separados por comas). Se leen
+    de ResumenPrimas, no de las pólizas, así que el costo no depende del
+    tamaño de la cartera. `fecha_desde`/`fecha_hasta` filtran por mes de inicio.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        agrupar = [d.strip() for d in params.get('agrupar', 'aseguradora').split(',') if d.strip()]
+        invalidas = [d for d in agrupar if d not in resumenes.AGRUPACIONES]
+        if invalidas:
+            return Response(
+                {"detail": f"Agrupación inválida: {', '.join(invalidas)}. "
+                           f"Opciones: {', '.join(resumenes.AGRUPACIONES)}."},
+                status=400,
+            )
+        try:
+            desde = parsear_fecha(params['fecha_desde']) if params.get('fecha_desde') else None
+            hasta = parsear_fecha(params['fecha_hasta']) if params.get('fecha_hasta') else None
+        except ValueError:
+            return Response({"detail": "Formato de fecha inválido. Use YYYY-MM-DD"}, status=400)
+        catalogos = {}
+        for campo in ('aseguradora', 'ramo', 'forma_pago'):
+            if params.get(campo):
+                try:
+                    catalogos[campo] = int(params[campo])
+                except ValueError:
+                    return Response({"detail": f"{campo} debe ser un entero."}, status=400)
+
+        filas = resumenes.consultar(agrupar, desde=desde, hasta=hasta, **catalogos)
+        resultados = []
+        totales = {'polizas': 0, 'prima_total': resumenes.CERO, 'monto_asegurado': resumenes.CERO}
+        for fila in filas:
+            resultado = {}
+            for dimension in agrupar:
+                if dimension == 'mes':
+                    resultado['mes'] = fila['mes'].strftime('%Y-%m')
+                elif dimension == 'anio':
+                    resultado['anio'] = fila['anio'].year
+                else:
+                    campo_id, campo_nombre = resumenes.AGRUPACIONES[dimension]
+                    resultado[dimension] = fila[campo_id]
+                    resultado[f'{dimension}_nombre'] = fila[campo_nombre]
+            resultado['polizas'] = fila['polizas_total']
+            prima_total = resumenes.centimos(fila['prima_total_sum'])
+            monto_asegurado = resumenes.centimos(fila['monto_asegurado_sum'])
+            resultado['prima_total'] = str(prima_total)
+            resultado['monto_asegurado'] = str(monto_asegurado)
+            totales['polizas'] += fila['polizas_total']
+            totales['prima_total'] += prima_total
+            totales['monto_asegurado'] += monto_asegurado
+            resultados.append(resultado)
+
+        totales['prima_total'] = str(totales['prima_total'])
+        totales['monto_asegurado'] = str(totales['monto_asegurado'])
+        return Response({'agrupar': agrupar, 'resultados': resultados, 'totales': totales})
 
 
 # --- NUEVA VISTA: Exportar Pólizas Próximas a Vencer ---
@@ -333,64 +777,21 @@ class ExportarPolizasProximasVencerExcelView(APIView):
 
     def get(self, request):
         # 1. Filtro: misma lógica que PolizaProximaVencerList
-        fecha_str = self.request.query_params.get('fecha', None)
-
-        if fecha_str:
-            try:
-                consult_date = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-            except ValueError:
-                return Response({"detail": "Fecha inválida"}, status=400)
-        else:
-            consult_date = timezone.now().date()
+        try:
+            consult_date = fecha_consulta(self.request.query_params.get('fecha', None))
+        except ValueError:
+            return Response({"detail": "Fecha inválida"}, status=400)
 
-        queryset = Poliza.objects.select_related(
-            'aseguradora', 'ramo', 'contratante', 'asegurado', 'forma_pago'
-        ).filter(
-            renovacion__gte=consult_date
-        ).order_by('renovacion')
+        queryset = polizas_proximas_vencer(consult_date)
 
-        # 2. Configurar Excel
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        )
+        # 2. El Excel se envía en streaming a medida que se leen las filas
         filename = f"Proximas_Vencer_{consult_date}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        workbook = openpyxl.Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Próximas a Vencer'
-
-        # 3. Columnas: Exactamente las que ve el Analista en su tabla
-        columns = [
-            'Aseguradora', 'Ramo', 'Forma Pago', 'Nro Póliza',
-            'Contratante', 'Asegurado',
-            'Vigencia',  # Combinamos inicio y fin como string
-            'I Trimestre', 'II Trimestre', 'III Trimestre', 'IV Trimestre',
-            'Prima Total', 'Renovación'
-        ]
-        worksheet.append(columns)
-
-        # 4. Datos
-        for poliza in queryset:
-            # Manejo de nulos por seguridad
-            aseg = poliza.aseguradora.nombre if poliza.aseguradora else '-'
-            ramo = poliza.ramo.nombre if poliza.ramo else '-'
-            pago = poliza.forma_pago.nombre if poliza.forma_pago else '-'
-            cont = poliza.contratante.nombre if poliza.contratante else '-'
-            aseg_pers = poliza.asegurado.nombre if poliza.asegurado else '-'
-
-            # Formato de vigencia como string "YYYY-MM-DD - YYYY-MM-DD"
-            vigencia_str = f"{poliza.fecha_inicio} - {poliza.fecha_fin}"
-
-            worksheet.append([
-                aseg, ramo, pago, poliza.numero,
-                cont, aseg_pers,
-                vigencia_str,
-                poliza.i_trimestre, poliza.ii_trimestre,
-                poliza.iii_trimestre, poliza.iv_trimestre,
-                poliza.prima_total,
-                poliza.renovacion
-            ])
-
-        workbook.save(response)
-        return response
\ No newline at end of file
+        return respuesta_xlsx(queryset, ExportacionProximasVencer(), filename)
+
+
+class MetricasView(APIView):
+    """Métricas por ruta de todos los workers, en formato de texto de Prometheus."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(metricas.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
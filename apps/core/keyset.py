@@ -0,0 +1,48 @@
+"""
+Utilidades de recorrido por clave (keyset): en lugar de OFFSET se filtra
+"después de la última fila vista", de modo que cada bloque cuesta lo mismo
+sin importar cuán adentro de la tabla esté.
+"""
+from django.db.models import Q
+
+
+def despues_de(campos, valores):
+    """
+    Q equivalente a (campo1, campo2, ...) > (valor1, valor2, ...) en orden
+    lexicográfico. Un campo con prefijo '-' se recorre en orden descendente.
+
+    Se agrega la cota redundante campo1 >= valor1 para que el motor pueda
+    arrancar el recorrido del índice en esa posición en vez de filtrar
+    desde el principio.
+    """
+    condicion = Q()
+    iguales = Q()
+    for campo, valor in zip(campos, valores):
+        nombre = campo.lstrip('-')
+        lookup = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= iguales & Q(**{f'{nombre}__{lookup}': valor})
+        iguales &= Q(**{nombre: valor})
+    primero = campos[0]
+    cota = 'lte' if primero.startswith('-') else 'gte'
+    return Q(**{f'{primero.lstrip("-")}__{cota}': valores[0]}) & condicion
+
+
+def iterar_por_bloques(queryset, orden, campos, tamano=2000):
+    """
+    Recorre `queryset` en bloques de `tamano` filas ordenadas por `orden`
+    (que debe terminar en una columna única, p. ej. 'id') y produce listas
+    de tuplas con los valores de `campos`.
+    """
+    claves = [campo.lstrip('-') for campo in orden]
+    base = queryset.order_by(*orden).values_list(*claves, *campos)
+    n = len(claves)
+    ultimo = None
+    while True:
+        bloque_qs = base if ultimo is None else base.filter(despues_de(orden, ultimo))
+        bloque = list(bloque_qs[:tamano])
+        if not bloque:
+            return
+        yield [fila[n:] for fila in bloque]
+        if len(bloque) < tamano:
+            return
+        ultimo = bloque[-1][:n]
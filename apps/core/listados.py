@@ -0,0 +1,95 @@
+"""
+Listados del admin para tablas grandes (pólizas, contratantes, asegurados).
+
+`AdminTablaGrande` reúne lo que hace falta para que un changelist no recorra
+la tabla entera en cada página:
+
+- `ConteoEstimadoPaginator`: sin filtros ni búsqueda, en PostgreSQL toma la
+  cantidad de filas de las estadísticas del planificador (pg_class.reltuples)
+  en lugar de un COUNT(*). Con filtros, o si la tabla es chica, cuenta.
+- `show_full_result_count = False`: el admin no vuelve a contar la tabla
+  completa para mostrar "N resultados (M en total)".
+- `FiltroAutocompletar`: filtro por clave foránea con un selector de
+  autocompletado (el mismo de autocomplete_fields) en vez de listar todas
+  las filas relacionadas en la barra lateral. El admin del modelo
+  relacionado necesita search_fields.
+"""
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Por debajo de esta estimación el COUNT(*) es barato y se prefiere exacto
+CONTEO_EXACTO_HASTA = 10000
+
+
+def filas_estimadas(modelo, alias):
+    """Filas de la tabla según las estadísticas de PostgreSQL, o None si no hay."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(modelo._meta.db_table)],
+        )
+        fila = cursor.fetchone()
+    # reltuples es -1 (o 0) mientras la tabla no se analizó
+    if fila is None or fila[0] is None or fila[0] <= 0:
+        return None
+    return fila[0]
+
+
+class ConteoEstimadoPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimado = filas_estimadas(queryset.model, queryset.db)
+            if estimado is not None and estimado > CONTEO_EXACTO_HASTA:
+                return estimado
+        return super().count
+
+
+class FiltroAutocompletar(admin.RelatedFieldListFilter):
+    template = 'admin/filtro_autocompletar.html'
+
+    def field_choices(self, field, request, model_admin):
+        # El selector trae las opciones por AJAX; aquí no se carga ninguna
+        self.model_admin = model_admin
+        return []
+
+    def has_output(self):
+        return True
+
+    def selector(self):
+        modelo = self.field.remote_field.model
+        campo = forms.ModelChoiceField(
+            queryset=modelo._default_manager.all(),
+            widget=AutocompleteSelect(self.field, self.model_admin.admin_site),
+            required=False,
+        )
+        return campo.widget.render(
+            self.lookup_kwarg, self.lookup_val,
+            attrs={'id': f'filtro_{self.field_path}', 'class': 'filtro-autocompletar'},
+        )
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg, self.lookup_kwarg_isnull]),
+            'selector': self.selector(),
+        }
+
+
+class AdminTablaGrande(admin.ModelAdmin):
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        extra = AutocompleteSelect(None, None).media + forms.Media(js=['core/filtro_autocompletar.js'])
+        return super().media + extra
@@ -0,0 +1,236 @@
+"""
+Métricas por ruta en formato de texto de Prometheus (activar con METRICAS=1).
+
+MetricasMiddleware acumula en memoria, por nombre de ruta (p. ej.
+'poliza-list', 'reporte-excel', 'token_refresh') y método:
+
+- histograma de latencia (segundos), del que salen p50/p95/p99;
+- peticiones por clase de estado (2xx, 4xx...) y errores (5xx);
+- consultas a la base y bytes de respuesta, como totales.
+
+Con varios workers de gunicorn cada proceso tiene lo suyo. Si METRICAS_DIR
+está definido, cada proceso vuelca su estado a METRICAS_DIR/<pid>.json a
+lo sumo cada METRICAS_VOLCADO_SEGUNDOS y al terminar, y `exportar` suma los
+archivos de todos los procesos; sin METRICAS_DIR se ve solo el worker que
+atiende la consulta. Los archivos de workers que ya terminaron se siguen
+sumando (los contadores no retroceden); se borran al vaciar el directorio
+en cada despliegue.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+LIMITES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CUANTILES = (0.5, 0.95, 0.99)
+SIN_RUTA = 'sin_ruta'
+
+
+def _nueva_serie():
+    return {
+        'cubetas': [0] * (len(LIMITES) + 1),  # la última es +Inf
+        'suma': 0.0,
+        'estados': {},
+        'errores': 0,
+        'consultas': 0,
+        'bytes': 0,
+    }
+
+
+class Registro:
+    def __init__(self, directorio=None, intervalo=10):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self.series = {}  # (ruta, método) -> serie
+        self.ultimo_volcado = time.monotonic()
+        self.lock = threading.Lock()
+
+    def observar(self, ruta, metodo, estado, duracion, consultas, tamano):
+        with self.lock:
+            serie = self.series.get((ruta, metodo))
+            if serie is None:
+                serie = self.series[(ruta, metodo)] = _nueva_serie()
+            indice = len(LIMITES)
+            for i, limite in enumerate(LIMITES):
+                if duracion <= limite:
+                    indice = i
+                    break
+            serie['cubetas'][indice] += 1
+            serie['suma'] += duracion
+            clase = f'{estado // 100}xx'
+            serie['estados'][clase] = serie['estados'].get(clase, 0) + 1
+            if estado >= 500:
+                serie['errores'] += 1
+            serie['consultas'] += consultas
+            if tamano is not None:
+                serie['bytes'] += tamano
+            toca = self.directorio and time.monotonic() - self.ultimo_volcado >= self.intervalo
+        if toca:
+            self.volcar()
+
+    def estado(self):
+        with self.lock:
+            return [
+                {'ruta': ruta, 'metodo': metodo, **serie,
+                 'cubetas': list(serie['cubetas']), 'estados': dict(serie['estados'])}
+                for (ruta, metodo), serie in self.series.items()
+            ]
+
+    def archivo(self):
+        return os.path.join(self.directorio, f'{os.getpid()}.json')
+
+    def volcar(self):
+        if not self.directorio:
+            return
+        estado = self.estado()
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = f'{self.archivo()}.tmp'
+        with open(temporal, 'w') as salida:
+            json.dump(estado, salida)
+        os.replace(temporal, self.archivo())  # atómico: quien lee nunca ve un archivo a medias
+        with self.lock:
+            self.ultimo_volcado = time.monotonic()
+
+    def combinado(self):
+        """Series de todos los procesos (o solo de este, sin directorio)."""
+        estados = [self.estado()]
+        if self.directorio:
+            propio = self.archivo()
+            for ruta in glob.glob(os.path.join(self.directorio, '*.json')):
+                if ruta == propio:
+                    continue  # el estado en memoria es más nuevo que el archivo
+                try:
+                    with open(ruta) as entrada:
+                        estados.append(json.load(entrada))
+                except (OSError, ValueError):
+                    continue
+        series = {}
+        for estado in estados:
+            for entrada in estado:
+                serie = series.setdefault((entrada['ruta'], entrada['metodo']), _nueva_serie())
+                serie['cubetas'] = [a + b for a, b in zip(serie['cubetas'], entrada['cubetas'])]
+                serie['suma'] += entrada['suma']
+                for clase, cantidad in entrada['estados'].items():
+                    serie['estados'][clase] = serie['estados'].get(clase, 0) + cantidad
+                for campo in ('errores', 'consultas', 'bytes'):
+                    serie[campo] += entrada[campo]
+        return series
+
+
+registro = Registro(
+    directorio=getattr(settings, 'METRICAS_DIR', None),
+    intervalo=getattr(settings, 'METRICAS_VOLCADO_SEGUNDOS', 10),
+)
+
+
+@atexit.register
+def _volcar_al_salir():
+    try:
+        registro.volcar()
+    except OSError:
+        pass
+
+
+def cuantil(cubetas, q):
+    """Estimación de un cuantil interpolando dentro de la cubeta, como histogram_quantile."""
+    total = sum(cubetas)
+    if not total:
+        return None
+    objetivo = q * total
+    acumulado = 0
+    for i, cantidad in enumerate(cubetas):
+        if acumulado + cantidad >= objetivo and cantidad:
+            if i == len(LIMITES):
+                return LIMITES[-1]  # cae en +Inf: no hay mejor cota
+            inferior = LIMITES[i - 1] if i else 0.0
+            return inferior + (LIMITES[i] - inferior) * (objetivo - acumulado) / cantidad
+        acumulado += cantidad
+    return LIMITES[-1]
+
+
+def _etiquetas(**valores):
+    return '{%s}' % ','.join(
+        '%s="%s"' % (clave, str(valor).replace('\\', '\\\\').replace('"', '\\"'))
+        for clave, valor in valores.items()
+    )
+
+
+def exportar():
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+    series = sorted(registro.combinado().items())
+    lineas = []
+
+    def encabezado(nombre, tipo, ayuda):
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+
+    encabezado('seguros_http_latencia_segundos', 'histogram', 'Duración de las peticiones por ruta.')
+    for (ruta, metodo), serie in series:
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES + ('+Inf',), serie['cubetas']):
+            acumulado += cantidad
+            lineas.append('seguros_http_latencia_segundos_bucket%s %d' % (
+                _etiquetas(ruta=ruta, metodo=metodo, le=limite), acumulado))
+        lineas.append('seguros_http_latencia_segundos_sum%s %r' % (_etiquetas(ruta=ruta, metodo=metodo), serie['suma']))
+        lineas.append('seguros_http_latencia_segundos_count%s %d' % (_etiquetas(ruta=ruta, metodo=metodo), acumulado))
+
+    encabezado('seguros_http_latencia_estimada_segundos', 'gauge',
+               'Cuantiles de latencia estimados a partir del histograma (todos los procesos).')
+    for (ruta, metodo), serie in series:
+        for q in CUANTILES:
+            valor = cuantil(serie['cubetas'], q)
+            if valor is not None:
+                lineas.append('seguros_http_latencia_estimada_segundos%s %.6f' % (
+                    _etiquetas(ruta=ruta, metodo=metodo, cuantil=q), valor))
+
+    encabezado('seguros_http_peticiones_total', 'counter', 'Peticiones por ruta y clase de estado.')
+    for (ruta, metodo), serie in series:
+        for clase, cantidad in sorted(serie['estados'].items()):
+            lineas.append('seguros_http_peticiones_total%s %d' % (
+                _etiquetas(ruta=ruta, metodo=metodo, estado=clase), cantidad))
+
+    for nombre, campo, ayuda in (
+        ('seguros_http_errores_total', 'errores', 'Respuestas 5xx por ruta.'),
+        ('seguros_http_consultas_total', 'consultas', 'Consultas a la base por ruta.'),
+        ('seguros_http_respuesta_bytes_total', 'bytes', 'Bytes de respuesta por ruta (sin streaming).'),
+    ):
+        encabezado(nombre, 'counter', ayuda)
+        for (ruta, metodo), serie in series:
+            lineas.append('%s%s %d' % (nombre, _etiquetas(ruta=ruta, metodo=metodo), serie[campo]))
+
+    return '\n'.join(lineas) + '\n'
+
+
+class _ContadorConsultas:
+    def __init__(self):
+        self.consultas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.consultas += 1
+        return execute(sql, params, many, context)
+
+
+class MetricasMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inicio = time.perf_counter()
+        contador = _ContadorConsultas()
+        with connections['default'].execute_wrapper(contador):
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        ruta = coincidencia.view_name if coincidencia and coincidencia.url_name else SIN_RUTA
+        tamano = None if response.streaming else len(response.content)
+        registro.observar(ruta, request.method, response.status_code, duracion, contador.consultas, tamano)
+        return response
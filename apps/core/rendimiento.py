@@ -0,0 +1,140 @@
+"""
+Medición de tiempos por petición (activar con SERVER_TIMING=1).
+
+ServerTimingMiddleware mide cada petición y agrega a la respuesta:
+
+    Server-Timing: db;dur=12.4;desc="18 consultas", serializacion;dur=30.1,
+                   render;dur=8.2, total;dur=52.0
+    X-Query-Count: 18
+
+- db: tiempo en la base (todas las consultas de la petición). Es lo que
+  tarda execute(); la lectura de las filas del cursor queda en la vista.
+- serializacion: tiempo de la vista fuera de db; en los listados es casi
+  todo lectura de filas y armado de los dicts de respuesta.
+- render: JSONRenderer / plantilla, después de que la vista devuelve.
+- total: desde que la petición entra al middleware hasta que sale. En las
+  respuestas en streaming (exportaciones) el cuerpo se genera después y no
+  entra en la medición.
+
+Las peticiones que tardan más de SERVER_TIMING_LENTO_MS se registran en el
+logger 'seguros.rendimiento' junto con sus consultas más lentas. Apagado, el
+middleware se quita solo de la cadena (MiddlewareNotUsed) y no cuesta nada.
+"""
+import heapq
+import itertools
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('seguros.rendimiento')
+
+CONSULTAS_LENTAS = 5
+LARGO_SQL = 500
+
+
+class Medicion:
+    """Consultas y tiempos de una petición; queda en request.medicion."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.db = 0.0
+        self.db_en_vista = 0.0
+        self.en_vista = False
+        self.vista = None
+        self.render = None
+        self.total = None
+        self.lentas = []  # heap de (duración, orden, sql) con las más lentas
+        self._orden = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper: envuelve cada consulta de la conexión
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.db += duracion
+            if self.en_vista:
+                self.db_en_vista += duracion
+            entrada = (duracion, next(self._orden), sql)
+            if len(self.lentas) < CONSULTAS_LENTAS:
+                heapq.heappush(self.lentas, entrada)
+            elif duracion > self.lentas[0][0]:
+                heapq.heapreplace(self.lentas, entrada)
+
+    @property
+    def serializacion(self):
+        if self.vista is None:
+            return None
+        return max(self.vista - self.db_en_vista, 0.0)
+
+    def consultas_lentas(self):
+        return [(duracion, sql) for duracion, _, sql in sorted(self.lentas, reverse=True)]
+
+    def server_timing(self):
+        partes = [f'db;dur={self.db * 1000:.1f};desc="{self.consultas} consultas"']
+        if self.serializacion is not None:
+            partes.append(f'serializacion;dur={self.serializacion * 1000:.1f}')
+        if self.render is not None:
+            partes.append(f'render;dur={self.render * 1000:.1f}')
+        partes.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(partes)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.lento = getattr(settings, 'SERVER_TIMING_LENTO_MS', 1000) / 1000
+
+    def __call__(self, request):
+        medicion = request.medicion = Medicion()
+        with connections['default'].execute_wrapper(medicion):
+            response = self.get_response(request)
+        if medicion.vista is None and medicion.en_vista:
+            # Respuesta sin render diferido (HttpResponse, FileResponse...)
+            self._fin_vista(medicion)
+        medicion.total = time.perf_counter() - medicion.inicio
+
+        response['Server-Timing'] = medicion.server_timing()
+        response['X-Query-Count'] = str(medicion.consultas)
+        if medicion.total >= self.lento:
+            self._registrar_lenta(request, response, medicion)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicion = request.medicion
+        medicion.en_vista = True
+        medicion.inicio_vista = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # La vista terminó y el render todavía no empezó (DRF Response)
+        medicion = request.medicion
+        self._fin_vista(medicion)
+        inicio_render = time.perf_counter()
+
+        def fin_render(respuesta):
+            medicion.render = time.perf_counter() - inicio_render
+        response.add_post_render_callback(fin_render)
+        return response
+
+    @staticmethod
+    def _fin_vista(medicion):
+        medicion.vista = time.perf_counter() - medicion.inicio_vista
+        medicion.en_vista = False
+
+    def _registrar_lenta(self, request, response, medicion):
+        lentas = '\n'.join(
+            f'  {duracion * 1000:.1f} ms: {sql[:LARGO_SQL]}' for duracion, sql in medicion.consultas_lentas()
+        )
+        logger.warning(
+            'Petición lenta: %s %s -> %s en %.0f ms (%s)\n%s',
+            request.method, request.get_full_path(), response.status_code,
+            medicion.total * 1000, medicion.server_timing(), lentas,
+        )
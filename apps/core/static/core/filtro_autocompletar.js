@@ -0,0 +1,16 @@
+// Filtros del changelist con selector de autocompletado (core.listados.FiltroAutocompletar):
+// al elegir una opción se recarga el listado con ese filtro aplicado.
+'use strict';
+{
+    const $ = django.jQuery;
+    $(document).on('change', 'select.filtro-autocompletar', function() {
+        const base = $(this).closest('[data-sin-filtro]').data('sin-filtro') || '?';
+        const valor = $(this).val();
+        if (!valor) {
+            window.location.search = base;
+            return;
+        }
+        const separador = base.length > 1 ? '&' : '';
+        window.location.search = base + separador + encodeURIComponent(this.name) + '=' + encodeURIComponent(valor);
+    });
+}
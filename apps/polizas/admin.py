@@ -1,4 +1,7 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Q
+from core.listados import AdminTablaGrande, FiltroAutocompletar
+from .cuotas import recalcular_cuotas
 from .models import Poliza, Aseguradora, Ramo, Contratante, Asegurado, FormaPago, ReporteGenerado
 
 @admin.register(Aseguradora)
@@ -11,29 +14,78 @@ class RamoAdmin(admin.ModelAdmin):
     list_display = ('id', 'nombre', 'descripcion')
     search_fields = ('nombre',)
 
+def _informar_recalculo(modeladmin, request, resumen):
+    modeladmin.message_user(
+        request,
+        f"{resumen['revisadas']} pólizas revisadas, {resumen['actualizadas']} actualizadas "
+        f"({resumen['no_suman']} tenían cuotas que no sumaban la prima).",
+        messages.SUCCESS,
+    )
+
+
 @admin.register(FormaPago)
 class FormaPagoAdmin(admin.ModelAdmin):
     list_display = ('id', 'nombre', 'descripcion')
+    search_fields = ('nombre',)
+    actions = ['recalcular_cuotas']
+
+    @admin.action(description='Recalcular cuotas de las pólizas con estas formas de pago')
+    def recalcular_cuotas(self, request, queryset):
+        resumen = recalcular_cuotas(Poliza.objects.filter(forma_pago__in=queryset))
+        _informar_recalculo(self, request, resumen)
 
 # --- IMPORTANTE: ESTO PERMITE VER Y BORRAR CONTRATANTES DUPLICADOS ---
+# search_fields con icontains: en PostgreSQL los resuelven los índices de
+# trigramas sobre UPPER(nombre/documento) de la migración 0011
 @admin.register(Contratante)
-class ContratanteAdmin(admin.ModelAdmin):
+class ContratanteAdmin(AdminTablaGrande):
     list_display = ('id', 'nombre', 'documento', 'email', 'telefono')
     search_fields = ('nombre', 'documento')
 
 @admin.register(Asegurado)
-class AseguradoAdmin(admin.ModelAdmin):
+class AseguradoAdmin(AdminTablaGrande):
     list_display = ('id', 'nombre', 'documento', 'email', 'telefono')
     search_fields = ('nombre', 'documento')
 
 @admin.register(Poliza)
-class PolizaAdmin(admin.ModelAdmin):
+class PolizaAdmin(AdminTablaGrande):
     list_display = ('id', 'numero', 'aseguradora', 'contratante', 'fecha_inicio', 'fecha_fin', 'prima_total')
-    list_filter = ('aseguradora', 'ramo', 'forma_pago', 'fecha_inicio')
+    list_select_related = ('aseguradora', 'contratante')
+    list_filter = (
+        ('aseguradora', FiltroAutocompletar),
+        ('ramo', FiltroAutocompletar),
+        ('forma_pago', FiltroAutocompletar),
+        ('contratante', FiltroAutocompletar),
+        ('asegurado', FiltroAutocompletar),
+        'fecha_inicio',
+    )
+    # Solo para mostrar el buscador: la búsqueda la hace get_search_results
     search_fields = ('numero', 'contratante__nombre', 'asegurado__nombre')
     autocomplete_fields = ['aseguradora', 'ramo', 'contratante', 'asegurado']
+    actions = ['recalcular_cuotas']
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Cada palabra debe aparecer en el número, o en el nombre o documento del
+        contratante o del asegurado. Las partes se buscan primero en sus tablas
+        (índices de trigramas) y la póliza se filtra por id de parte, en lugar
+        de un icontains sobre los JOIN que obliga a recorrer toda la cartera.
+        """
+        for palabra in search_term.split():
+            partes = Q(nombre__icontains=palabra) | Q(documento__icontains=palabra)
+            queryset = queryset.filter(
+                Q(numero__icontains=palabra)
+                | Q(contratante__in=Contratante.objects.filter(partes).values('id'))
+                | Q(asegurado__in=Asegurado.objects.filter(partes).values('id'))
+            )
+        return queryset, False
+
+    @admin.action(description='Recalcular cuotas trimestrales')
+    def recalcular_cuotas(self, request, queryset):
+        _informar_recalculo(self, request, recalcular_cuotas(queryset))
 
 @admin.register(ReporteGenerado)
 class ReporteGeneradoAdmin(admin.ModelAdmin):
     list_display = ('id', 'usuario', 'tipo_reporte', 'fecha_generacion')
+    list_select_related = ('usuario',)
     list_filter = ('tipo_reporte', 'fecha_generacion')
\ No newline at end of file
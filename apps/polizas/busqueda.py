@@ -0,0 +1,65 @@
+"""
+Búsqueda tipo "typeahead" de contratantes y asegurados por nombre o documento.
+
+Se resuelve en fases de menor a mayor costo, cada una limitada a `limite`
+filas y cortando apenas hay suficientes resultados. Las fases van de mejor a
+peor coincidencia y cada una trae sus filas ordenadas:
+
+1. documento exacto (índice único)
+2. documento que empieza por el texto (índice único, varchar_pattern_ops en
+   PostgreSQL), en orden de documento
+3. nombre que empieza por el texto, en orden alfabético sin distinguir
+   mayúsculas
+4. nombre o documento que contienen el texto: primero donde el texto aparece
+   antes en el nombre, al final las que solo coinciden por documento
+
+Con menos de LARGO_MINIMO caracteres solo se busca el documento exacto: un
+prefijo de una o dos letras coincide con buena parte de la tabla.
+
+En PostgreSQL la fase 3 usa el índice btree sobre (UPPER(nombre) COLLATE "C",
+id) de la migración 0016, que sirve tanto al LIKE por prefijo como al orden,
+así que el LIMIT corta sin ordenar todas las coincidencias; la fase 4 usa
+los índices GIN de trigramas de la migración 0011. En SQLite (desarrollo
+local) recorren la tabla.
+"""
+from django.db import connections
+from django.db.models import Q, Value
+from django.db.models.functions import Collate, NullIf, StrIndex, Upper
+
+CAMPOS = ('id', 'nombre', 'documento')
+LIMITE_MAXIMO = 50
+LARGO_MINIMO = 3
+
+
+def buscar_partes(modelo, texto, limite=10):
+    texto = (texto or '').strip()
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    if not texto:
+        return []
+
+    fases = [(Q(documento=texto) | Q(documento=texto.upper()), ('documento',))]
+    if len(texto) >= LARGO_MINIMO:
+        nombre = Upper('nombre')
+        if connections[modelo.objects.db].vendor == 'postgresql':
+            # la misma expresión y colación que el índice de la migración 0016
+            nombre = Collate(nombre, 'C')
+        posicion = NullIf(StrIndex(Upper('nombre'), Value(texto.upper())), Value(0))
+        fases += [
+            (Q(documento__startswith=texto.upper()), ('documento',)),
+            (Q(nombre__istartswith=texto), (nombre, 'id')),
+            (Q(nombre__icontains=texto) | Q(documento__icontains=texto),
+             (posicion.asc(nulls_last=True), 'nombre', 'id')),
+        ]
+    resultados = []
+    vistos = set()
+    for condicion, orden in fases:
+        faltan = limite - len(resultados)
+        if faltan <= 0:
+            break
+        queryset = modelo.objects.filter(condicion)
+        if vistos:
+            queryset = queryset.exclude(id__in=vistos)
+        encontrados = list(queryset.order_by(*orden).values(*CAMPOS)[:faltan])
+        resultados.extend(encontrados)
+        vistos.update(fila['id'] for fila in encontrados)
+    return resultados
@@ -0,0 +1,148 @@
+"""
+Feed de cambios para los sistemas que sincronizan la cartera (BI, conciliación).
+
+Recorre contratantes, asegurados y pólizas por (actualizado, id), y las
+lápidas de Eliminacion por (eliminado, id), siempre después de la posición
+guardada en el cursor. Cada tabla tiene un índice con esas dos columnas, así
+que una sincronización cuesta según la cantidad de cambios y no según el
+tamaño de la cartera.
+
+Solo se leen filas marcadas antes de ahora - CAMBIOS_MARGEN_SEGUNDOS:
+`actualizado` se fija al guardar y la transacción confirma después, de modo
+que una fila puede volverse visible con una marca anterior a la última ya
+entregada. El margen debe superar la escritura más larga (una importación);
+una transacción más lenta que eso podría no entregarse.
+
+Las lápidas las escribe `registrar_eliminacion` (post_delete), de a una o,
+dentro de `bajas_en_lote()`, en un solo INSERT. Se conservan
+CAMBIOS_RETENCION_DIAS; un cursor más viejo ya no garantiza ver todas las
+bajas y hay que volver a sincronizar desde cero.
+"""
+import base64
+import json
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.keyset import despues_de
+from .models import Asegurado, Contratante, Eliminacion, Poliza
+
+MARGEN = getattr(settings, 'CAMBIOS_MARGEN_SEGUNDOS', 60)
+RETENCION_DIAS = getattr(settings, 'CAMBIOS_RETENCION_DIAS', 90)
+LOTE_PURGA = 1000
+
+# (nombre, modelo, columna de tiempo), en el orden en que se entregan: las
+# partes antes que las pólizas que las referencian, las bajas al final
+FLUJOS = (
+    ('contratante', Contratante, 'actualizado'),
+    ('asegurado', Asegurado, 'actualizado'),
+    ('poliza', Poliza, 'actualizado'),
+    ('eliminacion', Eliminacion, 'eliminado'),
+)
+NOMBRES = {nombre for nombre, _, _ in FLUJOS}
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class CursorVencido(CursorInvalido):
+    pass
+
+
+class Cursor:
+    """Posición (marca, id) por flujo y el corte de la lectura que lo produjo."""
+
+    def __init__(self, posiciones=None, corte=None):
+        self.posiciones = dict(posiciones or {})
+        self.corte = corte
+
+    def codificar(self):
+        payload = {
+            'p': {nombre: [marca.isoformat(), pk] for nombre, (marca, pk) in self.posiciones.items()},
+            'c': self.corte.isoformat() if self.corte else None,
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    @classmethod
+    def decodificar(cls, texto):
+        if not texto:
+            return cls()
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4)))
+            posiciones = {}
+            for nombre, (marca, pk) in payload['p'].items():
+                if nombre not in NOMBRES or not isinstance(pk, int):
+                    raise ValueError
+                posiciones[nombre] = (_fecha_hora(marca), pk)
+            corte = _fecha_hora(payload['c']) if payload.get('c') else None
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise CursorInvalido('Cursor inválido.')
+        if corte is not None and corte < timezone.now() - timedelta(days=RETENCION_DIAS):
+            raise CursorVencido(f'Cursor de hace más de {RETENCION_DIAS} días: sincronice desde cero.')
+        return cls(posiciones, corte)
+
+
+def _fecha_hora(texto):
+    valor = parse_datetime(texto)
+    if valor is None:
+        raise ValueError(texto)
+    return valor
+
+
+def corte_actual():
+    return timezone.now() - timedelta(seconds=MARGEN)
+
+
+def pendientes(queryset, columna, posicion, corte, limite):
+    """Filas de `queryset` cambiadas después de `posicion` y hasta `corte`, en orden del índice."""
+    orden = (columna, 'id')
+    queryset = queryset.filter(**{f'{columna}__lte': corte})
+    if posicion is not None:
+        queryset = queryset.filter(despues_de(orden, posicion))
+    return queryset.order_by(*orden)[:limite]
+
+
+_lote = threading.local()
+
+
+def registrar_eliminacion(sender, instance, **kwargs):
+    lapida = Eliminacion(tipo=sender._meta.model_name, objeto_id=instance.pk)
+    lapidas = getattr(_lote, 'lapidas', None)
+    if lapidas is None:
+        lapida.save()
+    else:
+        lapidas.append(lapida)
+
+
+@contextmanager
+def bajas_en_lote():
+    """Junta las lápidas de los borrados del bloque y las inserta juntas al salir."""
+    if getattr(_lote, 'lapidas', None) is not None:
+        yield  # anidado: inserta el bloque exterior
+        return
+    _lote.lapidas = lapidas = []
+    try:
+        yield
+    finally:
+        _lote.lapidas = None
+    if lapidas:
+        Eliminacion.objects.bulk_create(lapidas)
+
+
+def purgar_eliminaciones(lote=LOTE_PURGA):
+    """Borra por lotes las lápidas más viejas que RETENCION_DIAS; devuelve cuántas."""
+    limite = timezone.now() - timedelta(days=RETENCION_DIAS)
+    borradas = 0
+    while True:
+        ids = list(Eliminacion.objects.filter(eliminado__lt=limite).order_by('id').values_list('id', flat=True)[:lote])
+        if not ids:
+            return borradas
+        Eliminacion.objects.filter(id__in=ids).delete()
+        borradas += len(ids)
+        if len(ids) < lote:
+            return borradas
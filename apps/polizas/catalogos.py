@@ -0,0 +1,128 @@
+"""
+Versionado de los catálogos que usa el formulario de pólizas.
+
+Cada alta, cambio o baja en uno de estos modelos incrementa su contador en
+VersionCatalogo (ver polizas.signals). Quien cachee un catálogo lo hace bajo
+su versión actual, de modo que un cambio simplemente deja de coincidir con
+la clave vieja; leer las cinco versiones cuesta una consulta sobre una tabla
+de cinco filas, válida para todos los procesos de gunicorn.
+
+El incremento va dentro de la misma transacción que el cambio, así que se
+confirma o se descarta con él: no hay una ventana entre el commit y el
+incremento en la que un proceso que muere deje la versión vieja (y con ella
+el catálogo viejo en caché hasta que venza). Se hace una vez por catálogo y
+por transacción aunque se toquen muchas filas; la fila de versión queda
+bloqueada hasta el commit, de modo que las transacciones que cambian el
+mismo catálogo se ordenan entre sí solo en ese último tramo.
+
+Los catálogos chicos (aseguradoras, ramos, formas de pago) se guardan además
+en memoria en cada proceso (`en_memoria`) para validar las FK de las pólizas
+sin ir a la base. `incrementar_version` los invalida en el proceso que hizo
+el cambio; los demás procesos los recargan a más tardar cada
+CATALOGOS_MEMORIA_SEGUNDOS, y un id que no está en memoria se busca en la
+base, así que un alta hecha en otro worker se acepta de inmediato. Una
+baja hecha en otro worker la detecta la FK al guardar la póliza, y la API la
+responde como error de validación del campo (PolizaSerializer._guardar).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Asegurado, Aseguradora, Contratante, FormaPago, Ramo, VersionCatalogo
+
+CATALOGOS = {
+    'aseguradoras': Aseguradora,
+    'ramos': Ramo,
+    'contratantes': Contratante,
+    'asegurados': Asegurado,
+    'formas_pago': FormaPago,
+}
+CATALOGO_POR_MODELO = {modelo: nombre for nombre, modelo in CATALOGOS.items()}
+
+
+def versiones():
+    """Versión actual de cada catálogo, en una sola consulta."""
+    actuales = dict(VersionCatalogo.objects.values_list('nombre', 'version'))
+    return {nombre: actuales.get(nombre, 0) for nombre in CATALOGOS}
+
+
+def _incrementar(nombre):
+    if not VersionCatalogo.objects.filter(nombre=nombre).update(version=F('version') + 1):
+        VersionCatalogo.objects.get_or_create(nombre=nombre, defaults={'version': 1})
+
+
+class _Invalidacion:
+    """
+    Callback de on_commit que descarta el catálogo en memoria al confirmar.
+    Marca además que la transacción ya incrementó ese catálogo: si se
+    revierte (o se revierte su savepoint) Django descarta el callback junto
+    con el incremento, y el próximo cambio vuelve a incrementar.
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.ejecutado = False
+
+    def __call__(self):
+        self.ejecutado = True
+        catalogo = en_memoria.get(self.nombre)
+        if catalogo is not None:
+            # Otro hilo pudo recargar antes del commit y quedarse con la foto vieja
+            catalogo.invalidar()
+
+
+def incrementar_version(nombre):
+    catalogo = en_memoria.get(nombre)
+    if catalogo is not None:
+        catalogo.invalidar()
+    connection = transaction.get_connection()
+    if connection.in_atomic_block and any(
+        isinstance(funcion, _Invalidacion) and funcion.nombre == nombre and not funcion.ejecutado
+        for _, funcion in connection.run_on_commit
+    ):
+        return
+    _incrementar(nombre)
+    transaction.on_commit(_Invalidacion(nombre))
+
+
+class CatalogoEnMemoria:
+    """Filas de un catálogo chico por id; las instancias son compartidas, no modificarlas."""
+
+    def __init__(self, modelo, vigencia):
+        self.modelo = modelo
+        self.vigencia = vigencia
+        self.por_id = None
+        self.cargado = None
+        self.lock = threading.Lock()
+
+    def invalidar(self):
+        with self.lock:
+            self.por_id = None
+
+    def filas(self):
+        ahora = time.monotonic()
+        por_id = self.por_id
+        if por_id is None or ahora - self.cargado >= self.vigencia:
+            por_id = {fila.pk: fila for fila in self.modelo.objects.all()}
+            with self.lock:
+                self.por_id, self.cargado = por_id, ahora
+        return por_id
+
+    def obtener(self, pk):
+        """Instancia con ese id; si no está en memoria se busca en la base (DoesNotExist si no existe)."""
+        fila = self.filas().get(pk)
+        if fila is None:
+            fila = self.modelo.objects.get(pk=pk)
+            with self.lock:
+                if self.por_id is not None:
+                    self.por_id[fila.pk] = fila
+        return fila
+
+
+en_memoria = {
+    nombre: CatalogoEnMemoria(CATALOGOS[nombre], getattr(settings, 'CATALOGOS_MEMORIA_SEGUNDOS', 60))
+    for nombre in ('aseguradoras', 'ramos', 'formas_pago')
+}
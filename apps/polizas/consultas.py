@@ -0,0 +1,60 @@
+"""
+Consultas de pólizas compartidas entre las vistas de la API, las
+exportaciones a Excel y los reportes generados en segundo plano.
+"""
+from datetime import datetime
+
+from django.utils import timezone
+
+from .models import Poliza
+
+
+def parsear_fecha(valor):
+    """Convierte 'YYYY-MM-DD' en date; lanza ValueError si el formato es inválido."""
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+def fecha_consulta(valor=None):
+    """Fecha de corte de 'próximas a vencer': la indicada o la de hoy."""
+    if valor:
+        return parsear_fecha(valor)
+    return timezone.now().date()
+
+
+def polizas_reporte(parametros):
+    """Pólizas filtradas por rango de fecha de inicio y partes, ordenadas por fecha de inicio."""
+    queryset = Poliza.objects.select_related(
+        'aseguradora', 'ramo', 'contratante', 'asegurado', 'forma_pago'
+    ).all()
+
+    fecha_desde = parametros.get('fecha_desde')
+    fecha_hasta = parametros.get('fecha_hasta')
+    aseguradora_id = parametros.get('aseguradora')
+    contratante_id = parametros.get('contratante')
+    asegurado_id = parametros.get('asegurado')
+
+    if fecha_desde and fecha_hasta:
+        try:
+            f_inicio = parsear_fecha(fecha_desde)
+            f_fin = parsear_fecha(fecha_hasta)
+            queryset = queryset.filter(fecha_inicio__range=[f_inicio, f_fin])
+        except ValueError:
+            pass
+
+    if aseguradora_id:
+        queryset = queryset.filter(aseguradora_id=aseguradora_id)
+    if contratante_id:
+        queryset = queryset.filter(contratante_id=contratante_id)
+    if asegurado_id:
+        queryset = queryset.filter(asegurado_id=asegurado_id)
+
+    return queryset.order_by('fecha_inicio')
+
+
+def polizas_proximas_vencer(fecha):
+    """Pólizas con renovación a partir de `fecha`, ordenadas por renovación."""
+    return Poliza.objects.select_related(
+        'aseguradora', 'ramo', 'contratante', 'asegurado', 'forma_pago'
+    ).filter(
+        renovacion__gte=fecha
+    ).order_by('renovacion')
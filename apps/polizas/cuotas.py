@@ -0,0 +1,82 @@
+"""
+Cálculo de las cuotas trimestrales (i_trimestre .. iv_trimestre) a partir de
+la prima total y la forma de pago, en Decimal.
+
+Semestral: dos cuotas, en el I y III trimestre. Cualquier otra forma de pago:
+cuatro cuotas iguales. Los céntimos que sobran al dividir se suman a la
+primera cuota, de modo que las cuotas siempre suman exactamente la prima.
+"""
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.keyset import iterar_por_bloques
+from .models import Poliza
+
+CENTIMO = Decimal('0.01')
+CERO = Decimal('0.00')
+
+
+def es_semestral(forma_pago_nombre):
+    return 'semestral' in (forma_pago_nombre or '').lower()
+
+
+def calcular_cuotas(prima_total, forma_pago_nombre):
+    """Devuelve (i, ii, iii, iv) para la prima y forma de pago dadas."""
+    prima = Decimal(prima_total).quantize(CENTIMO)
+    if es_semestral(forma_pago_nombre):
+        cuota = (prima / 2).quantize(CENTIMO, rounding=ROUND_DOWN)
+        return prima - cuota, CERO, cuota, CERO
+    cuota = (prima / 4).quantize(CENTIMO, rounding=ROUND_DOWN)
+    return prima - cuota * 3, cuota, cuota, cuota
+
+
+# --- Recálculo masivo ---
+
+CAMPOS_CUOTAS = ('i_trimestre', 'ii_trimestre', 'iii_trimestre', 'iv_trimestre')
+TAMANO_LOTE = 2000
+MAXIMO_EJEMPLOS = 20
+
+
+def recalcular_cuotas(queryset, aplicar=True, tamano_lote=TAMANO_LOTE):
+    """
+    Recalcula las cuotas de todas las pólizas de `queryset` recorriéndolo por
+    bloques de id, y escribe con un solo bulk_update por bloque únicamente las
+    filas cuyo valor cambió. Con aplicar=False no escribe nada (dry-run).
+
+    Devuelve un resumen con las filas revisadas, las desactualizadas, las que
+    tenían cuotas que no suman la prima y algunos ejemplos para inspección.
+    """
+    resumen = {'revisadas': 0, 'desactualizadas': 0, 'no_suman': 0, 'actualizadas': 0, 'ejemplos': []}
+    campos = ('id', 'numero', 'prima_total', 'forma_pago__nombre', *CAMPOS_CUOTAS)
+    for bloque in iterar_por_bloques(queryset, ('id',), campos, tamano=tamano_lote):
+        cambiadas = []
+        for pk, numero, prima, forma_pago, *actuales in bloque:
+            resumen['revisadas'] += 1
+            actuales = tuple(actuales)
+            esperadas = calcular_cuotas(prima, forma_pago)
+            if sum(actuales) != prima:
+                resumen['no_suman'] += 1
+            if actuales == esperadas:
+                continue
+            resumen['desactualizadas'] += 1
+            if len(resumen['ejemplos']) < MAXIMO_EJEMPLOS:
+                resumen['ejemplos'].append({
+                    'numero': numero,
+                    'prima_total': prima,
+                    'forma_pago': forma_pago,
+                    'actuales': actuales,
+                    'esperadas': esperadas,
+                })
+            cambiadas.append(Poliza(id=pk, **dict(zip(CAMPOS_CUOTAS, esperadas))))
+
+        if aplicar and cambiadas:
+            # bulk_update no aplica auto_now: se fija `actualizado` a mano
+            ahora = timezone.now()
+            for poliza in cambiadas:
+                poliza.actualizado = ahora
+            with transaction.atomic():
+                Poliza.objects.bulk_update(cambiadas, (*CAMPOS_CUOTAS, 'actualizado'))
+            resumen['actualizadas'] += len(cambiadas)
+    return resumen
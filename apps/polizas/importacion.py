@@ -0,0 +1,384 @@
+"""
+Importación masiva de pólizas desde CSV o XLSX.
+
+El archivo se lee en streaming (csv.DictReader / openpyxl en modo read_only)
+y se procesa por lotes: los catálogos se resuelven contra mapas en memoria,
+las partes se buscan e insertan por documento con una consulta por lote y
+las pólizas se crean con bulk_create, cada lote en su propia transacción.
+Las filas con errores no detienen la importación: se devuelven en el informe.
+
+Columnas esperadas (el orden no importa; mayúsculas y espacios se ignoran):
+
+    numero, aseguradora, ramo, forma_pago, fecha_inicio, fecha_fin, vigencia*,
+    prima_total, monto_asegurado, renovacion,
+    contratante_documento, contratante_nombre, contratante_telefono*,
+    contratante_email*, contratante_direccion*,
+    asegurado_documento, asegurado_nombre, asegurado_telefono*,
+    asegurado_email*, asegurado_direccion*
+
+(* opcionales). Aseguradora, ramo y forma de pago se indican por nombre o id.
+
+Cada valor se valida contra el largo de su columna antes de escribir, para
+que una celda demasiado larga sea un error de esa fila y no un DataError que
+aborte el lote. Si otra importación simultánea crea el mismo número entre la
+consulta de existentes y el INSERT, el lote se reintenta y esas filas se
+informan como repetidas.
+"""
+import codecs
+import csv
+import io
+import os
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from reportes.resumenes import acumular
+from .catalogos import incrementar_version
+from .cuotas import calcular_cuotas
+from .models import Asegurado, Aseguradora, Contratante, FormaPago, Poliza, Ramo
+
+TAMANO_LOTE = 1000
+INTENTOS_LOTE = 3
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+MONTO_MAXIMO = Decimal('99999999.99')  # DecimalField(max_digits=10, decimal_places=2)
+COLUMNAS_OBLIGATORIAS = (
+    'numero', 'aseguradora', 'ramo', 'forma_pago', 'fecha_inicio', 'fecha_fin',
+    'prima_total', 'monto_asegurado', 'renovacion',
+    'contratante_documento', 'contratante_nombre', 'asegurado_documento', 'asegurado_nombre',
+)
+CAMPOS_PARTE = ('nombre', 'telefono', 'email', 'direccion')
+
+
+class ArchivoInvalido(Exception):
+    pass
+
+
+# --- Lectura ---
+
+def _normalizar(encabezado):
+    return str(encabezado or '').strip().lower().replace(' ', '_')
+
+
+def _verificar_utf8(archivo, bloque=64 * 1024):
+    """Recorre el archivo antes de importar: un error de codificación a mitad de camino dejaría lotes a medias."""
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    try:
+        while True:
+            datos = archivo.read(bloque)
+            decodificador.decode(datos, final=not datos)
+            if not datos:
+                break
+    except UnicodeDecodeError:
+        raise ArchivoInvalido(
+            'El CSV no está en UTF-8. En Excel use "Guardar como" > "CSV UTF-8 (delimitado por comas)".'
+        )
+    finally:
+        archivo.seek(0)
+
+
+def leer_csv(archivo):
+    _verificar_utf8(archivo)
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.reader(texto, dialecto)
+    encabezados = [_normalizar(columna) for columna in next(lector, [])]
+    for valores in lector:
+        if any(valor.strip() for valor in valores):
+            yield dict(zip(encabezados, valores))
+
+
+def leer_xlsx(archivo):
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, OSError):
+        raise ArchivoInvalido('El archivo .xlsx está dañado o no es un libro de Excel.')
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezados = [_normalizar(columna) for columna in next(filas, ())]
+        for valores in filas:
+            if any(valor not in (None, '') for valor in valores):
+                yield dict(zip(encabezados, valores))
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre):
+    extension = os.path.splitext(nombre or '')[1].lower()
+    if extension == '.csv':
+        return leer_csv(archivo)
+    if extension in ('.xlsx', '.xlsm'):
+        return leer_xlsx(archivo)
+    raise ArchivoInvalido('Formato no soportado: use un archivo .csv o .xlsx.')
+
+
+# --- Conversión de valores ---
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)[:10]
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f'fecha inválida {valor!r}')
+
+
+def _largo_excedido(modelo, campo, valor):
+    maximo = modelo._meta.get_field(campo).max_length
+    if maximo and len(valor) > maximo:
+        return f'máximo {maximo} caracteres ({len(valor)})'
+    return None
+
+
+def _monto(valor):
+    texto = _texto(valor).replace(' ', '')
+    if ',' in texto and '.' not in texto:
+        texto = texto.replace(',', '.')
+    try:
+        monto = Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'monto inválido {valor!r}')
+    if monto < 0 or monto > MONTO_MAXIMO:
+        raise ValueError(f'monto fuera de rango {valor!r}')
+    return monto
+
+
+class Catalogo:
+    """Mapa nombre/id -> id de un catálogo pequeño, cargado una sola vez."""
+
+    def __init__(self, modelo):
+        self.nombres = {}
+        self.ids = {}
+        for pk, nombre in modelo.objects.values_list('id', 'nombre'):
+            self.nombres.setdefault(nombre.strip().lower(), (pk, nombre))
+            self.ids[str(pk)] = (pk, nombre)
+
+    def resolver(self, valor):
+        texto = _texto(valor)
+        return self.nombres.get(texto.lower()) or self.ids.get(texto)
+
+
+# --- Importación ---
+
+class Importador:
+    def __init__(self, usuario, actualizar_partes=False, tamano_lote=TAMANO_LOTE):
+        self.usuario = usuario
+        self.actualizar_partes = actualizar_partes
+        self.tamano_lote = tamano_lote
+        self.aseguradoras = Catalogo(Aseguradora)
+        self.ramos = Catalogo(Ramo)
+        self.formas_pago = Catalogo(FormaPago)
+        self.numeros_vistos = set()
+        self.total = 0
+        self.creadas = 0
+        self.errores = []
+
+    def importar(self, filas):
+        lote = []
+        for numero_fila, fila in enumerate(filas, start=2):  # la fila 1 son los encabezados
+            self.total += 1
+            if self.total == 1:
+                faltantes = [columna for columna in COLUMNAS_OBLIGATORIAS if columna not in fila]
+                if faltantes:
+                    raise ArchivoInvalido(f"Faltan columnas: {', '.join(faltantes)}")
+            lote.append((numero_fila, fila))
+            if len(lote) >= self.tamano_lote:
+                self._procesar_lote(lote)
+                lote = []
+        if lote:
+            self._procesar_lote(lote)
+
+        if self.creadas:
+            incrementar_version('contratantes')
+            incrementar_version('asegurados')
+        return self.informe()
+
+    def informe(self):
+        return {
+            'total': self.total,
+            'creadas': self.creadas,
+            'con_errores': len(self.errores),
+            'errores': self.errores,
+        }
+
+    def _error(self, numero_fila, fila, mensajes):
+        self.errores.append({'fila': numero_fila, 'numero': _texto(fila.get('numero')), 'errores': mensajes})
+
+    def _validar(self, numero_fila, fila):
+        mensajes = []
+        datos = {}
+        for columna in COLUMNAS_OBLIGATORIAS:
+            if not _texto(fila.get(columna)):
+                mensajes.append(f'{columna}: requerido')
+        if mensajes:
+            return None, mensajes
+
+        datos['numero'] = _texto(fila['numero'])
+        datos['vigencia'] = _texto(fila.get('vigencia'))
+        for campo in ('numero', 'vigencia'):
+            exceso = _largo_excedido(Poliza, campo, datos[campo])
+            if exceso:
+                mensajes.append(f'{campo}: {exceso}')
+        if datos['numero'] in self.numeros_vistos:
+            mensajes.append('numero: repetido en el archivo')
+
+        for columna, catalogo in (('aseguradora', self.aseguradoras), ('ramo', self.ramos),
+                                  ('forma_pago', self.formas_pago)):
+            encontrado = catalogo.resolver(fila[columna])
+            if encontrado is None:
+                mensajes.append(f'{columna}: {_texto(fila[columna])!r} no existe')
+            else:
+                datos[columna] = encontrado
+
+        for columna, conversor in (('fecha_inicio', _fecha), ('fecha_fin', _fecha), ('renovacion', _fecha),
+                                   ('prima_total', _monto), ('monto_asegurado', _monto)):
+            try:
+                datos[columna] = conversor(fila[columna])
+            except ValueError as exc:
+                mensajes.append(f'{columna}: {exc}')
+
+        for parte, modelo in (('contratante', Contratante), ('asegurado', Asegurado)):
+            datos[parte] = {'documento': _texto(fila[f'{parte}_documento'])}
+            for campo in CAMPOS_PARTE:
+                datos[parte][campo] = _texto(fila.get(f'{parte}_{campo}'))
+            for campo, valor in datos[parte].items():
+                exceso = _largo_excedido(modelo, campo, valor)
+                if exceso:
+                    mensajes.append(f'{parte}_{campo}: {exceso}')
+            if datos[parte]['email']:
+                try:
+                    validate_email(datos[parte]['email'])
+                except ValidationError:
+                    mensajes.append(f"{parte}_email: {datos[parte]['email']!r} no es un correo válido")
+
+        return datos, mensajes
+
+    def _procesar_lote(self, lote):
+        validas = []
+        for numero_fila, fila in lote:
+            datos, mensajes = self._validar(numero_fila, fila)
+            if mensajes:
+                self._error(numero_fila, fila, mensajes)
+                continue
+            self.numeros_vistos.add(datos['numero'])
+            validas.append((numero_fila, fila, datos))
+        if not validas:
+            return
+
+        for _ in range(INTENTOS_LOTE):
+            try:
+                with transaction.atomic():
+                    existentes = self._numeros_existentes([datos['numero'] for _, _, datos in validas])
+                    nuevas = [v for v in validas if v[2]['numero'] not in existentes]
+                    if nuevas:
+                        self._crear(nuevas)
+            except IntegrityError:
+                # Otra importación confirmó alguno de estos números después de la consulta
+                continue
+            for numero_fila, fila, datos in validas:
+                if datos['numero'] in existentes:
+                    self._error(numero_fila, fila, ['numero: ya existe una póliza con este número'])
+            self.creadas += len(nuevas)
+            return
+        for numero_fila, fila, _ in validas:
+            self._error(numero_fila, fila, ['numero: conflicto con otra importación simultánea, reintente'])
+
+    def _numeros_existentes(self, numeros):
+        return set(Poliza.objects.filter(numero__in=numeros).values_list('numero', flat=True))
+
+    def _crear(self, validas):
+        contratantes = self._resolver_partes(Contratante, [datos['contratante'] for _, _, datos in validas])
+        asegurados = self._resolver_partes(Asegurado, [datos['asegurado'] for _, _, datos in validas])
+
+        polizas = [self._poliza(datos, contratantes, asegurados) for _, _, datos in validas]
+        Poliza.objects.bulk_create(polizas)
+        acumular(polizas)  # bulk_create no dispara las señales que mantienen ResumenPrimas
+
+    def _resolver_partes(self, modelo, partes):
+        """Devuelve {documento: id}, insertando en bloque las partes que no existen."""
+        por_documento = {}
+        for parte in partes:
+            por_documento.setdefault(parte['documento'], parte)
+
+        existentes = {p.documento: p for p in modelo.objects.filter(documento__in=por_documento)}
+        nuevas = [
+            modelo(**{campo: valor for campo, valor in parte.items()})
+            for documento, parte in por_documento.items() if documento not in existentes
+        ]
+        if nuevas:
+            # ignore_conflicts: si otra importación insertó el mismo documento, se reutiliza
+            modelo.objects.bulk_create(nuevas, ignore_conflicts=True)
+
+        if self.actualizar_partes and existentes:
+            cambiadas = []
+            for documento, instancia in existentes.items():
+                cambios = {campo: valor for campo, valor in por_documento[documento].items()
+                           if campo != 'documento' and valor and getattr(instancia, campo) != valor}
+                if cambios:
+                    for campo, valor in cambios.items():
+                        setattr(instancia, campo, valor)
+                    cambiadas.append(instancia)
+            if cambiadas:
+                # bulk_update no aplica auto_now: el feed de cambios lee `actualizado`
+                ahora = timezone.now()
+                for instancia in cambiadas:
+                    instancia.actualizado = ahora
+                modelo.objects.bulk_update(cambiadas, (*CAMPOS_PARTE, 'actualizado'))
+
+        return dict(modelo.objects.filter(documento__in=por_documento).values_list('documento', 'id'))
+
+    def _poliza(self, datos, contratantes, asegurados):
+        aseguradora_id, _ = datos['aseguradora']
+        ramo_id, _ = datos['ramo']
+        forma_pago_id, forma_pago_nombre = datos['forma_pago']
+        i_tri, ii_tri, iii_tri, iv_tri = calcular_cuotas(datos['prima_total'], forma_pago_nombre)
+        return Poliza(
+            numero=datos['numero'],
+            aseguradora_id=aseguradora_id,
+            ramo_id=ramo_id,
+            forma_pago_id=forma_pago_id,
+            fecha_inicio=datos['fecha_inicio'],
+            fecha_fin=datos['fecha_fin'],
+            vigencia=datos['vigencia'] or f"{datos['fecha_inicio']} - {datos['fecha_fin']}",
+            prima_total=datos['prima_total'],
+            monto_asegurado=datos['monto_asegurado'],
+            renovacion=datos['renovacion'],
+            i_trimestre=i_tri,
+            ii_trimestre=ii_tri,
+            iii_trimestre=iii_tri,
+            iv_trimestre=iv_tri,
+            contratante_id=contratantes[datos['contratante']['documento']],
+            asegurado_id=asegurados[datos['asegurado']['documento']],
+            creado_por=self.usuario,
+        )
+
+
+def importar_archivo(archivo, nombre, usuario, actualizar_partes=False, tamano_lote=TAMANO_LOTE):
+    """Importa un archivo abierto en modo binario y devuelve el informe por fila."""
+    importador = Importador(usuario, actualizar_partes=actualizar_partes, tamano_lote=tamano_lote)
+    return importador.importar(leer_filas(archivo, nombre))
@@ -0,0 +1,69 @@
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import CharField
+from django.db.models.expressions import RawSQL
+
+from polizas.consultas import polizas_proximas_vencer
+from polizas.models import Poliza
+from polizas.sintetico import generar_cartera
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara "próximas a vencer" sobre la renovación como texto (esquema anterior) '
+        'contra la columna DateField indexada, con una cartera sintética que se descarta al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polizas', type=int, default=200000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--fecha', default=None, help='Fecha de corte YYYY-MM-DD (por defecto 2027-06-01).')
+        parser.add_argument('--limite', type=int, default=50, help='Filas por página, como en la API paginada.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Generando {options['polizas']} pólizas sintéticas...")
+            generar_cartera(options['polizas'], prefijo='BENCHREN')
+            # El esquema anterior: la renovación como varchar sin índice. La columna se
+            # crea dentro de la transacción, así que desaparece con el rollback.
+            tabla = connection.ops.quote_name(Poliza._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN renovacion_antes varchar(100)')
+                cursor.execute(f'UPDATE {tabla} SET renovacion_antes = CAST(renovacion AS varchar(100))')
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ANALYZE {tabla}')
+
+            corte = options['fecha'] or date(2027, 6, 1).isoformat()
+            antes = (
+                Poliza.objects.annotate(
+                    renovacion_antes=RawSQL(f'{tabla}.renovacion_antes', (), output_field=CharField()),
+                )
+                .filter(renovacion_antes__gte=corte)
+                .order_by('renovacion_antes', 'id')
+            )
+            despues = polizas_proximas_vencer(date.fromisoformat(corte)).order_by('renovacion', 'id')
+
+            for nombre, queryset in (('texto (antes)', antes), ('DateField indexado (después)', despues)):
+                pagina = self._medir(lambda: list(queryset.values_list('id', flat=True)[:options['limite']]),
+                                     options['repeticiones'])
+                conteo = self._medir(lambda: queryset.count(), options['repeticiones'])
+                self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+                self.stdout.write(f"  primera página ({options['limite']} filas): {pagina:.2f} ms")
+                self.stdout.write(f'  conteo de vencimientos: {conteo:.2f} ms')
+                self.stdout.write('  plan: ' + queryset[:options['limite']].explain().replace('\n', '\n        '))
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _medir(funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos)
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polizas.models import Poliza
+from polizas.sintetico import TAMANO_LOTE, generar_cartera
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea una cartera sintética persistente (catálogos, partes y pólizas) para pruebas de carga. '
+        'Con la misma semilla se obtiene la misma cartera.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polizas', type=int, default=100000, help='Hasta 1.000.000 o más.')
+        parser.add_argument('--aseguradoras', type=int, default=10)
+        parser.add_argument('--ramos', type=int, default=8)
+        parser.add_argument('--contratantes', type=int, default=None, help='Por defecto, un tercio de las pólizas.')
+        parser.add_argument('--asegurados', type=int, default=None, help='Por defecto, la mitad de las pólizas.')
+        parser.add_argument('--prefijo', default='CARGA',
+                            help='Distingue los registros de esta cartera (números, documentos, nombres).')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por bulk_create.')
+
+    def handle(self, *args, **options):
+        prefijo = options['prefijo']
+        if Poliza.objects.filter(numero__startswith=f'{prefijo}-').exists():
+            raise CommandError(f'Ya existe una cartera con el prefijo {prefijo!r}; use otro --prefijo.')
+
+        inicio = time.perf_counter()
+        paso = max(options['lote'], options['polizas'] // 20)
+
+        def progreso(creadas, total):
+            if creadas % paso < options['lote'] or creadas == total:
+                self.stdout.write(f'  {creadas}/{total} pólizas ({time.perf_counter() - inicio:.0f} s)')
+
+        resumen = generar_cartera(
+            options['polizas'],
+            aseguradoras=options['aseguradoras'],
+            ramos=options['ramos'],
+            contratantes=options['contratantes'],
+            asegurados=options['asegurados'],
+            prefijo=prefijo,
+            semilla=options['semilla'],
+            tamano_lote=options['lote'],
+            progreso=progreso,
+        )
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Cartera {prefijo}: {resumen['polizas']} pólizas, {resumen['contratantes']} contratantes, "
+            f"{resumen['asegurados']} asegurados, {resumen['aseguradoras']} aseguradoras y "
+            f"{resumen['ramos']} ramos en {duracion:.1f} s."
+        ))
@@ -0,0 +1,51 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from polizas.importacion import TAMANO_LOTE, ArchivoInvalido, importar_archivo
+
+
+class Command(BaseCommand):
+    help = 'Importa pólizas desde un archivo CSV o XLSX y muestra el informe de errores por fila.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--usuario', required=True, help='Usuario que figura como creador de las pólizas.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por transacción.')
+        parser.add_argument('--actualizar-partes', action='store_true',
+                            help='Actualiza nombre, teléfono, email y dirección de las partes existentes.')
+        parser.add_argument('--errores', default=None, help='Ruta donde guardar el informe de errores en JSON.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['usuario']!r}.")
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                informe = importar_archivo(
+                    archivo, options['archivo'], usuario,
+                    actualizar_partes=options['actualizar_partes'],
+                    tamano_lote=options['lote'],
+                )
+        except (OSError, ArchivoInvalido) as exc:
+            raise CommandError(str(exc))
+        duracion = time.perf_counter() - inicio
+
+        for error in informe['errores'][:20]:
+            self.stderr.write(f"Fila {error['fila']} ({error['numero']}): {'; '.join(error['errores'])}")
+        if len(informe['errores']) > 20:
+            self.stderr.write(f"... y {len(informe['errores']) - 20} filas más con errores.")
+        if options['errores']:
+            with open(options['errores'], 'w', encoding='utf-8') as salida:
+                json.dump(informe['errores'], salida, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{informe['creadas']} de {informe['total']} pólizas importadas en {duracion:.1f} s "
+            f"({informe['con_errores']} filas con errores)."
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from polizas.cuotas import TAMANO_LOTE, recalcular_cuotas
+from polizas.models import Poliza
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula i_trimestre..iv_trimestre a partir de la prima y la forma de pago '
+        'y guarda solo las pólizas cuyas cuotas cambiaron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa las diferencias, no escribe.')
+        parser.add_argument('--forma-pago', type=int, default=None, help='Limita a una forma de pago (id).')
+        parser.add_argument('--aseguradora', type=int, default=None, help='Limita a una aseguradora (id).')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Pólizas por bloque.')
+
+    def handle(self, *args, **options):
+        queryset = Poliza.objects.all()
+        if options['forma_pago']:
+            queryset = queryset.filter(forma_pago=options['forma_pago'])
+        if options['aseguradora']:
+            queryset = queryset.filter(aseguradora=options['aseguradora'])
+
+        resumen = recalcular_cuotas(queryset, aplicar=not options['dry_run'], tamano_lote=options['lote'])
+
+        for ejemplo in resumen['ejemplos']:
+            self.stdout.write(
+                f"{ejemplo['numero']} ({ejemplo['forma_pago']}, prima {ejemplo['prima_total']}): "
+                f"{' / '.join(map(str, ejemplo['actuales']))} -> {' / '.join(map(str, ejemplo['esperadas']))}"
+            )
+        self.stdout.write(
+            f"{resumen['revisadas']} pólizas revisadas, {resumen['desactualizadas']} con cuotas desactualizadas, "
+            f"{resumen['no_suman']} cuyas cuotas no suman la prima total."
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry-run: no se modificó ninguna póliza.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{resumen['actualizadas']} pólizas actualizadas."))
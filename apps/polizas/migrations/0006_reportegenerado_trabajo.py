@@ -0,0 +1,70 @@
+# Generated by Django 3.2.20 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+def marcar_existentes(apps, schema_editor):
+    # Los registros previos no son trabajos en cola: no deben llegar al worker
+    ReporteGenerado = apps.get_model('polizas', 'ReporteGenerado')
+    ReporteGenerado.objects.update(estado='completado', progreso=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0005_auto_20251210_1308'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='duracion',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error'), ('expirado', 'Expirado')], db_index=True, default='pendiente', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='fecha_fin_proceso',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='fecha_inicio_proceso',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='filas',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='progreso',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='reportegenerado',
+            name='archivo_path',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='reportegenerado',
+            name='parametros',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='reportegenerado',
+            name='tipo_reporte',
+            field=models.CharField(choices=[('polizas', 'Pólizas'), ('proximas_vencer', 'Próximas a vencer')], max_length=50),
+        ),
+        migrations.RunPython(marcar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+import logging
+from datetime import datetime
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d.%m.%Y', '%d/%m/%y')
+TAMANO_LOTE = 2000
+
+
+def parsear_renovacion(texto):
+    texto = (texto or '').strip()
+    if not texto:
+        return None
+    # Valores ISO con hora ("2025-01-31T00:00:00", "2025-01-31 00:00")
+    candidatos = [texto, texto[:10]] if len(texto) > 10 else [texto]
+    for candidato in candidatos:
+        for formato in FORMATOS:
+            try:
+                return datetime.strptime(candidato, formato).date()
+            except ValueError:
+                continue
+    return None
+
+
+def copiar_renovacion(apps, schema_editor):
+    Poliza = apps.get_model('polizas', 'Poliza')
+    ultimo_id = 0
+    convertidas = 0
+    invalidas = []
+    while True:
+        lote = list(
+            Poliza.objects.filter(id__gt=ultimo_id).order_by('id').only('id', 'numero', 'renovacion')[:TAMANO_LOTE]
+        )
+        if not lote:
+            break
+        cambios = []
+        sin_fecha = []
+        for poliza in lote:
+            fecha = parsear_renovacion(poliza.renovacion)
+            if fecha is not None:
+                poliza.renovacion_fecha = fecha
+                cambios.append(poliza)
+            elif (poliza.renovacion or '').strip():
+                # La fecha queda vacía pero el texto original se conserva
+                poliza.renovacion_texto = poliza.renovacion
+                sin_fecha.append(poliza)
+        Poliza.objects.bulk_update(cambios, ['renovacion_fecha'])
+        Poliza.objects.bulk_update(sin_fecha, ['renovacion_texto'])
+        invalidas.extend(sin_fecha)
+        convertidas += len(cambios)
+        ultimo_id = lote[-1].id
+
+    logger.info('Renovación: %s pólizas convertidas, %s sin fecha válida.', convertidas, len(invalidas))
+    for poliza in invalidas:
+        logger.warning('Póliza id=%s numero=%r: renovación %r no reconocida; queda en renovacion_texto',
+                       poliza.id, poliza.numero, poliza.renovacion)
+
+
+def restaurar_renovacion(apps, schema_editor):
+    Poliza = apps.get_model('polizas', 'Poliza')
+    cambios = []
+    polizas = Poliza.objects.only('id', 'renovacion_fecha', 'renovacion_texto')
+    for poliza in polizas.exclude(renovacion_fecha=None, renovacion_texto='').iterator():
+        if poliza.renovacion_fecha is not None:
+            poliza.renovacion = poliza.renovacion_fecha.isoformat()
+        else:
+            poliza.renovacion = poliza.renovacion_texto
+        cambios.append(poliza)
+    Poliza.objects.bulk_update(cambios, ['renovacion'], batch_size=TAMANO_LOTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0006_reportegenerado_trabajo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poliza',
+            name='renovacion_fecha',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='poliza',
+            name='renovacion_texto',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(copiar_renovacion, restaurar_renovacion),
+    ]
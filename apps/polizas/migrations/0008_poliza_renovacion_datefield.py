@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0007_poliza_renovacion_fecha'),
+    ]
+
+    operations = [
+        # Con default '' la migración también se puede revertir
+        migrations.AlterField(
+            model_name='poliza',
+            name='renovacion',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RemoveField(
+            model_name='poliza',
+            name='renovacion',
+        ),
+        migrations.RenameField(
+            model_name='poliza',
+            old_name='renovacion_fecha',
+            new_name='renovacion',
+        ),
+        migrations.AlterField(
+            model_name='poliza',
+            name='renovacion',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.20 on 2026-10-18 08:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0008_poliza_renovacion_datefield'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='poliza',
+            name='asegurado',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='polizas.asegurado'),
+        ),
+        migrations.AlterField(
+            model_name='poliza',
+            name='aseguradora',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='polizas.aseguradora'),
+        ),
+        migrations.AlterField(
+            model_name='poliza',
+            name='contratante',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='polizas.contratante'),
+        ),
+        migrations.AlterField(
+            model_name='poliza',
+            name='ramo',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='polizas.ramo'),
+        ),
+        migrations.AlterField(
+            model_name='poliza',
+            name='renovacion',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['fecha_inicio', 'id'], name='poliza_fini_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['aseguradora', 'fecha_inicio', 'id'], name='poliza_aseg_fini_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['ramo', 'fecha_inicio', 'id'], name='poliza_ramo_fini_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['contratante', 'fecha_inicio', 'id'], name='poliza_cont_fini_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['asegurado', 'fecha_inicio', 'id'], name='poliza_asdo_fini_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['renovacion', 'id'], name='poliza_renov_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['aseguradora', 'renovacion', 'id'], name='poliza_aseg_renov_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.20 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+CATALOGOS = ('aseguradoras', 'ramos', 'contratantes', 'asegurados', 'formas_pago')
+
+
+def crear_versiones(apps, schema_editor):
+    VersionCatalogo = apps.get_model('polizas', 'VersionCatalogo')
+    for nombre in CATALOGOS:
+        VersionCatalogo.objects.get_or_create(nombre=nombre)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0009_poliza_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(crear_versiones, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# Índices GIN de trigramas para la búsqueda por nombre/documento (polizas.busqueda).
+# icontains/istartswith comparan UPPER(columna::text), así que el índice es sobre
+# esa expresión: uno sobre la columna tal cual no se usaría. Solo aplican a
+# PostgreSQL; en SQLite la búsqueda recorre la tabla.
+INDICES = (
+    ('polizas_contratante', 'nombre', 'contratante_nombre_trgm'),
+    ('polizas_contratante', 'documento', 'contratante_documento_trgm'),
+    ('polizas_asegurado', 'nombre', 'asegurado_nombre_trgm'),
+    ('polizas_asegurado', 'documento', 'asegurado_documento_trgm'),
+)
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for tabla, columna, nombre in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gin ((UPPER({columna}::text)) gin_trgm_ops)'
+        )
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, _, nombre in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0010_versioncatalogo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
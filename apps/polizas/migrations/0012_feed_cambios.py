@@ -0,0 +1,39 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:15
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0011_partes_trigramas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Eliminacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('poliza', 'Póliza'), ('contratante', 'Contratante'), ('asegurado', 'Asegurado')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('eliminado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='asegurado',
+            index=models.Index(fields=['actualizado', 'id'], name='asdo_actualizado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contratante',
+            index=models.Index(fields=['actualizado', 'id'], name='cont_actualizado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['actualizado', 'id'], name='poliza_actualizado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eliminacion',
+            index=models.Index(fields=['eliminado', 'id'], name='eliminacion_elim_id_idx'),
+        ),
+    ]
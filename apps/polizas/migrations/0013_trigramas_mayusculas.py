@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Índice GIN de trigramas sobre UPPER(numero::text) para la búsqueda del admin
+# (icontains sobre el número de póliza), como los de la 0011 para las partes.
+# Solo aplica a PostgreSQL.
+INDICES = (
+    ('polizas_poliza', 'numero', 'poliza_numero_trgm'),
+)
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for tabla, columna, nombre in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gin ((UPPER({columna}::text)) gin_trgm_ops)'
+        )
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, _, nombre in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0012_feed_cambios'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
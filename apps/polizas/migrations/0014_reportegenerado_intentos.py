@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0013_trigramas_mayusculas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportegenerado',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0014_reportegenerado_intentos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['ramo', 'renovacion', 'id'], name='poliza_ramo_renov_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['contratante', 'renovacion', 'id'], name='poliza_cont_renov_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Índices btree sobre (UPPER(nombre::text) COLLATE "C", id) para la fase de
+# prefijo de la búsqueda de partes (polizas.busqueda). Con colación "C" el
+# índice sirve al LIKE 'X%' de istartswith igual que text_pattern_ops y además
+# entrega las filas en el ORDER BY de esa fase, así que el LIMIT corta sin
+# ordenar todas las coincidencias. Solo aplican a PostgreSQL.
+INDICES = (
+    ('polizas_contratante', 'contratante_nombre_mayus_idx'),
+    ('polizas_asegurado', 'asegurado_nombre_mayus_idx'),
+)
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for tabla, nombre in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ((UPPER(nombre::text)) COLLATE "C", id)'
+        )
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, nombre in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polizas', '0015_poliza_renovacion_ramo_contratante'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from apps.core.models import BaseModel
 from django.conf import settings
 
@@ -35,6 +36,10 @@ class Contratante(BaseModel):
     email = models.EmailField(blank=True)
     direccion = models.TextField(blank=True)
 
+    class Meta:
+        # Feed de cambios (polizas.cambios)
+        indexes = [models.Index(fields=['actualizado', 'id'], name='cont_actualizado_id_idx')]
+
     def __str__(self):
         return self.nombre
 
@@ -47,24 +52,72 @@ class Asegurado(BaseModel):
     email = models.EmailField(blank=True)
     direccion = models.TextField(blank=True)
 
+    class Meta:
+        # Feed de cambios (polizas.cambios)
+        indexes = [models.Index(fields=['actualizado', 'id'], name='asdo_actualizado_id_idx')]
+
     def __str__(self):
         return self.nombre
 
 
+class VersionCatalogo(models.Model):
+    """
+    Contador de cambios por catálogo (ver polizas.catalogos). Lo incrementan
+    las señales post_save/post_delete y sirve de clave para los catálogos
+    serializados en caché, que así nunca quedan desactualizados.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre} v{self.version}"
+
+
 class ReporteGenerado(models.Model):
+    TIPOS = (
+        ('polizas', 'Pólizas'),
+        ('proximas_vencer', 'Próximas a vencer'),
+    )
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    COMPLETADO = 'completado'
+    ERROR = 'error'
+    EXPIRADO = 'expirado'
+    ESTADOS = (
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (COMPLETADO, 'Completado'),
+        (ERROR, 'Error'),
+        (EXPIRADO, 'Expirado'),
+    )
+
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     fecha_generacion = models.DateTimeField(auto_now_add=True)
-    parametros = models.JSONField()  # Almacena los parámetros de búsqueda
-    archivo_path = models.CharField(max_length=255)
-    tipo_reporte = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)  # Almacena los parámetros de búsqueda
+    archivo_path = models.CharField(max_length=255, blank=True)
+    tipo_reporte = models.CharField(max_length=50, choices=TIPOS)
+    # Estado del trabajo en segundo plano (ver reportes.trabajos)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE, db_index=True)
+    progreso = models.PositiveSmallIntegerField(default=0)  # Porcentaje 0-100
+    filas = models.PositiveIntegerField(null=True, blank=True)
+    duracion = models.DurationField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    fecha_inicio_proceso = models.DateTimeField(null=True, blank=True)
+    fecha_fin_proceso = models.DateTimeField(null=True, blank=True)
+    # Veces que un worker lo tomó; al llegar a REPORTES_INTENTOS_MAXIMOS deja de reencolarse
+    intentos = models.PositiveSmallIntegerField(default=0)
 
     def __str__(self):
         return f"Reporte {self.id} - {self.usuario.username}"
 
 
 class Poliza(BaseModel):
-    aseguradora = models.ForeignKey(Aseguradora, on_delete=models.PROTECT)
-    ramo = models.ForeignKey(Ramo, on_delete=models.PROTECT)
+    # Campos que suma reportes.resumenes; from_db guarda cómo se leyeron
+    CAMPOS_RESUMEN = ('aseguradora_id', 'ramo_id', 'forma_pago_id', 'fecha_inicio', 'prima_total', 'monto_asegurado')
+
+    # Las FK sin db_index propio quedan cubiertas por los índices compuestos de Meta
+    aseguradora = models.ForeignKey(Aseguradora, on_delete=models.PROTECT, db_index=False)
+    ramo = models.ForeignKey(Ramo, on_delete=models.PROTECT, db_index=False)
     forma_pago = models.ForeignKey(FormaPago, on_delete=models.PROTECT)
     numero = models.CharField(max_length=50, unique=True)
     fecha_inicio = models.DateField()
@@ -76,14 +129,65 @@ class Poliza(BaseModel):
     ii_trimestre = models.DecimalField(max_digits=10, decimal_places=2)
     iii_trimestre = models.DecimalField(max_digits=10, decimal_places=2)
     iv_trimestre = models.DecimalField(max_digits=10, decimal_places=2)
-    renovacion = models.CharField(max_length=100)
-    contratante = models.ForeignKey(Contratante, on_delete=models.PROTECT)
-    asegurado = models.ForeignKey(Asegurado, on_delete=models.PROTECT)
+    # Fecha de renovación; nula solo en pólizas antiguas cuyo texto no se pudo interpretar
+    renovacion = models.DateField(null=True, blank=True)
+    # Texto original de esas renovaciones (migración 0007), para corregirlas a mano
+    renovacion_texto = models.CharField(max_length=100, blank=True, default='')
+    contratante = models.ForeignKey(Contratante, on_delete=models.PROTECT, db_index=False)
+    asegurado = models.ForeignKey(Asegurado, on_delete=models.PROTECT, db_index=False)
     creado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='polizas_creadas')
     actualizado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT,
                                         related_name='polizas_actualizadas', null=True)
 
+    class Meta:
+        # Un índice por patrón de acceso de la API (ver polizas.consultas y la
+        # paginación por clave): filtro de igualdad primero, luego el orden, con
+        # id al final como desempate. Cubiertos por polizas.tests.PlanesConsultaTests.
+        indexes = [
+            models.Index(fields=['fecha_inicio', 'id'], name='poliza_fini_id_idx'),
+            models.Index(fields=['aseguradora', 'fecha_inicio', 'id'], name='poliza_aseg_fini_idx'),
+            models.Index(fields=['ramo', 'fecha_inicio', 'id'], name='poliza_ramo_fini_idx'),
+            models.Index(fields=['contratante', 'fecha_inicio', 'id'], name='poliza_cont_fini_idx'),
+            models.Index(fields=['asegurado', 'fecha_inicio', 'id'], name='poliza_asdo_fini_idx'),
+            models.Index(fields=['renovacion', 'id'], name='poliza_renov_id_idx'),
+            models.Index(fields=['aseguradora', 'renovacion', 'id'], name='poliza_aseg_renov_idx'),
+            models.Index(fields=['ramo', 'renovacion', 'id'], name='poliza_ramo_renov_idx'),
+            models.Index(fields=['contratante', 'renovacion', 'id'], name='poliza_cont_renov_idx'),
+            models.Index(fields=['actualizado', 'id'], name='poliza_actualizado_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.numero} - {self.aseguradora.nombre}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        poliza = super().from_db(db, field_names, values)
+        # Valores leídos de la base: al guardar, ResumenPrimas calcula el delta
+        # contra ellos sin volver a leer la fila. Con only()/defer() que omitan
+        # alguno no se guardan.
+        if all(campo in poliza.__dict__ for campo in cls.CAMPOS_RESUMEN):
+            poliza._leidos = {campo: poliza.__dict__[campo] for campo in cls.CAMPOS_RESUMEN}
+        return poliza
+
+
+class Eliminacion(models.Model):
+    """
+    Lápida de una póliza, contratante o asegurado borrado, para que el feed de
+    cambios (ver polizas.cambios) informe las bajas. La escriben las señales
+    post_delete; el worker borra las más viejas que CAMBIOS_RETENCION_DIAS.
+    """
+    TIPOS = (
+        ('poliza', 'Póliza'),
+        ('contratante', 'Contratante'),
+        ('asegurado', 'Asegurado'),
+    )
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    objeto_id = models.BigIntegerField()
+    eliminado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['eliminado', 'id'], name='eliminacion_elim_id_idx')]
 
+    def __str__(self):
+        return f"{self.tipo} {self.objeto_id} ({self.eliminado:%Y-%m-%d %H:%M})"
@@ -0,0 +1,64 @@
+"""
+Alta de contratantes y asegurados por documento, sin carreras.
+
+`resolver_parte` devuelve la parte con ese documento y la crea si no existe,
+con una sola sentencia:
+
+- PostgreSQL: INSERT ... ON CONFLICT (documento) DO UPDATE ... RETURNING.
+  El DO UPDATE vuelve a escribir el mismo documento, lo justo para que
+  RETURNING devuelva también la fila existente; si otra transacción está
+  insertando ese documento, la sentencia espera a que termine en lugar de
+  fallar con IntegrityError. `xmax = 0` distingue la fila recién insertada.
+- SQLite: INSERT ... ON CONFLICT DO NOTHING RETURNING, y un SELECT solo si la
+  parte ya existía (SQLite serializa las escrituras: no hay carrera posible).
+- Otras bases: INSERT en un savepoint y, ante IntegrityError, SELECT.
+
+Una parte existente no se modifica: los datos enviados solo sirven para
+crearla. La sentencia no pasa por save(), así que la versión del catálogo
+(ver polizas.catalogos) se incrementa aquí cuando la parte es nueva.
+"""
+from django.db import IntegrityError, connections, router, transaction
+
+from .catalogos import CATALOGO_POR_MODELO, incrementar_version
+
+
+def _insertar(modelo, datos, connection):
+    """(sql, params) del INSERT con todas las columnas, incluidas las auto_now."""
+    instancia = modelo(**datos)
+    campos = [campo for campo in modelo._meta.concrete_fields if not campo.primary_key]
+    quote = connection.ops.quote_name
+    columnas = ', '.join(quote(campo.column) for campo in campos)
+    marcadores = ', '.join(['%s'] * len(campos))
+    params = [campo.get_db_prep_save(campo.pre_save(instancia, add=True), connection) for campo in campos]
+    return f'INSERT INTO {quote(modelo._meta.db_table)} ({columnas}) VALUES ({marcadores})', params
+
+
+def resolver_parte(modelo, datos):
+    """Contratante o Asegurado con datos['documento'], creado con `datos` si no existía."""
+    alias = router.db_for_write(modelo)
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+    documento = quote(modelo._meta.get_field('documento').column)
+    tabla = quote(modelo._meta.db_table)
+
+    if connection.vendor == 'postgresql':
+        insertar, params = _insertar(modelo, datos, connection)
+        sql = (f'{insertar} ON CONFLICT ({documento}) DO UPDATE SET {documento} = EXCLUDED.{documento} '
+               f'RETURNING {tabla}.*, (xmax = 0) AS creada')
+        parte = list(modelo.objects.using(alias).raw(sql, params))[0]
+    elif connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35):
+        insertar, params = _insertar(modelo, datos, connection)
+        sql = f'{insertar} ON CONFLICT ({documento}) DO NOTHING RETURNING *, 1 AS creada'
+        filas = list(modelo.objects.using(alias).raw(sql, params))
+        parte = filas[0] if filas else modelo.objects.using(alias).get(documento=datos['documento'])
+    else:
+        try:
+            with transaction.atomic(using=alias):
+                # save() dispara la señal que incrementa la versión del catálogo
+                return modelo.objects.using(alias).create(**datos)
+        except IntegrityError:
+            return modelo.objects.using(alias).get(documento=datos['documento'])
+
+    if getattr(parte, 'creada', False):
+        incrementar_version(CATALOGO_POR_MODELO[modelo])
+    return parte
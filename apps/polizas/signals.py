@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+
+from .cambios import registrar_eliminacion
+from .catalogos import CATALOGO_POR_MODELO, incrementar_version
+from .models import Asegurado, Contratante, Poliza
+
+
+def catalogo_modificado(sender, **kwargs):
+    incrementar_version(CATALOGO_POR_MODELO[sender])
+
+
+def conectar():
+    for modelo in CATALOGO_POR_MODELO:
+        post_save.connect(catalogo_modificado, sender=modelo, dispatch_uid=f'catalogo_save_{modelo.__name__}')
+        post_delete.connect(catalogo_modificado, sender=modelo, dispatch_uid=f'catalogo_delete_{modelo.__name__}')
+    for modelo in (Poliza, Contratante, Asegurado):
+        post_delete.connect(registrar_eliminacion, sender=modelo, dispatch_uid=f'eliminacion_{modelo.__name__}')
@@ -0,0 +1,121 @@
+"""
+Generador de carteras sintéticas para benchmarks y pruebas de carga.
+
+Todo se inserta con bulk_create en lotes, de modo que cientos de miles de
+pólizas se crean en segundos y no en horas.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from reportes.resumenes import acumular
+from .catalogos import CATALOGOS, incrementar_version
+from .cuotas import calcular_cuotas
+from .models import Asegurado, Aseguradora, Contratante, FormaPago, Poliza, Ramo
+
+TAMANO_LOTE = 5000
+FORMAS_PAGO = ('Trimestral', 'Semestral')
+
+
+def _crear_catalogo(modelo, prefijo, cantidad):
+    """Ids de las filas creadas en esta corrida, no de las que dejaron corridas anteriores con el mismo prefijo."""
+    filas = modelo.objects.bulk_create(
+        [modelo(nombre=f'{prefijo} {i}', descripcion='') for i in range(1, cantidad + 1)]
+    )
+    if all(fila.pk is not None for fila in filas):  # PostgreSQL devuelve los ids del INSERT
+        return [fila.pk for fila in filas]
+    # SQLite no los devuelve: son las últimas filas con esos nombres
+    nombres = [fila.nombre for fila in filas]
+    return list(modelo.objects.filter(nombre__in=nombres).order_by('-id').values_list('id', flat=True)[:cantidad])
+
+
+def _crear_partes(modelo, prefijo, cantidad, tamano_lote):
+    for inicio in range(0, cantidad, tamano_lote):
+        modelo.objects.bulk_create([
+            modelo(
+                nombre=f'{prefijo.title()} {i:07d}',
+                documento=f'{prefijo}-{i:07d}',
+                telefono='0212-0000000',
+            )
+            for i in range(inicio, min(inicio + tamano_lote, cantidad))
+        ])
+    return list(modelo.objects.filter(documento__startswith=f'{prefijo}-').values_list('id', flat=True))
+
+
+def generar_cartera(polizas, aseguradoras=10, ramos=8, contratantes=None, asegurados=None,
+                    usuario=None, prefijo='SIN', semilla=42, tamano_lote=TAMANO_LOTE, desde=date(2020, 1, 1),
+                    progreso=None):
+    """
+    Crea catálogos, partes y `polizas` pólizas con datos aleatorios pero
+    reproducibles (misma `semilla`, misma cartera). `prefijo` distingue los
+    registros de una corrida de los de otra. Devuelve un resumen con las cantidades.
+    """
+    rnd = random.Random(semilla)
+    contratantes = contratantes or max(1, polizas // 3)
+    asegurados = asegurados or max(1, polizas // 2)
+
+    if usuario is None:
+        User = get_user_model()
+        usuario, _ = User.objects.get_or_create(
+            username=f'{prefijo.lower()}-benchmark',
+            defaults={'rol': 'admin', 'first_name': 'Benchmark'},
+        )
+
+    aseguradora_ids = _crear_catalogo(Aseguradora, f'{prefijo} Aseguradora', aseguradoras)
+    ramo_ids = _crear_catalogo(Ramo, f'{prefijo} Ramo', ramos)
+    formas_pago = []
+    for nombre in FORMAS_PAGO:
+        forma_pago, _ = FormaPago.objects.get_or_create(nombre=nombre)
+        formas_pago.append((forma_pago.id, nombre))
+    contratante_ids = _crear_partes(Contratante, f'{prefijo}C', contratantes, tamano_lote)
+    asegurado_ids = _crear_partes(Asegurado, f'{prefijo}A', asegurados, tamano_lote)
+    # bulk_create no dispara señales: invalidamos a mano los catálogos en caché
+    for nombre in CATALOGOS:
+        incrementar_version(nombre)
+
+    dias = (date(2027, 1, 1) - desde).days
+    creadas = 0
+    for inicio in range(0, polizas, tamano_lote):
+        lote = []
+        for i in range(inicio, min(inicio + tamano_lote, polizas)):
+            fecha_inicio = desde + timedelta(days=rnd.randrange(dias))
+            fecha_fin = fecha_inicio + timedelta(days=365)
+            prima = Decimal(rnd.randrange(10000, 5000000)) / 100
+            forma_pago_id, forma_pago = rnd.choice(formas_pago)
+            i_tri, ii_tri, iii_tri, iv_tri = calcular_cuotas(prima, forma_pago)
+            lote.append(Poliza(
+                aseguradora_id=rnd.choice(aseguradora_ids),
+                ramo_id=rnd.choice(ramo_ids),
+                forma_pago_id=forma_pago_id,
+                numero=f'{prefijo}-{i:08d}',
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                vigencia=f'{fecha_inicio} - {fecha_fin}',
+                prima_total=prima,
+                monto_asegurado=Decimal(rnd.randrange(1000, 99999)) * 100,
+                i_trimestre=i_tri,
+                ii_trimestre=ii_tri,
+                iii_trimestre=iii_tri,
+                iv_trimestre=iv_tri,
+                renovacion=fecha_fin,
+                contratante_id=rnd.choice(contratante_ids),
+                asegurado_id=rnd.choice(asegurado_ids),
+                creado_por=usuario,
+            ))
+        Poliza.objects.bulk_create(lote)
+        acumular(lote)
+        creadas += len(lote)
+        if progreso:
+            progreso(creadas, polizas)
+
+    return {
+        'aseguradoras': len(aseguradora_ids),
+        'ramos': len(ramo_ids),
+        'formas_pago': len(formas_pago),
+        'contratantes': len(contratante_ids),
+        'asegurados': len(asegurado_ids),
+        'polizas': creadas,
+        'usuario': usuario,
+    }
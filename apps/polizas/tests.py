@@ -1,3 +1,360 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.keyset import despues_de
+from reportes.resumenes import diferencias
+from .busqueda import LIMITE_MAXIMO, buscar_partes
+from .cuotas import CENTIMO, calcular_cuotas, recalcular_cuotas
+from .consultas import polizas_proximas_vencer, polizas_reporte
+from .importacion import ArchivoInvalido, Importador, importar_archivo
+from .models import Aseguradora, Contratante, FormaPago, Poliza, Ramo
+from .sintetico import generar_cartera
+
+
+class PlanesConsultaTests(TestCase):
+    """
+    Verifica con EXPLAIN que los caminos calientes de la API sobre Poliza se
+    resuelven con índices: sin recorrido secuencial de la tabla ni ordenamiento.
+
+    En PostgreSQL se desactivan seqscan y sort para preguntar si el índice
+    *puede* servir la consulta (con pocas filas el planificador preferiría
+    recorrer la tabla igual). En SQLite se corre ANALYZE y se lee EXPLAIN QUERY PLAN.
+    """
+    PAGINA = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_cartera(3000, aseguradoras=5, ramos=4, prefijo='PLAN')
+        cls.poliza = Poliza.objects.order_by('id')[1500]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+
+    def caminos(self):
+        p = self.poliza
+        rango = {'fecha_desde': '2022-01-01', 'fecha_hasta': '2022-06-30'}
+        keyset_fecha = despues_de(('fecha_inicio', 'id'), (p.fecha_inicio, p.id))
+        keyset_renovacion = despues_de(('renovacion', 'id'), (p.renovacion, p.id))
+        corte = date(2025, 1, 1)
+        lista = Poliza.objects.select_related('aseguradora', 'ramo', 'contratante', 'asegurado', 'forma_pago')
+        return {
+            # PolizaReporteListView / ExportarPolizasExcelView
+            'reporte por fechas': polizas_reporte(rango),
+            'reporte por fechas y aseguradora': polizas_reporte({**rango, 'aseguradora': p.aseguradora_id}),
+            'reporte por aseguradora': polizas_reporte({'aseguradora': p.aseguradora_id}),
+            'reporte por contratante': polizas_reporte({'contratante': p.contratante_id}),
+            'reporte por asegurado': polizas_reporte({'asegurado': p.asegurado_id}),
+            'reporte página siguiente': polizas_reporte(rango).filter(keyset_fecha).order_by('fecha_inicio', 'id'),
+            # PolizaListCreateView con filterset_fields y paginación por clave
+            'lista paginada': lista.order_by('fecha_inicio', 'id').filter(keyset_fecha),
+            'lista por aseguradora': lista.filter(aseguradora=p.aseguradora_id).order_by('fecha_inicio', 'id'),
+            'lista por ramo': lista.filter(ramo=p.ramo_id).order_by('fecha_inicio', 'id'),
+            'lista por contratante': lista.filter(contratante=p.contratante_id).order_by('fecha_inicio', 'id'),
+            'lista por asegurado': lista.filter(asegurado=p.asegurado_id).order_by('fecha_inicio', 'id'),
+            # PolizaProximaVencerList / ExportarPolizasProximasVencerExcelView
+            'próximas a vencer': polizas_proximas_vencer(corte).order_by('renovacion', 'id'),
+            'próximas a vencer página siguiente': polizas_proximas_vencer(corte).filter(keyset_renovacion)
+            .order_by('renovacion', 'id'),
+            'próximas a vencer por aseguradora': polizas_proximas_vencer(corte)
+            .filter(aseguradora=p.aseguradora_id).order_by('renovacion', 'id'),
+            'próximas a vencer por ramo': polizas_proximas_vencer(corte)
+            .filter(ramo=p.ramo_id).order_by('renovacion', 'id'),
+            'próximas a vencer por contratante': polizas_proximas_vencer(corte)
+            .filter(contratante=p.contratante_id).order_by('renovacion', 'id'),
+        }
+
+    def problemas(self, plan):
+        tabla = Poliza._meta.db_table
+        if connection.vendor == 'postgresql':
+            malos = [f'Seq Scan on {tabla}', 'Sort']
+            return [linea for linea in plan.splitlines() if any(m in linea for m in malos)]
+        return [
+            linea for linea in plan.splitlines()
+            if f'SCAN {tabla}' in linea and 'USING' not in linea or 'TEMP B-TREE' in linea
+        ]
+
+    def test_caminos_calientes_usan_indices(self):
+        for nombre, queryset in self.caminos().items():
+            with self.subTest(nombre):
+                plan = queryset[:self.PAGINA].explain()
+                self.assertEqual(self.problemas(plan), [], f'{nombre}:\n{plan}\n{queryset.query}')
+
+
+# Sin collectstatic no hay manifiesto: las plantillas del admin usan el almacenamiento simple
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminListadosTests(TestCase):
+    """
+    El changelist de pólizas hace la misma cantidad de consultas sin importar
+    el tamaño de la cartera y de los catálogos: nada de una consulta por fila
+    ni de cargar todas las partes en los filtros.
+    """
+
+    def setUp(self):
+        usuario = get_user_model().objects.create_superuser('admin-listados', 'admin@example.com', 'x')
+        self.client.force_login(usuario)
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.client.get(url, HTTP_HOST='localhost')
+        self.assertEqual(respuesta.status_code, 200)
+        return len(capturadas), respuesta
+
+    def test_consultas_no_dependen_del_tamano(self):
+        generar_cartera(20, aseguradoras=2, ramos=2, prefijo='ADMA')
+        pocas, _ = self.consultas('/admin/polizas/poliza/')
+        generar_cartera(200, aseguradoras=8, ramos=6, prefijo='ADMB')
+        muchas, respuesta = self.consultas('/admin/polizas/poliza/')
+        self.assertEqual(pocas, muchas)
+        # los filtros por clave foránea no listan las filas relacionadas
+        self.assertNotContains(respuesta, 'href="?aseguradora__id__exact=')
+        self.assertNotContains(respuesta, 'href="?contratante__id__exact=')
+
+    def test_busqueda_por_numero_y_parte(self):
+        generar_cartera(30, aseguradoras=2, ramos=2, prefijo='ADMC')
+        poliza = Poliza.objects.select_related('contratante').order_by('id')[7]
+        Contratante.objects.filter(pk=poliza.contratante_id).update(nombre='Zacarías Pérez')
+        for termino in (poliza.numero.lower(), 'zacarías pér'):
+            _, respuesta = self.consultas(f'/admin/polizas/poliza/?q={termino}')
+            self.assertIn(poliza, respuesta.context['cl'].result_list)
+
+
+class CarteraSinteticaTests(TestCase):
+
+    def test_catalogos_de_una_corrida_anterior_no_se_reusan(self):
+        # una corrida previa con el mismo prefijo que dejó sus catálogos
+        viejas = {Aseguradora.objects.create(nombre=f'RER Aseguradora {i}').pk for i in (1, 2, 3)}
+        resumen = generar_cartera(10, aseguradoras=2, ramos=2, prefijo='RER')
+        self.assertEqual(resumen['aseguradoras'], 2)
+        usadas = set(Poliza.objects.values_list('aseguradora_id', flat=True))
+        self.assertFalse(usadas & viejas)
+
+
+class MigracionRenovacionTests(TransactionTestCase):
+    """0007/0008: las renovaciones en texto pasan a fecha sin perder las que no se entienden."""
+    antes = [('polizas', '0006_reportegenerado_trabajo')]
+    despues = [('polizas', '0008_poliza_renovacion_datefield')]
+
+    def migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(destino)
+        return executor.loader.project_state(destino).apps
+
+    def tearDown(self):
+        self.migrar(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_conserva_el_texto_no_reconocido(self):
+        apps = self.migrar(self.antes)
+        Poliza = apps.get_model('polizas', 'Poliza')
+        usuario = apps.get_model('usuarios', 'User').objects.create(username='migracion')
+        catalogo = {
+            campo: apps.get_model('polizas', modelo).objects.create(nombre=modelo)
+            for campo, modelo in (('aseguradora', 'Aseguradora'), ('ramo', 'Ramo'), ('forma_pago', 'FormaPago'))
+        }
+        partes = {
+            campo: apps.get_model('polizas', modelo).objects.create(nombre=modelo, documento=modelo, telefono='0')
+            for campo, modelo in (('contratante', 'Contratante'), ('asegurado', 'Asegurado'))
+        }
+        textos = {'R-ISO': '2025-01-31', 'R-DMY': '31/01/2025', 'R-HORA': '2025-01-31T00:00:00',
+                  'R-MAL': 'a convenir', 'R-VACIA': '  '}
+        for numero, texto in textos.items():
+            Poliza.objects.create(
+                numero=numero, renovacion=texto, fecha_inicio=date(2024, 1, 31), fecha_fin=date(2025, 1, 31),
+                vigencia='1 año', prima_total=100, monto_asegurado=1000, i_trimestre=25, ii_trimestre=25,
+                iii_trimestre=25, iv_trimestre=25, creado_por=usuario, **catalogo, **partes,
+            )
+
+        with self.assertLogs('polizas.migrations.0007_poliza_renovacion_fecha', 'INFO') as registro:
+            apps = self.migrar(self.despues)
+        self.assertIn("'a convenir'", '\n'.join(registro.output))
+
+        filas = dict((numero, (renovacion, texto)) for numero, renovacion, texto in
+                     apps.get_model('polizas', 'Poliza').objects.values_list('numero', 'renovacion', 'renovacion_texto'))
+        self.assertEqual(filas, {
+            'R-ISO': (date(2025, 1, 31), ''),
+            'R-DMY': (date(2025, 1, 31), ''),
+            'R-HORA': (date(2025, 1, 31), ''),
+            'R-MAL': (None, 'a convenir'),
+            'R-VACIA': (None, ''),
+        })
+
+
+class BusquedaPartesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for nombre, documento in (
+            ('Zeta', 'V-123'),
+            ('Beta', 'V-12399'),
+            ('Alfa', 'V-1234'),
+            ('v-123 Servicios', 'J-1'),
+            ('Grupo V-123', 'J-2'),
+            ('Casa', 'E-V-123'),
+            ('Sin relación', 'J-3'),
+        ):
+            Contratante.objects.create(nombre=nombre, documento=documento, telefono='0')
+
+    def nombres(self, texto, limite=10):
+        return [fila['nombre'] for fila in buscar_partes(Contratante, texto, limite)]
+
+    def test_fases_en_orden(self):
+        esperado = ['Zeta', 'Alfa', 'Beta', 'v-123 Servicios', 'Grupo V-123', 'Casa']
+        self.assertEqual(self.nombres('V-123'), esperado)
+        # el documento exacto se encuentra también escrito en minúsculas
+        self.assertEqual(self.nombres('v-123'), esperado)
+
+    def test_contiene_ordena_por_posicion(self):
+        Contratante.objects.create(nombre='Aseguradora del Grupo', documento='J-4', telefono='0')
+        Contratante.objects.create(nombre='Grupo Norte', documento='J-5', telefono='0')
+        # 'Grupo Norte' y 'Grupo V-123' empiezan por el texto (fase 3); después, por posición
+        self.assertEqual(self.nombres('rupo'), ['Grupo Norte', 'Grupo V-123', 'Aseguradora del Grupo'])
+
+    def test_limites(self):
+        self.assertEqual(self.nombres('V-123', limite=3), ['Zeta', 'Alfa', 'Beta'])
+        self.assertEqual(self.nombres('V-123', limite=0), ['Zeta'])
+        self.assertEqual(self.nombres('   '), [])
+        for i in range(LIMITE_MAXIMO + 5):
+            Contratante.objects.create(nombre=f'Masivo {i}', documento=f'M-{i}', telefono='0')
+        self.assertEqual(len(buscar_partes(Contratante, 'Masivo', limite=1000)), LIMITE_MAXIMO)
+
+    def test_texto_corto_solo_documento_exacto(self):
+        Contratante.objects.create(nombre='Ze', documento='E7', telefono='0')
+        self.assertEqual(self.nombres('Ze'), [])
+        self.assertEqual(self.nombres('V-'), [])
+        self.assertEqual(self.nombres('e7'), ['Ze'])
+
+
+class ImportacionTests(TestCase):
+    ENCABEZADOS = (
+        'numero,aseguradora,ramo,forma_pago,fecha_inicio,fecha_fin,prima_total,monto_asegurado,renovacion,'
+        'contratante_documento,contratante_nombre,contratante_email,asegurado_documento,asegurado_nombre\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = get_user_model().objects.create_user(username='importador', password='x')
+        Aseguradora.objects.create(nombre='Importa')
+        Ramo.objects.create(nombre='Autos')
+        FormaPago.objects.create(nombre='Trimestral')
+
+    def fila(self, numero, **cambios):
+        valores = {
+            'numero': numero, 'aseguradora': 'Importa', 'ramo': 'Autos', 'forma_pago': 'Trimestral',
+            'fecha_inicio': '2024-01-01', 'fecha_fin': '2025-01-01', 'prima_total': '100.00',
+            'monto_asegurado': '5000', 'renovacion': '01/01/2025',
+            'contratante_documento': f'C-{numero}', 'contratante_nombre': 'Contratante', 'contratante_email': '',
+            'asegurado_documento': f'A-{numero}', 'asegurado_nombre': 'Asegurado',
+        }
+        valores.update(cambios)
+        return ','.join(valores.values()) + '\n'
+
+    def importar(self, contenido, nombre='polizas.csv', **kwargs):
+        if isinstance(contenido, str):
+            contenido = contenido.encode()
+        return importar_archivo(BytesIO(contenido), nombre, self.usuario, **kwargs)
+
+    def errores(self, informe):
+        return {error['fila']: error['errores'] for error in informe['errores']}
+
+    def test_largos_y_correo_por_fila(self):
+        informe = self.importar(
+            self.ENCABEZADOS
+            + self.fila('IMP-1')
+            + self.fila('N' * 51, contratante_documento='C-2', asegurado_documento='A-2')
+            + self.fila('IMP-3', contratante_nombre='x' * 201)
+            + self.fila('IMP-4', asegurado_documento='D' * 51)
+            + self.fila('IMP-5', contratante_email='no-es-correo')
+            + self.fila('IMP-6', contratante_email='ok@example.com')
+        )
+        self.assertEqual((informe['total'], informe['creadas']), (6, 2))
+        errores = self.errores(informe)
+        self.assertEqual(errores[3], ['numero: máximo 50 caracteres (51)'])
+        self.assertEqual(errores[4], ['contratante_nombre: máximo 200 caracteres (201)'])
+        self.assertEqual(errores[5], ['asegurado_documento: máximo 50 caracteres (51)'])
+        self.assertEqual(errores[6], ["contratante_email: 'no-es-correo' no es un correo válido"])
+        self.assertEqual(sorted(Poliza.objects.values_list('numero', flat=True)), ['IMP-1', 'IMP-6'])
+
+    def test_csv_que_no_es_utf8(self):
+        contenido = (self.ENCABEZADOS + self.fila('IMP-1', contratante_nombre='Peña')).encode('cp1252')
+        with self.assertRaisesMessage(ArchivoInvalido, 'UTF-8'):
+            self.importar(contenido)
+        self.assertFalse(Poliza.objects.exists())
+
+    def test_xlsx_danado(self):
+        for contenido in (b'esto no es un zip', b'PK\x03\x04' + b'\x00' * 40):
+            with self.subTest(contenido=contenido[:8]), self.assertRaises(ArchivoInvalido):
+                self.importar(contenido, nombre='polizas.xlsx')
+
+    def test_numero_creado_por_otra_importacion(self):
+        self.importar(self.ENCABEZADOS + self.fila('IMP-2'))
+        # La otra importación confirma IMP-2 después de la consulta de existentes del primer intento
+        consultar = Importador._numeros_existentes
+        llamadas = []
+
+        def sin_ver_la_otra(importador, numeros):
+            llamadas.append(numeros)
+            return set() if len(llamadas) == 1 else consultar(importador, numeros)
+
+        with patch.object(Importador, '_numeros_existentes', sin_ver_la_otra):
+            informe = self.importar(self.ENCABEZADOS + self.fila('IMP-1') + self.fila('IMP-2') + self.fila('IMP-3'))
+
+        self.assertEqual(len(llamadas), 2)
+        self.assertEqual(informe['creadas'], 2)
+        self.assertEqual(self.errores(informe), {3: ['numero: ya existe una póliza con este número']})
+        self.assertEqual(Poliza.objects.count(), 3)
+        self.assertEqual(diferencias(), [])
+
+
+class CuotasTests(TestCase):
+
+    def test_cuotas_suman_la_prima(self):
+        self.assertEqual(calcular_cuotas(Decimal('100.01'), 'Trimestral'),
+                         (Decimal('25.01'), Decimal('25.00'), Decimal('25.00'), Decimal('25.00')))
+        self.assertEqual(calcular_cuotas(Decimal('100.03'), 'Semestral'),
+                         (Decimal('50.02'), Decimal('0.00'), Decimal('50.01'), Decimal('0.00')))
+        for centimos in (*range(0, 400), 99999999, 1234567):
+            prima = Decimal(centimos) / 100
+            for forma_pago in ('Trimestral', 'Semestral', None):
+                with self.subTest(prima=prima, forma_pago=forma_pago):
+                    cuotas = calcular_cuotas(prima, forma_pago)
+                    self.assertEqual(sum(cuotas), prima)
+                    self.assertTrue(all(cuota >= 0 and cuota == cuota.quantize(CENTIMO) for cuota in cuotas))
+                    # el resto de la división va a la primera cuota y nunca supera 3 céntimos
+                    pagadas = [cuota for cuota in cuotas[1:] if cuota]
+                    if pagadas:
+                        self.assertLessEqual(cuotas[0] - pagadas[0], Decimal('0.03'))
+
+    def test_recalculo_idempotente(self):
+        generar_cartera(30, aseguradoras=2, ramos=2, prefijo='CUO')
+        rotas = list(Poliza.objects.order_by('id').values_list('id', flat=True)[:7])
+        Poliza.objects.filter(id__in=rotas).update(i_trimestre=0)
+        marcas = dict(Poliza.objects.values_list('id', 'actualizado'))
+
+        simulado = recalcular_cuotas(Poliza.objects.all(), aplicar=False, tamano_lote=4)
+        self.assertEqual((simulado['revisadas'], simulado['desactualizadas'], simulado['no_suman'],
+                          simulado['actualizadas']), (30, 7, 7, 0))
+        self.assertEqual(Poliza.objects.filter(i_trimestre=0).count(), 7)
+
+        resumen = recalcular_cuotas(Poliza.objects.all(), tamano_lote=4)
+        self.assertEqual((resumen['desactualizadas'], resumen['actualizadas']), (7, 7))
+        for poliza in Poliza.objects.select_related('forma_pago'):
+            cuotas = (poliza.i_trimestre, poliza.ii_trimestre, poliza.iii_trimestre, poliza.iv_trimestre)
+            self.assertEqual(cuotas, calcular_cuotas(poliza.prima_total, poliza.forma_pago.nombre))
+            # solo las pólizas corregidas cambian su marca (las ve el feed de cambios)
+            self.assertEqual(poliza.actualizado > marcas[poliza.id], poliza.id in rotas)
+
+        otra_vez = recalcular_cuotas(Poliza.objects.all(), tamano_lote=4)
+        self.assertEqual((otra_vez['revisadas'], otra_vez['desactualizadas'], otra_vez['actualizadas']), (30, 0, 0))
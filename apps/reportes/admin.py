@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ResumenPrimas
+
+
+@admin.register(ResumenPrimas)
+class ResumenPrimasAdmin(admin.ModelAdmin):
+    list_display = ('mes', 'aseguradora', 'ramo', 'forma_pago', 'polizas', 'prima_total', 'monto_asegurado')
+    list_filter = ('aseguradora', 'ramo', 'forma_pago')
+    list_select_related = ('aseguradora', 'ramo', 'forma_pago')
+    date_hierarchy = 'mes'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
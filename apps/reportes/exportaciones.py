@@ -0,0 +1,130 @@
+"""
+Definición de las exportaciones de pólizas a Excel.
+
+Cada exportación declara sus encabezados, las columnas planas que lee de la
+base de datos (vía values_list, sin instanciar modelos) y cómo convertir cada
+tupla en la fila final de la hoja.
+"""
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
+
+from polizas.consultas import fecha_consulta, polizas_proximas_vencer, polizas_reporte
+
+from .xlsx import generar_xlsx
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+TAMANO_BLOQUE = 2000
+
+
+class Exportacion:
+    tipo = None
+    titulo = 'Hoja1'
+    columnas = ()
+    campos = ()
+    # Orden de recorrido; debe terminar en una columna única para poder paginar por clave
+    orden = ('id',)
+
+    def queryset(self, parametros):
+        raise NotImplementedError
+
+    def nombre_archivo(self, parametros):
+        return f'{self.tipo}.xlsx'
+
+    def fila(self, valores):
+        return valores
+
+
+class ExportacionReporte(Exportacion):
+    tipo = 'polizas'
+    titulo = 'Pólizas'
+    columnas = (
+        'Nro Póliza', 'Aseguradora', 'Ramo', 'Forma Pago', 'Contratante', 'Asegurado', 'Fecha Inicio',
+        'Fecha Fin', 'Prima Total', 'Renovación',
+    )
+    campos = (
+        'numero', 'aseguradora__nombre', 'ramo__nombre', 'forma_pago__nombre', 'contratante__nombre',
+        'asegurado__nombre', 'fecha_inicio', 'fecha_fin', 'prima_total', 'renovacion',
+    )
+    orden = ('fecha_inicio', 'id')
+
+    def queryset(self, parametros):
+        return polizas_reporte(parametros)
+
+    def nombre_archivo(self, parametros):
+        return 'reporte_polizas.xlsx'
+
+    def fila(self, valores):
+        numero, aseg, ramo, pago, cont, aseg_pers, inicio, fin, prima, renovacion = valores
+        return (numero, aseg, ramo, pago or '-', cont, aseg_pers, inicio, fin, prima, renovacion)
+
+
+class ExportacionProximasVencer(Exportacion):
+    tipo = 'proximas_vencer'
+    titulo = 'Próximas a Vencer'
+    # Exactamente las columnas que ve el Analista en su tabla
+    columnas = (
+        'Aseguradora', 'Ramo', 'Forma Pago', 'Nro Póliza',
+        'Contratante', 'Asegurado',
+        'Vigencia',  # Combinamos inicio y fin como string
+        'I Trimestre', 'II Trimestre', 'III Trimestre', 'IV Trimestre',
+        'Prima Total', 'Renovación',
+    )
+    campos = (
+        'aseguradora__nombre', 'ramo__nombre', 'forma_pago__nombre', 'numero',
+        'contratante__nombre', 'asegurado__nombre', 'fecha_inicio', 'fecha_fin',
+        'i_trimestre', 'ii_trimestre', 'iii_trimestre', 'iv_trimestre',
+        'prima_total', 'renovacion',
+    )
+    orden = ('renovacion', 'id')
+
+    def queryset(self, parametros):
+        return polizas_proximas_vencer(fecha_consulta(parametros.get('fecha')))
+
+    def nombre_archivo(self, parametros):
+        return f"Proximas_Vencer_{fecha_consulta(parametros.get('fecha'))}.xlsx"
+
+    def fila(self, valores):
+        (aseg, ramo, pago, numero, cont, aseg_pers, inicio, fin,
+         i_tri, ii_tri, iii_tri, iv_tri, prima, renovacion) = valores
+        return (
+            aseg or '-', ramo or '-', pago or '-', numero,
+            cont or '-', aseg_pers or '-',
+            f"{inicio} - {fin}",
+            i_tri, ii_tri, iii_tri, iv_tri,
+            prima, renovacion,
+        )
+
+
+EXPORTACIONES = {
+    exportacion.tipo: exportacion
+    for exportacion in (ExportacionReporte(), ExportacionProximasVencer())
+}
+
+
+def leer_filas(queryset, exportacion, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Recorre el queryset por bloques como tuplas planas dentro de una única
+    transacción de solo lectura, para que toda la exportación vea la misma foto
+    de los datos aunque otros usuarios sigan escribiendo.
+
+    Dentro de una transacción ya abierta (ATOMIC_REQUESTS, tests) el nivel de
+    aislamiento no se puede cambiar: se usa el de esa transacción.
+    """
+    alias = queryset.db
+    connection = connections[alias]
+    externa = connection.in_atomic_block
+    with transaction.atomic(using=alias):
+        if connection.vendor == 'postgresql' and not externa:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        filas = queryset.values_list(*exportacion.campos).iterator(chunk_size=tamano_bloque)
+        for valores in filas:
+            yield exportacion.fila(valores)
+
+
+def respuesta_xlsx(queryset, exportacion, filename):
+    """StreamingHttpResponse que envía el Excel a medida que se construye."""
+    contenido = generar_xlsx(exportacion.columnas, leer_filas(queryset, exportacion), titulo=exportacion.titulo)
+    response = StreamingHttpResponse(contenido, content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reportes import trabajos
+
+
+class Command(BaseCommand):
+    help = 'Elimina los archivos de reportes vencidos y reencola (o da por fallidos) los reportes colgados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.REPORTES_RETENCION_DIAS,
+                            help='Días que se conservan los archivos generados.')
+
+    def handle(self, *args, **options):
+        expirados, reencolados, fallidos = trabajos.limpiar(dias=options['dias'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{expirados} archivos expirados, {reencolados} reportes reencolados, '
+            f'{fallidos} reportes sin más intentos'
+        ))
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from polizas.cambios import purgar_eliminaciones
+from reportes import trabajos
+from usuarios.tokens import purgar_expirados
+
+
+class Command(BaseCommand):
+    help = 'Worker que genera en segundo plano los reportes en cola (tabla ReporteGenerado).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera cuando no hay reportes pendientes.')
+        parser.add_argument('--limpieza-cada', type=int, default=settings.REPORTES_LIMPIEZA_INTERVALO,
+                            help='Segundos entre limpiezas de archivos, tokens vencidos y bajas viejas del feed de cambios.')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa los pendientes actuales y termina.')
+
+    def handle(self, *args, **options):
+        ultima_limpieza = None
+        while True:
+            if ultima_limpieza is None or time.monotonic() - ultima_limpieza >= options['limpieza_cada']:
+                expirados, reencolados, fallidos = trabajos.limpiar()
+                tokens = purgar_expirados()
+                lapidas = purgar_eliminaciones()
+                ultima_limpieza = time.monotonic()
+                if expirados or reencolados or fallidos or tokens or lapidas:
+                    self.stdout.write(
+                        f'Limpieza: {expirados} archivos expirados, {reencolados} reportes reencolados, '
+                        f'{fallidos} reportes sin más intentos, '
+                        f'{tokens} tokens vencidos borrados, {lapidas} bajas viejas del feed de cambios borradas'
+                    )
+
+            close_old_connections()
+            reporte = trabajos.reclamar_siguiente()
+            if reporte is None:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+                continue
+
+            reporte = trabajos.procesar(reporte)
+            self.stdout.write(
+                f'Reporte {reporte.id} ({reporte.tipo_reporte}): {reporte.estado}, '
+                f'{reporte.filas or 0} filas en {reporte.duracion}'
+            )
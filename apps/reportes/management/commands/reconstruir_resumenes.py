@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from reportes import resumenes
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los totales de ResumenPrimas a partir de las pólizas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo compara los totales guardados con los de las pólizas, sin escribir.')
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            diferencias = resumenes.diferencias()
+            for diferencia in diferencias[:20]:
+                self.stdout.write(
+                    f"{diferencia['clave']}: guardado {diferencia['guardado']}, esperado {diferencia['esperado']}"
+                )
+            estilo = self.style.WARNING if diferencias else self.style.SUCCESS
+            self.stdout.write(estilo(f'{len(diferencias)} claves con diferencias.'))
+            return
+
+        filas = resumenes.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'{filas} filas de resumen reconstruidas.'))
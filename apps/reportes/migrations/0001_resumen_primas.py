@@ -0,0 +1,52 @@
+# Generated by Django 3.2.20 on 2026-10-18 08:47
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def construir_resumenes(apps, schema_editor):
+    Poliza = apps.get_model('polizas', 'Poliza')
+    ResumenPrimas = apps.get_model('reportes', 'ResumenPrimas')
+    totales = (
+        Poliza.objects.annotate(mes=TruncMonth('fecha_inicio'))
+        .values('aseguradora_id', 'ramo_id', 'forma_pago_id', 'mes')
+        .annotate(polizas=Count('id'), prima_total=Sum('prima_total'), monto_asegurado=Sum('monto_asegurado'))
+        .order_by()
+    )
+    ResumenPrimas.objects.bulk_create([ResumenPrimas(**t) for t in totales], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('polizas', '0011_partes_trigramas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenPrimas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes de fecha_inicio')),
+                ('polizas', models.IntegerField(default=0)),
+                ('prima_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('monto_asegurado', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('aseguradora', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polizas.aseguradora')),
+                ('forma_pago', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polizas.formapago')),
+                ('ramo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='polizas.ramo')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='resumenprimas',
+            index=models.Index(fields=['mes'], name='resumen_primas_mes_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumenprimas',
+            constraint=models.UniqueConstraint(fields=('aseguradora', 'ramo', 'forma_pago', 'mes'), name='resumen_primas_clave_unica'),
+        ),
+        migrations.RunPython(construir_resumenes, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,32 @@
 from django.db import models
 
-# Create your models here.
+
+class ResumenPrimas(models.Model):
+    """
+    Totales de la cartera por (aseguradora, ramo, forma de pago, mes de inicio).
+
+    Se mantiene de forma incremental desde las señales de Poliza (ver
+    reportes.resumenes) y se puede reconstruir con `reconstruir_resumenes`.
+    Su tamaño depende de los catálogos y de los meses, no de la cantidad de
+    pólizas, así que las consultas analíticas cuestan lo mismo con mil o con
+    un millón de pólizas.
+    """
+    aseguradora = models.ForeignKey('polizas.Aseguradora', on_delete=models.CASCADE, related_name='+')
+    ramo = models.ForeignKey('polizas.Ramo', on_delete=models.CASCADE, related_name='+')
+    forma_pago = models.ForeignKey('polizas.FormaPago', on_delete=models.CASCADE, related_name='+')
+    mes = models.DateField(help_text='Primer día del mes de fecha_inicio')
+    polizas = models.IntegerField(default=0)
+    prima_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    monto_asegurado = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['aseguradora', 'ramo', 'forma_pago', 'mes'],
+                name='resumen_primas_clave_unica',
+            ),
+        ]
+        indexes = [models.Index(fields=['mes'], name='resumen_primas_mes_idx')]
+
+    def __str__(self):
+        return f'{self.aseguradora_id}/{self.ramo_id}/{self.forma_pago_id} {self.mes:%Y-%m}'
@@ -0,0 +1,267 @@
+"""
+Tablas de totales (ResumenPrimas) por aseguradora, ramo, forma de pago y mes.
+
+Cada alta, cambio o baja de una póliza se traduce en un delta sobre la fila
+de su clave (y, si la clave cambió, un delta negativo sobre la anterior),
+aplicado con un UPDATE ... SET campo = campo + delta. Los valores anteriores
+son los que Poliza.from_db guardó al leer la póliza. Las cargas masivas que
+usan bulk_create no disparan señales y deben llamar a `acumular`; las que
+usan bulk_update, a `registrar_cambio` por póliza después de escribirlas.
+Dentro de `en_lote()` los deltas se juntan y se escribe una sola vez por
+clave.
+
+El delta queda en la misma transacción que la escritura solo si quien guarda
+la abre: lo hacen el serializer de pólizas, la API por lote, el admin y
+delete() de Django. Un save() suelto en autocommit confirma la póliza antes
+que el delta; si el proceso muere entre ambos, `diferencias` lo detecta y
+`reconstruir` (comando reconstruir_resumenes) recalcula las tablas.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncYear
+
+from polizas.models import Poliza
+from .models import ResumenPrimas
+
+CAMPOS_CLAVE = ('aseguradora_id', 'ramo_id', 'forma_pago_id', 'fecha_inicio')
+CAMPOS_MONTO = ('prima_total', 'monto_asegurado')
+CERO = Decimal('0')
+CENTIMO = Decimal('0.01')
+
+
+def _mes(fecha):
+    return fecha.replace(day=1)
+
+
+def centimos(valor):
+    # SQLite suma los decimales como float: se redondea al céntimo
+    return Decimal(valor or 0).quantize(CENTIMO)
+
+
+def _valores(datos):
+    if any(datos[campo] is None for campo in CAMPOS_CLAVE + CAMPOS_MONTO):
+        return None
+    clave = (datos['aseguradora_id'], datos['ramo_id'], datos['forma_pago_id'], _mes(datos['fecha_inicio']))
+    return clave, Decimal(datos['prima_total']), Decimal(datos['monto_asegurado'])
+
+
+def valores(poliza):
+    """(clave, prima_total, monto_asegurado) de una póliza, o None si está incompleta."""
+    return _valores({campo: getattr(poliza, campo) for campo in CAMPOS_CLAVE + CAMPOS_MONTO})
+
+
+def aplicar_delta(clave, polizas, prima_total, monto_asegurado):
+    if not polizas and not prima_total and not monto_asegurado:
+        return
+    aseguradora_id, ramo_id, forma_pago_id, mes = clave
+    filtro = {'aseguradora_id': aseguradora_id, 'ramo_id': ramo_id, 'forma_pago_id': forma_pago_id, 'mes': mes}
+    cambios = {
+        'polizas': F('polizas') + polizas,
+        'prima_total': F('prima_total') + prima_total,
+        'monto_asegurado': F('monto_asegurado') + monto_asegurado,
+    }
+    if ResumenPrimas.objects.filter(**filtro).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            ResumenPrimas.objects.create(
+                **filtro, polizas=polizas, prima_total=prima_total, monto_asegurado=monto_asegurado,
+            )
+    except IntegrityError:
+        # Otra transacción creó la fila entre el UPDATE y el INSERT
+        ResumenPrimas.objects.filter(**filtro).update(**cambios)
+
+
+_lote = threading.local()
+
+
+def _delta(clave, polizas, prima_total, monto_asegurado):
+    deltas = getattr(_lote, 'deltas', None)
+    if deltas is None:
+        aplicar_delta(clave, polizas, prima_total, monto_asegurado)
+        return
+    delta = deltas[clave]
+    delta[0] += polizas
+    delta[1] += prima_total
+    delta[2] += monto_asegurado
+
+
+@contextmanager
+def en_lote():
+    """
+    Junta los deltas de las señales y de `registrar_cambio` del bloque y los
+    aplica al salir, una escritura por clave. Usar dentro de la transacción
+    que escribe las pólizas; si el bloque falla no se aplica nada.
+    """
+    if getattr(_lote, 'deltas', None) is not None:
+        yield  # anidado: aplica el bloque exterior
+        return
+    _lote.deltas = deltas = defaultdict(lambda: [0, CERO, CERO])
+    try:
+        yield
+    finally:
+        _lote.deltas = None
+    if not deltas:
+        return
+    with transaction.atomic():
+        for clave, (cantidad, prima, monto) in deltas.items():
+            aplicar_delta(clave, cantidad, prima, monto)
+
+
+def acumular(polizas, signo=1):
+    """Suma (o resta, con signo=-1) un lote de pólizas con una escritura por clave."""
+    deltas = defaultdict(lambda: [0, CERO, CERO])
+    for poliza in polizas:
+        actual = valores(poliza)
+        if actual is None:
+            continue
+        clave, prima, monto = actual
+        delta = deltas[clave]
+        delta[0] += signo
+        delta[1] += signo * prima
+        delta[2] += signo * monto
+    with transaction.atomic():
+        for clave, (cantidad, prima, monto) in deltas.items():
+            aplicar_delta(clave, cantidad, prima, monto)
+
+
+# --- Señales de Poliza ---
+
+def _original(instance):
+    # Después de guardar, registrar_cambio deja los valores al día en
+    # _resumen_original; antes, valen los que leyó Poliza.from_db.
+    if hasattr(instance, '_resumen_original'):
+        return instance._resumen_original
+    leidos = getattr(instance, '_leidos', None)
+    return _valores(leidos) if leidos else None
+
+
+def completar_original(sender, instance, raw=False, **kwargs):
+    # Solo una póliza armada a mano con su pk, o leída con only()/defer(),
+    # llega sin los valores anteriores: se leen de la fila.
+    if raw or instance.pk is None or hasattr(instance, '_resumen_original') or hasattr(instance, '_leidos'):
+        return
+    fila = Poliza.objects.filter(pk=instance.pk).values(*CAMPOS_CLAVE, *CAMPOS_MONTO).first()
+    instance._resumen_original = _valores(fila) if fila else None
+
+
+def registrar_cambio(instance, creada=False):
+    """Delta de una póliza guardada respecto de los valores con que se cargó."""
+    original = None if creada else _original(instance)
+    actual = valores(instance)
+    if original == actual:
+        return
+    if original and actual and original[0] == actual[0]:
+        _delta(actual[0], 0, actual[1] - original[1], actual[2] - original[2])
+    else:
+        if original:
+            _delta(original[0], -1, -original[1], -original[2])
+        if actual:
+            _delta(actual[0], 1, actual[1], actual[2])
+    instance._resumen_original = actual
+
+
+def poliza_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    registrar_cambio(instance, creada=created)
+
+
+def poliza_eliminada(sender, instance, **kwargs):
+    original = _original(instance) or valores(instance)
+    if original:
+        _delta(original[0], -1, -original[1], -original[2])
+
+
+# --- Reconstrucción ---
+
+def totales_desde_polizas():
+    """Totales calculados directamente sobre Poliza, con la misma forma que ResumenPrimas."""
+    return (
+        Poliza.objects.annotate(mes=TruncMonth('fecha_inicio'))
+        .values('aseguradora_id', 'ramo_id', 'forma_pago_id', 'mes')
+        .annotate(polizas=Count('id'), prima_total=Sum('prima_total'), monto_asegurado=Sum('monto_asegurado'))
+        .order_by()
+    )
+
+
+def diferencias():
+    """Claves en las que ResumenPrimas no coincide con la suma de las pólizas."""
+    esperados = {
+        (t['aseguradora_id'], t['ramo_id'], t['forma_pago_id'], t['mes']):
+            (t['polizas'], centimos(t['prima_total']), centimos(t['monto_asegurado']))
+        for t in totales_desde_polizas()
+    }
+    guardados = {
+        (r.aseguradora_id, r.ramo_id, r.forma_pago_id, r.mes): (r.polizas, r.prima_total, r.monto_asegurado)
+        for r in ResumenPrimas.objects.all() if r.polizas or r.prima_total or r.monto_asegurado
+    }
+    return [
+        {'clave': clave, 'esperado': esperados.get(clave), 'guardado': guardados.get(clave)}
+        for clave in sorted(set(esperados) | set(guardados), key=str)
+        if esperados.get(clave) != guardados.get(clave)
+    ]
+
+
+def reconstruir():
+    """Reemplaza ResumenPrimas por los totales recalculados; devuelve la cantidad de filas."""
+    filas = [
+        ResumenPrimas(
+            aseguradora_id=t['aseguradora_id'], ramo_id=t['ramo_id'], forma_pago_id=t['forma_pago_id'],
+            mes=t['mes'], polizas=t['polizas'], prima_total=centimos(t['prima_total']),
+            monto_asegurado=centimos(t['monto_asegurado']),
+        )
+        for t in totales_desde_polizas()
+    ]
+    with transaction.atomic():
+        ResumenPrimas.objects.all().delete()
+        ResumenPrimas.objects.bulk_create(filas, batch_size=2000)
+    return len(filas)
+
+
+# --- Consulta ---
+
+AGRUPACIONES = {
+    'aseguradora': ('aseguradora_id', 'aseguradora__nombre'),
+    'ramo': ('ramo_id', 'ramo__nombre'),
+    'forma_pago': ('forma_pago_id', 'forma_pago__nombre'),
+    'mes': ('mes',),
+    'anio': ('anio',),
+}
+
+
+def consultar(agrupar, desde=None, hasta=None, aseguradora=None, ramo=None, forma_pago=None):
+    """
+    Totales agrupados por las dimensiones de `agrupar` (claves de
+    AGRUPACIONES), filtrados por rango de meses y catálogos.
+    """
+    queryset = ResumenPrimas.objects.all()
+    if desde:
+        queryset = queryset.filter(mes__gte=_mes(desde))
+    if hasta:
+        queryset = queryset.filter(mes__lte=_mes(hasta))
+    if aseguradora:
+        queryset = queryset.filter(aseguradora_id=aseguradora)
+    if ramo:
+        queryset = queryset.filter(ramo_id=ramo)
+    if forma_pago:
+        queryset = queryset.filter(forma_pago_id=forma_pago)
+    if 'anio' in agrupar:
+        queryset = queryset.annotate(anio=TruncYear('mes'))
+
+    campos = [campo for dimension in agrupar for campo in AGRUPACIONES[dimension]]
+    return (
+        queryset.values(*campos)
+        .annotate(
+            polizas_total=Sum('polizas'),
+            prima_total_sum=Sum('prima_total'),
+            monto_asegurado_sum=Sum('monto_asegurado'),
+        )
+        .filter(polizas_total__gt=0)
+        .order_by(*campos)
+    )
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from polizas.models import Poliza
+from . import resumenes
+
+
+def conectar():
+    pre_save.connect(resumenes.completar_original, sender=Poliza, dispatch_uid='resumen_poliza_pre_save')
+    post_save.connect(resumenes.poliza_guardada, sender=Poliza, dispatch_uid='resumen_poliza_save')
+    post_delete.connect(resumenes.poliza_eliminada, sender=Poliza, dispatch_uid='resumen_poliza_delete')
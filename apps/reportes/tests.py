@@ -1,3 +1,217 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_init
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from polizas.models import Aseguradora, Contratante, Poliza, ReporteGenerado
+from polizas.sintetico import generar_cartera
+
+from . import resumenes, trabajos
+from .exportaciones import ExportacionReporte, respuesta_xlsx
+from .models import ResumenPrimas
+from .xlsx import generar_xlsx
+
+
+def _leer(bloques):
+    return load_workbook(BytesIO(b''.join(bloques)), read_only=True)
+
+
+class XlsxTests(TestCase):
+    """El Excel escrito a mano en streaming se vuelve a leer con openpyxl."""
+
+    def test_tipos_y_escape(self):
+        filas = [
+            ('a <b> & "c"', 1, Decimal('10.50'), date(2024, 2, 29), True),
+            ('con\x01control\x1fy\ttab', -3, 2.5, None, False),
+            ("'comillas' ]]> &amp;", 0, Decimal('0'), date(1999, 12, 31), None),
+        ]
+        bloques = list(generar_xlsx(('Texto', 'Entero', 'Número', 'Fecha', 'Sí/No'), filas,
+                                    titulo='Hoja <&"> con un título de más de 31 caracteres',
+                                    filas_por_bloque=1))
+
+        libro = _leer(bloques)
+        hoja = libro.worksheets[0]
+        self.assertEqual(hoja.title, 'Hoja <&"> con un título de más '[:31])
+        leidas = [tuple(celda.value for celda in fila) for fila in hoja.iter_rows()]
+        self.assertEqual(leidas[0], ('Texto', 'Entero', 'Número', 'Fecha', 'Sí/No'))
+        self.assertEqual(leidas[1][0], 'a <b> & "c"')
+        self.assertEqual(leidas[1][1:3], (1, 10.5))
+        self.assertEqual(leidas[1][3].date(), date(2024, 2, 29))
+        self.assertIs(leidas[1][4], True)
+        # los caracteres de control que XML no admite se descartan; el tab se conserva
+        self.assertEqual(leidas[2][0], 'concontroly\ttab')
+        self.assertIsNone(leidas[2][3])
+        self.assertEqual(leidas[3][0], "'comillas' ]]> &amp;")
+        self.assertEqual(leidas[3][3].date(), date(1999, 12, 31))
+        self.assertEqual(len(leidas), len(filas) + 1)
+
+    def test_exportacion_en_streaming(self):
+        generar_cartera(7, aseguradoras=2, ramos=2, prefijo='XLS')
+        poliza = Poliza.objects.order_by('id').first()
+        Contratante.objects.filter(pk=poliza.contratante_id).update(nombre='Pérez & <Hijos> "SA"\x0b')
+
+        respuesta = respuesta_xlsx(Poliza.objects.order_by('id'), ExportacionReporte(), 'reporte.xlsx')
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(respuesta['Content-Disposition'], 'attachment; filename="reporte.xlsx"')
+
+        hoja = _leer(respuesta.streaming_content).worksheets[0]
+        filas = list(hoja.iter_rows(values_only=True))
+        self.assertEqual(filas[0], ExportacionReporte.columnas)
+        self.assertEqual(len(filas), 8)
+        numero, _, _, _, contratante, _, inicio, _, prima, _ = filas[1]
+        self.assertEqual(numero, poliza.numero)
+        self.assertEqual(contratante, 'Pérez & <Hijos> "SA"')
+        self.assertEqual(inicio.date(), poliza.fecha_inicio)
+        self.assertEqual(Decimal(str(prima)), poliza.prima_total)
+
+
+class TrabajosTests(TestCase):
+    """Cola de reportes: alta, reclamo, generación, reencolado e intentos."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(REPORTES_DIR=directorio.name, REPORTES_INTENTOS_MAXIMOS=2)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = get_user_model().objects.create_user(username='trabajos', password='x')
+        generar_cartera(5, aseguradoras=2, ramos=2, prefijo='TRAB')
+
+    def colgar(self, reporte):
+        ReporteGenerado.objects.filter(pk=reporte.pk).update(
+            fecha_inicio_proceso=timezone.now() - timedelta(days=1),
+        )
+
+    def test_reclamar_y_procesar(self):
+        encolado = trabajos.encolar(self.usuario, 'polizas', {})
+        self.assertEqual(encolado.estado, ReporteGenerado.PENDIENTE)
+
+        reporte = trabajos.reclamar_siguiente()
+        self.assertEqual((reporte.pk, reporte.estado, reporte.intentos),
+                         (encolado.pk, ReporteGenerado.PROCESANDO, 1))
+        self.assertIsNone(trabajos.reclamar_siguiente())
+
+        reporte = trabajos.procesar(reporte)
+        self.assertEqual((reporte.estado, reporte.progreso, reporte.filas), (ReporteGenerado.COMPLETADO, 100, 5))
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, ReporteGenerado.COMPLETADO)
+        hoja = load_workbook(reporte.archivo_path, read_only=True).worksheets[0]
+        self.assertEqual(len(list(hoja.iter_rows())), 6)
+        self.assertEqual(os.listdir(os.path.dirname(reporte.archivo_path)), [os.path.basename(reporte.archivo_path)])
+
+    def test_tipo_desconocido_queda_en_error(self):
+        trabajos.encolar(self.usuario, 'historico', {})
+        with self.assertLogs('reportes.trabajos', 'ERROR'):
+            reporte = trabajos.procesar(trabajos.reclamar_siguiente())
+        self.assertEqual(reporte.estado, ReporteGenerado.ERROR)
+        self.assertFalse(os.listdir(trabajos.directorio_reportes()))
+
+    def test_colgado_se_reencola_hasta_agotar_intentos(self):
+        trabajos.encolar(self.usuario, 'polizas', {})
+        reporte = trabajos.reclamar_siguiente()
+        self.colgar(reporte)
+        self.assertEqual(trabajos.limpiar(), (0, 1, 0))
+        reporte.refresh_from_db()
+        self.assertEqual((reporte.estado, reporte.intentos), (ReporteGenerado.PENDIENTE, 1))
+
+        reporte = trabajos.reclamar_siguiente()
+        self.assertEqual(reporte.intentos, 2)
+        self.colgar(reporte)
+        self.assertEqual(trabajos.limpiar(), (0, 0, 1))
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, ReporteGenerado.ERROR)
+        self.assertIn('2 intentos', reporte.error)
+        self.assertIsNone(trabajos.reclamar_siguiente())
+
+    def test_worker_reemplazado_no_pisa_el_resultado(self):
+        trabajos.encolar(self.usuario, 'polizas', {})
+        lento = trabajos.reclamar_siguiente()
+        self.colgar(lento)
+        trabajos.limpiar()
+        nuevo = trabajos.reclamar_siguiente()
+
+        with self.assertLogs('reportes.trabajos', 'WARNING'):
+            lento = trabajos.procesar(lento)
+        # el intento 1 ya no es el dueño: el reporte sigue en manos del intento 2
+        self.assertEqual((lento.estado, lento.intentos), (ReporteGenerado.PROCESANDO, 2))
+        nuevo = trabajos.procesar(nuevo)
+        self.assertEqual(nuevo.estado, ReporteGenerado.COMPLETADO)
+
+    def test_limpiar_expira_archivos_viejos(self):
+        trabajos.encolar(self.usuario, 'polizas', {})
+        reporte = trabajos.procesar(trabajos.reclamar_siguiente())
+        self.assertEqual(trabajos.limpiar(dias=1, ahora=timezone.now() + timedelta(days=2)), (1, 0, 0))
+        reporte.refresh_from_db()
+        self.assertEqual((reporte.estado, reporte.archivo_path), (ReporteGenerado.EXPIRADO, ''))
+        self.assertFalse(os.listdir(trabajos.directorio_reportes()))
+
+
+def _resumen():
+    return {
+        (r.aseguradora_id, r.ramo_id, r.forma_pago_id, r.mes): (r.polizas, r.prima_total, r.monto_asegurado)
+        for r in ResumenPrimas.objects.all() if r.polizas or r.prima_total or r.monto_asegurado
+    }
+
+
+class ResumenPrimasTests(TestCase):
+    """Los deltas de las señales dejan ResumenPrimas igual que reconstruirla."""
+
+    def setUp(self):
+        generar_cartera(12, aseguradoras=2, ramos=2, prefijo='RES')
+
+    def assertIgualAReconstruir(self):
+        acumulado = _resumen()
+        resumenes.reconstruir()
+        self.assertEqual(acumulado, _resumen())
+
+    def test_alta(self):
+        modelo = Poliza.objects.order_by('id').first()
+        modelo.pk, modelo.numero = None, 'RES-NUEVA'
+        modelo.save()
+        self.assertIgualAReconstruir()
+
+    def test_cambio_de_montos(self):
+        poliza = Poliza.objects.order_by('id').first()
+        poliza.prima_total += Decimal('123.45')
+        poliza.monto_asegurado = Decimal('1.01')
+        poliza.save()
+        poliza.prima_total -= Decimal('0.45')
+        poliza.save()  # segundo guardado de la misma instancia: parte de lo ya registrado
+        self.assertIgualAReconstruir()
+
+    def test_cambio_de_clave(self):
+        poliza = Poliza.objects.order_by('id').first()
+        poliza.aseguradora = Aseguradora.objects.exclude(pk=poliza.aseguradora_id).first()
+        poliza.fecha_inicio = date(2031, 7, 15)
+        poliza.save()
+        self.assertIgualAReconstruir()
+
+    def test_baja(self):
+        Poliza.objects.order_by('id').first().delete()
+        Poliza.objects.filter(pk__in=Poliza.objects.order_by('-id').values('pk')[:3]).delete()
+        self.assertIgualAReconstruir()
+
+    def test_instanciar_no_dispara_senales(self):
+        # los valores anteriores los deja Poliza.from_db, sin una señal por póliza leída
+        self.assertFalse(post_init.has_listeners(Poliza))
+
+    def test_cambio_sin_releer_la_poliza(self):
+        poliza = Poliza.objects.order_by('id').first()
+        poliza.prima_total += 1
+        with self.assertNumQueries(2):  # UPDATE de la póliza y de su fila de ResumenPrimas
+            poliza.save()
+        self.assertIgualAReconstruir()
+
+    def test_poliza_armada_a_mano(self):
+        fila = Poliza.objects.order_by('id').values().first()
+        poliza = Poliza(**fila)
+        poliza.fecha_inicio = date(2031, 7, 15)
+        poliza.save()
+        self.assertIgualAReconstruir()
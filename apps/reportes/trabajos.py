@@ -0,0 +1,148 @@
+"""
+Generación de reportes en segundo plano.
+
+La cola es la propia tabla ReporteGenerado: la API inserta filas 'pendiente'
+y el comando `procesar_reportes` las toma, escribe el Excel en disco y va
+actualizando estado, progreso, filas y duración.
+
+Cada vez que un worker toma un reporte suma un intento. Un reporte colgado
+(REPORTES_TIEMPO_MAXIMO) vuelve a la cola hasta REPORTES_INTENTOS_MAXIMOS y
+después queda en 'error'. Si el worker colgado termina igual, solo guarda su
+resultado si el reporte sigue siendo suyo (mismo intento): no pisa al que lo
+reemplazó.
+"""
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from core.keyset import iterar_por_bloques
+from polizas.models import ReporteGenerado
+
+from .exportaciones import EXPORTACIONES
+from .xlsx import generar_xlsx
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE = 2000
+
+
+def directorio_reportes():
+    os.makedirs(settings.REPORTES_DIR, exist_ok=True)
+    return settings.REPORTES_DIR
+
+
+def encolar(usuario, tipo_reporte, parametros):
+    return ReporteGenerado.objects.create(
+        usuario=usuario,
+        tipo_reporte=tipo_reporte,
+        parametros=parametros,
+        estado=ReporteGenerado.PENDIENTE,
+    )
+
+
+def reclamar_siguiente():
+    """
+    Toma el reporte pendiente más antiguo. El UPDATE condicionado al estado
+    garantiza que dos workers nunca procesen el mismo reporte.
+    """
+    pendientes = ReporteGenerado.objects.filter(estado=ReporteGenerado.PENDIENTE).order_by('id')
+    for reporte_id in pendientes.values_list('id', flat=True)[:10]:
+        tomado = ReporteGenerado.objects.filter(id=reporte_id, estado=ReporteGenerado.PENDIENTE).update(
+            estado=ReporteGenerado.PROCESANDO,
+            progreso=0,
+            fecha_inicio_proceso=timezone.now(),
+            intentos=F('intentos') + 1,
+        )
+        if tomado:
+            return ReporteGenerado.objects.get(id=reporte_id)
+    return None
+
+
+def _filas_con_progreso(reporte, exportacion, queryset):
+    total = queryset.count()
+    procesadas = 0
+    for bloque in iterar_por_bloques(queryset, exportacion.orden, exportacion.campos, TAMANO_BLOQUE):
+        for valores in bloque:
+            yield exportacion.fila(valores)
+        procesadas += len(bloque)
+        progreso = min(99, procesadas * 100 // total) if total else 99
+        ReporteGenerado.objects.filter(id=reporte.id).update(progreso=progreso, filas=procesadas)
+    reporte.filas = procesadas
+
+
+def procesar(reporte):
+    """Genera el archivo de `reporte` (ya en estado 'procesando')."""
+    inicio = time.monotonic()
+    ruta = os.path.join(directorio_reportes(), f'reporte_{reporte.id}_{reporte.tipo_reporte}.xlsx')
+    temporal = f'{ruta}.{reporte.intentos}.tmp'
+    try:
+        exportacion = EXPORTACIONES[reporte.tipo_reporte]
+        queryset = exportacion.queryset(reporte.parametros or {})
+        reporte.filas = 0
+        with open(temporal, 'wb') as archivo:
+            filas = _filas_con_progreso(reporte, exportacion, queryset)
+            for data in generar_xlsx(exportacion.columnas, filas, titulo=exportacion.titulo):
+                archivo.write(data)
+        os.replace(temporal, ruta)
+    except Exception as exc:
+        logger.exception('Error generando el reporte %s', reporte.id)
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        reporte.estado = ReporteGenerado.ERROR
+        reporte.error = str(exc)
+    else:
+        reporte.estado = ReporteGenerado.COMPLETADO
+        reporte.archivo_path = ruta
+        reporte.progreso = 100
+    reporte.fecha_fin_proceso = timezone.now()
+    reporte.duracion = timedelta(seconds=time.monotonic() - inicio)
+    campos = ('estado', 'error', 'archivo_path', 'progreso', 'filas', 'fecha_fin_proceso', 'duracion')
+    guardado = ReporteGenerado.objects.filter(
+        id=reporte.id, estado=ReporteGenerado.PROCESANDO, intentos=reporte.intentos,
+    ).update(**{campo: getattr(reporte, campo) for campo in campos})
+    if not guardado:
+        logger.warning('El reporte %s se reencoló mientras se generaba (intento %s); se descarta el resultado',
+                       reporte.id, reporte.intentos)
+        reporte.refresh_from_db()
+    return reporte
+
+
+def limpiar(dias=None, ahora=None):
+    """
+    Borra del disco los archivos con más de `dias` días (los registros quedan
+    como historial en estado 'expirado') y devuelve a la cola los reportes que
+    quedaron 'procesando' por la caída de un worker, o los da por fallidos si
+    ya agotaron sus intentos. Devuelve (expirados, reencolados, fallidos).
+    """
+    dias = settings.REPORTES_RETENCION_DIAS if dias is None else dias
+    ahora = ahora or timezone.now()
+
+    vencidos = ReporteGenerado.objects.filter(
+        estado=ReporteGenerado.COMPLETADO,
+        fecha_fin_proceso__lt=ahora - timedelta(days=dias),
+    )
+    expirados = 0
+    for reporte in vencidos.only('id', 'archivo_path'):
+        if reporte.archivo_path and os.path.exists(reporte.archivo_path):
+            os.remove(reporte.archivo_path)
+        expirados += 1
+    vencidos.update(estado=ReporteGenerado.EXPIRADO, archivo_path='')
+
+    colgados = ReporteGenerado.objects.filter(
+        estado=ReporteGenerado.PROCESANDO,
+        fecha_inicio_proceso__lt=ahora - timedelta(seconds=settings.REPORTES_TIEMPO_MAXIMO),
+    )
+    maximo = settings.REPORTES_INTENTOS_MAXIMOS
+    fallidos = colgados.filter(intentos__gte=maximo).update(
+        estado=ReporteGenerado.ERROR,
+        error=f'Se agotaron los {maximo} intentos sin terminar.',
+        fecha_fin_proceso=ahora,
+    )
+    reencolados = colgados.filter(intentos__lt=maximo).update(estado=ReporteGenerado.PENDIENTE, progreso=0)
+
+    return expirados, reencolados, fallidos
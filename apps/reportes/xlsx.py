@@ -0,0 +1,163 @@
+"""
+Escritor XLSX en streaming.
+
+openpyxl (incluso en modo write_only) solo produce bytes al llamar a save(),
+cuando ya recorrió todas las filas. Aquí escribimos las partes SpreadsheetML
+directamente sobre un zip no "seekable", de modo que cada bloque de filas sale
+hacia el cliente apenas se genera y la memoria se mantiene constante.
+"""
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import get_column_letter
+
+EXCEL_EPOCH = date(1899, 12, 30)
+
+# Caracteres de control que XML 1.0 no admite
+_XML_INVALIDO = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{titulo}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilo 0: general. Estilo 1: fecha yyyy-mm-dd (igual que openpyxl por defecto)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_INICIO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_FIN = '</sheetData></worksheet>'
+
+
+class _Buffer:
+    """Destino de solo escritura para ZipFile; se vacía tras cada bloque."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        data = b''.join(self._partes)
+        self._partes = []
+        return data
+
+
+def _celda(ref, valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return f'<c r="{ref}" t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{valor}</v></c>'
+    if isinstance(valor, datetime):
+        delta = valor.replace(tzinfo=None) - datetime(1899, 12, 30)
+        return f'<c r="{ref}" s="1"><v>{delta.days + delta.seconds / 86400}</v></c>'
+    if isinstance(valor, date):
+        return f'<c r="{ref}" s="1"><v>{(valor - EXCEL_EPOCH).days}</v></c>'
+    texto = escape(_XML_INVALIDO.sub('', str(valor)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def generar_xlsx(columnas, filas, titulo='Hoja1', filas_por_bloque=500):
+    """
+    Genera un libro XLSX de una sola hoja como secuencia de bytes.
+
+    `columnas` es la fila de encabezados y `filas` cualquier iterable de tuplas;
+    se consume de forma perezosa, así que puede ser un cursor de base de datos.
+    """
+    letras = [get_column_letter(i) for i in range(1, len(columnas) + 1)]
+    titulo = escape(titulo[:31], {'"': '&quot;'})
+    buffer = _Buffer()
+
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archivo.writestr('_rels/.rels', _RELS)
+        archivo.writestr('xl/workbook.xml', _WORKBOOK.format(titulo=titulo))
+        archivo.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        archivo.writestr('xl/styles.xml', _STYLES)
+        yield buffer.vaciar()
+
+        with archivo.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as hoja:
+            hoja.write(_SHEET_INICIO.encode())
+            bloque = []
+            for numero, fila in enumerate(_con_encabezado(columnas, filas), start=1):
+                celdas = ''.join(_celda(f'{letra}{numero}', valor) for letra, valor in zip(letras, fila))
+                bloque.append(f'<row r="{numero}">{celdas}</row>')
+                if len(bloque) >= filas_por_bloque:
+                    hoja.write(''.join(bloque).encode())
+                    bloque = []
+                    data = buffer.vaciar()
+                    if data:
+                        yield data
+            hoja.write((''.join(bloque) + _SHEET_FIN).encode())
+
+    yield buffer.vaciar()
+
+
+def _con_encabezado(columnas, filas):
+    yield columnas
+    yield from filas
@@ -0,0 +1,106 @@
+"""
+Registro diferido de last_login.
+
+Con UPDATE_LAST_LOGIN de simplejwt cada login hace un UPDATE sobre la tabla
+de usuarios en la misma petición. Aquí el login solo anota el momento en un
+búfer del proceso, y el búfer se vuelca con un único bulk_update desde un
+temporizador (un hilo) que el primer login pendiente programa a
+LOGIN_VOLCADO_SEGUNDOS, en la petición que junta LOGIN_VOLCADO_MAXIMO
+usuarios, y al terminar el proceso. Así el volcado no depende de que haya
+otro login. Si el proceso muere sin volcar se pierde como mucho ese
+intervalo de last_login, que es solo informativo.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+INTERVALO = getattr(settings, 'LOGIN_VOLCADO_SEGUNDOS', 30)
+MAXIMO = getattr(settings, 'LOGIN_VOLCADO_MAXIMO', 500)
+
+
+class BuferAccesos:
+    def __init__(self, intervalo=INTERVALO, maximo=MAXIMO):
+        self.intervalo = intervalo
+        self.maximo = maximo
+        self.pendientes = {}  # pk -> último login
+        self.temporizador = None
+        self.lock = threading.Lock()
+
+    def registrar(self, user, momento=None):
+        momento = momento or timezone.now()
+        user.last_login = momento
+        with self.lock:
+            self.pendientes[user.pk] = momento
+            lleno = len(self.pendientes) >= self.maximo
+            if not lleno:
+                self._programar()
+        if lleno:
+            self.volcar()
+
+    def _programar(self):
+        # Con el lock tomado: un solo temporizador para todo lo pendiente
+        if self.temporizador is None:
+            self.temporizador = threading.Timer(self.intervalo, self._volcar_programado)
+            self.temporizador.daemon = True
+            self.temporizador.start()
+
+    def _volcar_programado(self):
+        with self.lock:
+            self.temporizador = None
+        try:
+            self.volcar()
+        except Exception:
+            logger.exception('Falló el volcado programado de last_login')
+        finally:
+            # El hilo del temporizador abrió su propia conexión
+            connections.close_all()
+
+    def volcar(self):
+        """Escribe los last_login pendientes en un solo bulk_update. Devuelve cuántos."""
+        with self.lock:
+            pendientes, self.pendientes = self.pendientes, {}
+            if self.temporizador is not None:
+                self.temporizador.cancel()
+                self.temporizador = None
+        if not pendientes:
+            return 0
+        User = get_user_model()
+        usuarios = [User(pk=pk, last_login=momento) for pk, momento in pendientes.items()]
+        try:
+            User.objects.bulk_update(usuarios, ['last_login'])
+        except DatabaseError:
+            logger.exception('No se pudieron guardar %s last_login pendientes', len(usuarios))
+            with self.lock:
+                # Se reintentan en el próximo volcado, salvo que ya haya uno más nuevo
+                for pk, momento in pendientes.items():
+                    self.pendientes.setdefault(pk, momento)
+                self._programar()
+            return 0
+        return len(usuarios)
+
+
+accesos = BuferAccesos()
+
+
+def registrar_login(user):
+    if INTERVALO <= 0:
+        # Sin búfer: mismo comportamiento que UPDATE_LAST_LOGIN
+        user.last_login = timezone.now()
+        get_user_model().objects.filter(pk=user.pk).update(last_login=user.last_login)
+        return
+    accesos.registrar(user)
+
+
+@atexit.register
+def _volcar_al_salir():
+    try:
+        accesos.volcar()
+    except Exception:
+        logger.exception('No se pudieron guardar los last_login pendientes al salir')
@@ -0,0 +1,39 @@
+"""
+Autenticación JWT con el usuario en caché.
+
+JWTAuthentication busca el usuario por username en cada petición. Aquí el
+usuario resuelto se guarda en la caché de Django durante
+JWT_USUARIO_CACHE_SEGUNDOS; las señales de usuarios.signals lo borran al
+guardar o eliminar el usuario. Con la caché local por defecto cada proceso
+tiene la suya, así que un usuario desactivado desde otro proceso queda
+fuera como mucho al vencer ese tiempo.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+TTL = getattr(settings, 'JWT_USUARIO_CACHE_SEGUNDOS', 60)
+
+
+def clave_usuario(user_id):
+    return f'jwt_usuario:{user_id}'
+
+
+def invalidar_usuario(user_id):
+    cache.delete(clave_usuario(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or TTL <= 0:
+            return super().get_user(validated_token)
+
+        clave = clave_usuario(user_id)
+        user = cache.get(clave)
+        if user is None:
+            # Valida existencia y is_active; solo se guardan usuarios activos
+            user = super().get_user(validated_token)
+            cache.set(clave, user, TTL)
+        return user
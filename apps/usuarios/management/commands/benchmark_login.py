@@ -0,0 +1,68 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from usuarios.accesos import accesos
+
+CLAVE = 'benchmark-login-2024'
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el login (/api/auth/login/) con usuarios temporales que se descartan al terminar, '
+        'separando el costo del hash de la contraseña del resto de la petición.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=50)
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--url', default='/api/auth/login/')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        # Un solo hash para todos: con PBKDF2 generar cientos tarda más que el benchmark
+        hash_clave = make_password(CLAVE)
+        hash_tiempos = []
+        for _ in range(5):
+            inicio = time.perf_counter()
+            check_password(CLAVE, hash_clave)
+            hash_tiempos.append((time.perf_counter() - inicio) * 1000)
+        costo_hash = statistics.median(hash_tiempos)
+
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(username=f'benchlogin{i:05d}', password=hash_clave, rol='analista', first_name='Bench')
+                for i in range(options['usuarios'])
+            ])
+            cliente = Client(HTTP_HOST='localhost')
+            tiempos, consultas = [], []
+            for i in range(options['logins']):
+                datos = {'username': f"benchlogin{i % options['usuarios']:05d}", 'password': CLAVE}
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    respuesta = cliente.post(options['url'], datos, content_type='application/json')
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                if respuesta.status_code != 200:
+                    raise CommandError(f'El login respondió {respuesta.status_code}: {respuesta.content[:200]!r}')
+                consultas.append(len(capturadas))
+
+            inicio = time.perf_counter()
+            volcados = accesos.volcar()
+            volcado = (time.perf_counter() - inicio) * 1000
+            transaction.set_rollback(True)
+
+        tiempos.sort()
+        mediana = statistics.median(tiempos)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{options['logins']} logins de {options['usuarios']} usuarios"))
+        self.stdout.write(f'  hash de la contraseña: {costo_hash:.1f} ms')
+        self.stdout.write(f'  login p50: {mediana:.1f} ms, p95: {tiempos[int(len(tiempos) * 0.95) - 1]:.1f} ms')
+        self.stdout.write(f'  login sin el hash (p50): {mediana - costo_hash:.1f} ms')
+        self.stdout.write(f'  consultas por login: {statistics.median(consultas):.0f} (máximo {max(consultas)})')
+        self.stdout.write(f'  volcado de last_login: {volcados} usuarios en {volcado:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'{1000 / mediana:.1f} logins/s por proceso.'))
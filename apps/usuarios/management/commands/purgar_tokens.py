@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from usuarios import tokens
+
+
+class Command(BaseCommand):
+    help = 'Borra por lotes los refresh tokens vencidos y sus entradas en la lista negra.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=tokens.LOTE_PURGA,
+                            help='Tokens borrados por transacción.')
+
+    def handle(self, *args, **options):
+        borrados = tokens.purgar_expirados(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{borrados} tokens vencidos borrados.'))
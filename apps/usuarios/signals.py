@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import invalidar_usuario
+
+
+def usuario_modificado(sender, instance, **kwargs):
+    invalidar_usuario(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+def conectar():
+    User = get_user_model()
+    post_save.connect(usuario_modificado, sender=User, dispatch_uid='jwt_usuario_save')
+    post_delete.connect(usuario_modificado, sender=User, dispatch_uid='jwt_usuario_delete')
@@ -1,3 +1,216 @@
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from .accesos import BuferAccesos, accesos
+from .authentication import clave_usuario
+from .tokens import ListaNegra, RefreshToken, lista_negra, purgar_expirados
+
+User = get_user_model()
+
+
+class CacheUsuarioJWTTests(TestCase):
+    """El usuario resuelto del token se cachea y se invalida al modificarlo."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.usuario = User.objects.create_user(username='cacheado', password='x', rol='analista')
+        self.admin = User.objects.create_user(username='jefe', password='x', rol='admin', is_staff=True)
+
+    def perfil(self, usuario, token=None):
+        token = token or RefreshToken.for_user(usuario).access_token
+        return self.client.get(reverse('user-profile'), HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def como_admin(self, metodo, url, datos):
+        token = RefreshToken.for_user(self.admin).access_token
+        return getattr(self.client, metodo)(url, datos, content_type='application/json',
+                                            HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_segunda_peticion_sale_de_la_cache(self):
+        self.assertEqual(self.perfil(self.usuario).status_code, 200)
+        self.assertIsNotNone(cache.get(clave_usuario('cacheado')))
+        # un UPDATE directo no dispara señales: la caché sigue sirviendo el rol anterior
+        User.objects.filter(pk=self.usuario.pk).update(rol='admin')
+        token = RefreshToken.for_user(self.usuario).access_token
+        with self.assertNumQueries(0):
+            self.assertEqual(self.perfil(self.usuario, token).json()['rol'], 'analista')
+
+    def test_desactivar_invalida(self):
+        self.assertEqual(self.perfil(self.usuario).status_code, 200)
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertIsNone(cache.get(clave_usuario('cacheado')))
+        self.assertEqual(self.perfil(self.usuario).status_code, 401)
+
+    def test_cambio_de_rol_invalida(self):
+        self.assertEqual(self.perfil(self.usuario).json()['rol'], 'analista')
+        response = self.como_admin('patch', reverse('user-detail', args=[self.usuario.pk]), {'rol': 'admin'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.perfil(self.usuario).json()['rol'], 'admin')
+
+    def test_cambio_de_username_invalida_el_anterior(self):
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.assertEqual(self.perfil(self.usuario).status_code, 200)
+        response = self.como_admin('patch', reverse('user-detail', args=[self.usuario.pk]), {'username': 'renombrado'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIsNone(cache.get(clave_usuario('cacheado')))
+        # el token viejo identifica al usuario por el username anterior
+        self.assertEqual(self.perfil(self.usuario, token).status_code, 401)
+
+    def test_eliminar_invalida(self):
+        self.assertEqual(self.perfil(self.usuario).status_code, 200)
+        token = RefreshToken.for_user(self.usuario).access_token
+        self.usuario.delete()
+        self.assertEqual(self.perfil(self.usuario, token).status_code, 401)
+
+
+class ListaNegraTests(TestCase):
+    """Rotación de refresh tokens, lista negra en memoria y purga de vencidos."""
+
+    def setUp(self):
+        lista_negra.sincronizado = None
+        lista_negra.vencimientos.clear()
+        lista_negra.piso_id = 0
+        self.usuario = User.objects.create_user(username='rotador', password='x', rol='analista')
+
+    def refrescar(self, refresh):
+        return self.client.post(reverse('token_refresh'), {'refresh': refresh}, content_type='application/json')
+
+    def pendiente(self, jti, vence=None):
+        return OutstandingToken.objects.create(
+            user=self.usuario, jti=jti, token=jti, expires_at=vence or aware_utcnow() + timedelta(days=1),
+        )
+
+    def test_rotacion_y_reuso(self):
+        primero = str(RefreshToken.for_user(self.usuario))
+        response = self.refrescar(primero)
+        self.assertEqual(response.status_code, 200, response.content)
+        segundo = response.json()['refresh']
+        self.assertNotEqual(segundo, primero)
+
+        # el refresh rotado quedó en la lista negra: reusarlo se rechaza
+        self.assertEqual(self.refrescar(primero).status_code, 401)
+        self.assertEqual(self.refrescar(segundo).status_code, 200)
+
+    def test_reuso_visto_desde_otro_proceso(self):
+        refresh = RefreshToken.for_user(self.usuario)
+        # otro proceso lo puso en la lista negra: esta memoria se entera al sincronizar
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=refresh['jti']))
+        self.assertEqual(self.refrescar(str(refresh)).status_code, 401)
+
+    def test_reuso_en_otro_proceso_antes_de_sincronizar(self):
+        memoria = ListaNegra(intervalo=3600, margen=60)
+        memoria.sincronizar()
+        refresh = RefreshToken.for_user(self.usuario)
+        self.assertFalse(memoria.contiene(refresh['jti']))
+        # otro proceso lo rota: esta memoria no vuelve a sincronizar en una hora
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=refresh['jti']))
+        self.assertTrue(memoria.contiene(refresh['jti']))
+        self.assertIn(refresh['jti'], memoria.vencimientos)
+
+    def test_confirmacion_tardia_con_id_menor(self):
+        memoria = ListaNegra(intervalo=0, margen=60)
+        BlacklistedToken.objects.create(id=10, token=self.pendiente('rapido'))
+        memoria.sincronizar()
+        self.assertIn('rapido', memoria.vencimientos)
+
+        # una transacción que empezó antes confirma ahora con un id menor
+        BlacklistedToken.objects.create(id=5, token=self.pendiente('lento'))
+        self.assertTrue(memoria.contiene('lento'))
+        self.assertEqual(memoria.piso_id, 0)
+
+        # pasado el margen el piso avanza y esas filas dejan de releerse
+        BlacklistedToken.objects.update(blacklisted_at=aware_utcnow() - timedelta(minutes=5))
+        memoria.sincronizar()
+        self.assertEqual(memoria.piso_id, 10)
+        BlacklistedToken.objects.create(id=20, token=self.pendiente('nuevo'))
+        memoria.sincronizar()
+        self.assertEqual((memoria.piso_id, set(memoria.vencimientos)), (10, {'rapido', 'lento', 'nuevo'}))
+
+    def test_purgar_expirados(self):
+        vencido = self.pendiente('vencido', aware_utcnow() - timedelta(minutes=1))
+        BlacklistedToken.objects.create(token=vencido)
+        for numero in range(3):
+            self.pendiente(f'viejo-{numero}', aware_utcnow() - timedelta(days=2))
+        vigente = self.pendiente('vigente')
+        BlacklistedToken.objects.create(token=vigente)
+        lista_negra.sincronizar(forzar=True)
+        lista_negra.agregar('vencido', vencido.expires_at)
+
+        self.assertEqual(purgar_expirados(lote=2), 4)
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['vigente'])
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), ['vigente'])
+        self.assertEqual(set(lista_negra.vencimientos), {'vigente'})
+        self.assertEqual(purgar_expirados(), 0)
+
+
+class BuferAccesosTests(TestCase):
+    """last_login diferido: se vuelca por temporizador, por tamaño o a pedido."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='accede', password='clave-segura', rol='analista')
+        self.addCleanup(accesos.volcar)
+
+    def bufer(self, **kwargs):
+        bufer = BuferAccesos(**kwargs)
+        self.addCleanup(lambda: bufer.temporizador and bufer.temporizador.cancel())
+        return bufer
+
+    def test_login_anota_y_volcar_escribe(self):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'accede', 'password': 'clave-segura'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIsNone(User.objects.get(pk=self.usuario.pk).last_login)
+        self.assertIn(self.usuario.pk, accesos.pendientes)
+        self.assertIsNotNone(accesos.temporizador)
+
+        self.assertEqual(accesos.volcar(), 1)
+        self.assertIsNone(accesos.temporizador)
+        self.assertIsNotNone(User.objects.get(pk=self.usuario.pk).last_login)
+
+    def test_temporizador_vuelca_sin_otro_login(self):
+        bufer = self.bufer(intervalo=0.01)
+        volcado = threading.Event()
+        with patch.object(bufer, 'volcar', side_effect=lambda: volcado.set()):
+            bufer.registrar(self.usuario)
+            self.assertTrue(volcado.wait(5))
+
+    def test_falla_del_temporizador_se_registra(self):
+        bufer = self.bufer(intervalo=3600)
+        bufer.registrar(self.usuario)
+        with self.assertLogs('usuarios.accesos', 'ERROR'), \
+                patch.object(bufer, 'volcar', side_effect=RuntimeError('sin base')):
+            # en su propio hilo, como el temporizador: cierra las conexiones de ese hilo
+            hilo = threading.Thread(target=bufer._volcar_programado)
+            hilo.start()
+            hilo.join()
+        self.assertIsNone(bufer.temporizador)
+
+    def test_maximo_vuelca_en_la_peticion(self):
+        bufer = self.bufer(intervalo=3600, maximo=2)
+        otro = User.objects.create_user(username='otro', password='x', rol='analista')
+        bufer.registrar(self.usuario)
+        self.assertIsNotNone(bufer.temporizador)
+        bufer.registrar(otro)
+        self.assertEqual((bufer.pendientes, bufer.temporizador), ({}, None))
+        self.assertEqual(User.objects.filter(last_login__isnull=False).count(), 2)
 
-# Create your tests here.
+    def test_error_de_base_reintenta(self):
+        bufer = self.bufer(intervalo=3600)
+        bufer.registrar(self.usuario)
+        with self.assertLogs('usuarios.accesos', 'ERROR'), \
+                patch.object(QuerySet, 'bulk_update', side_effect=DatabaseError('bloqueada')):
+            self.assertEqual(bufer.volcar(), 0)
+        self.assertIn(self.usuario.pk, bufer.pendientes)
+        self.assertIsNotNone(bufer.temporizador)
+        self.assertEqual(bufer.volcar(), 1)
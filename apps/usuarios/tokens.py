@@ -0,0 +1,142 @@
+"""
+Refresh tokens con lista negra en memoria y purga por lotes.
+
+Con ROTATE_REFRESH_TOKENS y BLACKLIST_AFTER_ROTATION cada /auth/refresh/
+agrega filas a token_blacklist_outstandingtoken y _blacklistedtoken, y cada
+refresh consulta si el token está en la lista negra. Aquí:
+
+- `lista_negra` mantiene en cada proceso los jti de la lista negra que aún
+  no vencieron. Cada TOKENS_LISTA_NEGRA_SINCRONIZACION segundos lee las
+  filas con id mayor que un piso, así que lo que otro proceso agregó se ve
+  a más tardar en ese intervalo. Los ids se asignan al insertar y no al
+  confirmar: una fila puede aparecer con un id menor que otra ya leída. Por
+  eso el piso solo avanza hasta las filas agregadas hace más de
+  TOKENS_LISTA_NEGRA_MARGEN_SEGUNDOS y las más recientes se vuelven a leer
+  (como el margen de polizas.cambios). Un jti en memoria se confirma contra
+  la base (por si un administrador lo sacó de la lista). Uno que no está se
+  busca solo entre las filas con id mayor que el piso, las únicas que la
+  memoria puede no tener todavía: un refresh rotado en otro proceso se
+  rechaza de inmediato y no recién en la próxima sincronización.
+- `purgar_expirados` borra por lotes los tokens vencidos, que ya no sirven
+  aunque no estén en la lista negra; el worker la ejecuta periódicamente.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+SINCRONIZACION = getattr(settings, 'TOKENS_LISTA_NEGRA_SINCRONIZACION', 5)
+MARGEN = getattr(settings, 'TOKENS_LISTA_NEGRA_MARGEN_SEGUNDOS', 60)
+LOTE_PURGA = 1000
+
+
+class ListaNegra:
+    def __init__(self, intervalo=SINCRONIZACION, margen=MARGEN):
+        self.intervalo = intervalo
+        self.margen = timedelta(seconds=margen)
+        self.vencimientos = {}  # jti -> expires_at
+        self.piso_id = 0  # las filas con id <= piso ya confirmaron y están leídas
+        self.sincronizado = None
+        self.lock = threading.RLock()
+
+    def sincronizar(self, forzar=False):
+        ahora = time.monotonic()
+        if not forzar and self.sincronizado is not None and ahora - self.sincronizado < self.intervalo:
+            return
+        with self.lock:
+            corte = aware_utcnow() - self.margen
+            filas = (
+                BlacklistedToken.objects.filter(id__gt=self.piso_id)
+                .order_by('id').values_list('id', 'blacklisted_at', 'token__jti', 'token__expires_at')
+            )
+            recientes = False
+            for pk, agregado, jti, vence in filas:
+                self.vencimientos[jti] = vence
+                # desde la primera fila dentro del margen se vuelve a leer todo
+                recientes = recientes or agregado > corte
+                if not recientes:
+                    self.piso_id = pk
+            self.descartar_vencidos()
+            self.sincronizado = ahora
+
+    def descartar_vencidos(self):
+        # Un token vencido se rechaza por su exp; no hace falta recordarlo
+        limite = aware_utcnow()
+        with self.lock:
+            for jti in [jti for jti, vence in self.vencimientos.items() if vence <= limite]:
+                del self.vencimientos[jti]
+
+    def contiene(self, jti):
+        self.sincronizar()
+        if jti not in self.vencimientos:
+            # las filas hasta el piso ya están leídas; solo las posteriores
+            # pueden haberse agregado en otro proceso desde la sincronización
+            fila = (
+                BlacklistedToken.objects.filter(id__gt=self.piso_id, token__jti=jti)
+                .values_list('token__expires_at', flat=True).first()
+            )
+            if fila is None:
+                return False
+            self.agregar(jti, fila)
+            return True
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            return True
+        with self.lock:
+            self.vencimientos.pop(jti, None)
+        return False
+
+    def agregar(self, jti, vence):
+        with self.lock:
+            self.vencimientos[jti] = vence
+
+
+lista_negra = ListaNegra()
+
+
+class RefreshToken(tokens.RefreshToken):
+    """RefreshToken de simplejwt que consulta la lista negra en memoria."""
+
+    def check_blacklist(self):
+        if lista_negra.contiene(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError('El token está en la lista negra')
+
+    def blacklist(self):
+        resultado = super().blacklist()
+        lista_negra.agregar(self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload['exp']))
+        return resultado
+
+
+class RefreshTokenSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+def purgar_expirados(lote=LOTE_PURGA):
+    """
+    Borra los tokens vencidos (y sus filas de lista negra) de a `lote`, cada
+    lote en su propia transacción para no bloquear las tablas. Devuelve la
+    cantidad de tokens borrados.
+    """
+    borrados = 0
+    ahora = aware_utcnow()
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=ahora).order_by('id').values_list('id', flat=True)[:lote]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+        borrados += len(ids)
+        if len(ids) < lote:
+            break
+    lista_negra.descartar_vencidos()
+    return borrados
@@ -63,13 +63,16 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login se guarda en diferido, ver usuarios.accesos
+    'UPDATE_LAST_LOGIN': False,
     'USER_ID_FIELD': 'username',
     'BLACKLIST_AFTER_ROTATION': True,
     'ROTATE_REFRESH_TOKENS': True,
 }
 
 MIDDLEWARE = [
+    'core.metricas.MetricasMiddleware',  # solo activo con METRICAS=1
+    'core.rendimiento.ServerTimingMiddleware',  # solo activo con SERVER_TIMING=1
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # <--- NECESARIO: Agregado para archivos estáticos
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -124,7 +127,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'usuarios.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
 }
@@ -135,6 +138,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:4203",
     "https://automatizacionpolizas.netlify.app"
 ]
+# Para que el frontend (y sus herramientas) puedan leer las mediciones
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'X-Query-Count']
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -174,4 +179,66 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles_collected')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Default primary key field type
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# ==============================================================================
+# REPORTES EN SEGUNDO PLANO (python manage.py procesar_reportes)
+# ==============================================================================
+
+# Carpeta donde el worker deja los Excel generados
+REPORTES_DIR = os.environ.get('REPORTES_DIR', os.path.join(BASE_DIR, 'reportes_generados'))
+# Días que se conservan los archivos antes de borrarlos
+REPORTES_RETENCION_DIAS = int(os.environ.get('REPORTES_RETENCION_DIAS', 7))
+# Cada cuántos segundos el worker ejecuta la limpieza
+REPORTES_LIMPIEZA_INTERVALO = int(os.environ.get('REPORTES_LIMPIEZA_INTERVALO', 3600))
+# Un reporte 'procesando' por más de este tiempo (segundos) se considera colgado y se reencola
+REPORTES_TIEMPO_MAXIMO = int(os.environ.get('REPORTES_TIEMPO_MAXIMO', 3600))
+# Tras tantos intentos colgados el reporte pasa a 'error' en lugar de reencolarse
+REPORTES_INTENTOS_MAXIMOS = int(os.environ.get('REPORTES_INTENTOS_MAXIMOS', 3))
+
+# Feed de cambios (api/polizas/cambios/, ver polizas.cambios): solo se entregan
+# filas guardadas hace más de este margen, para no saltear transacciones que
+# todavía no confirmaron. Las bajas se recuerdan tantos días (el worker purga).
+CAMBIOS_MARGEN_SEGUNDOS = int(os.environ.get('CAMBIOS_MARGEN_SEGUNDOS', 60))
+CAMBIOS_RETENCION_DIAS = int(os.environ.get('CAMBIOS_RETENCION_DIAS', 90))
+
+
+# ==============================================================================
+# AUTENTICACIÓN
+# ==============================================================================
+
+# Segundos que se reutiliza el usuario resuelto de un JWT sin volver a la base
+# (0 desactiva la caché). Es también la demora máxima para que un usuario
+# desactivado desde otro proceso quede fuera.
+JWT_USUARIO_CACHE_SEGUNDOS = int(os.environ.get('JWT_USUARIO_CACHE_SEGUNDOS', 60))
+# Cada cuántos segundos cada proceso lee los refresh tokens nuevos de la lista
+# negra (0 = en cada refresh). No abre una ventana de reuso: un jti que no está
+# en memoria se busca en las filas aún no leídas. Ver usuarios.tokens.
+TOKENS_LISTA_NEGRA_SINCRONIZACION = int(os.environ.get('TOKENS_LISTA_NEGRA_SINCRONIZACION', 5))
+# Las filas agregadas a la lista negra en los últimos tantos segundos se
+# vuelven a leer en cada sincronización, por las transacciones que confirman
+# después de otras con id mayor. Debe superar la transacción más larga.
+TOKENS_LISTA_NEGRA_MARGEN_SEGUNDOS = int(os.environ.get('TOKENS_LISTA_NEGRA_MARGEN_SEGUNDOS', 60))
+# last_login se acumula en memoria y se vuelca en bloque cada tantos segundos
+# o al juntar tantos usuarios (0 segundos = se guarda en cada login).
+LOGIN_VOLCADO_SEGUNDOS = int(os.environ.get('LOGIN_VOLCADO_SEGUNDOS', 30))
+LOGIN_VOLCADO_MAXIMO = int(os.environ.get('LOGIN_VOLCADO_MAXIMO', 500))
+
+
+# ==============================================================================
+# RENDIMIENTO
+# ==============================================================================
+
+# Encabezados Server-Timing y X-Query-Count en cada respuesta (ver core.rendimiento)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+# Peticiones más lentas que esto (ms) se registran con sus consultas más lentas
+SERVER_TIMING_LENTO_MS = int(os.environ.get('SERVER_TIMING_LENTO_MS', 1000))
+# Histogramas de latencia y contadores por ruta en /api/metricas/ (ver core.metricas)
+METRICAS = os.environ.get('METRICAS', '0') == '1'
+# Con varios workers de gunicorn: directorio compartido donde cada uno vuelca lo suyo
+METRICAS_DIR = os.environ.get('METRICAS_DIR') or None
+METRICAS_VOLCADO_SEGUNDOS = int(os.environ.get('METRICAS_VOLCADO_SEGUNDOS', 10))
+# Aseguradoras, ramos y formas de pago en memoria de cada proceso: cada cuántos
+# segundos se recargan los cambios hechos en otro proceso. Ver polizas.catalogos.
+CATALOGOS_MEMORIA_SEGUNDOS = int(os.environ.get('CATALOGOS_MEMORIA_SEGUNDOS', 60))